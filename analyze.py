@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from mcts import *
+from player import *
+from position import *
+
+
+def analyze_position(
+    position: str,
+    rows: int,
+    cols: int,
+    to_win: int,
+    max_depth: int,
+    time_limit: float | None,
+    engine: str = "minimax",
+    playouts: int = 2000,
+    max_nodes: int | None = None,
+    max_memory: int | None = None,
+    multipv: int = 1,
+) -> dict:
+    """Sök fram det bästa draget för en position, körs i en separat process i arbetarpoolen.
+
+    Args:
+        position (str): Positionen i textform, se parse_position
+        rows (int): Antal rader på brädet
+        cols (int): Antal kolumner på brädet
+        to_win (int): Antal symboler i rad som krävs för vinst
+        max_depth (int): Maximalt sökdjup per position
+        time_limit (float | None): Tidsbudget i sekunder per position
+        engine (str): "minimax" eller "mcts"
+        playouts (int): Antal slumpmässiga partier per position för mcts
+        max_nodes (int | None): Högsta antal noder per position för minimax
+        max_memory (int | None): Högsta minnesanvändning per arbetarprocess i byte för minimax
+        multipv (int): Antal bästa drag som rapporteras i lines för minimax
+
+    Returns:
+        dict: Resultatet på formen {position, best_move, score, depth, nodes, pv, ms}, eller {position, error}.
+        Med multipv över 1 finns även lines, en lista med {move, score, pv} där det bästa draget är först.
+    """
+    start = time.perf_counter()
+    try:
+        board = parse_position(position, rows, cols, to_win)
+        if board.is_terminal():
+            raise ValueError("Position is already decided")
+
+        if engine == "mcts":
+            player = MCTS_Player(side_to_move(board), playouts=playouts, time_limit=time_limit)
+        else:
+            player = AI_Player(
+                side_to_move(board),
+                max_depth=max_depth,
+                time_limit=time_limit,
+                max_nodes=max_nodes,
+                max_memory=max_memory,
+            )
+        lines = None
+        if multipv > 1 and engine != "mcts":
+            lines = player.analyze(board, multipv)
+            # Räckte budgeten inte för djup ett rapporteras samma reservdrag som make_move hade spelat
+            move = lines[0][0] if lines else player.fallback_move(board)
+        else:
+            move = player.make_move(board)
+    except ValueError as error:
+        return {"position": position, "error": str(error)}
+
+    result = {
+        "position": position,
+        "best_move": list(move),
+        "score": player.last_score,
+        "depth": player.last_depth,
+        "nodes": player.nodes,
+        "pv": [list(pv_move) for pv_move in player.principal_variation],
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    if lines is not None:
+        result["lines"] = [
+            {"move": list(line_move), "score": score, "pv": [list(pv_move) for pv_move in pv]}
+            for line_move, score, pv in lines
+        ]
+    return result
+
+
+def read_positions(stream) -> Iterator[str]:
+    """Läs positioner rad för rad och hoppa över tomma rader och kommentarer.
+
+    Args:
+        stream: Öppen textström med en position per rad
+
+    Returns:
+        Iterator[str]: Positioner i textform.
+    """
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Analysera positioner från en fil eller stdin och skriv resultaten som JSON-rader i den takt de blir klara."""
+    parser = argparse.ArgumentParser(description="Batch analysis of gomoku positions.")
+    parser.add_argument("input", nargs="?", default="-", help="file with one position per line, '-' for stdin")
+    parser.add_argument("--rows", type=int, default=19)
+    parser.add_argument("--cols", type=int, default=19)
+    parser.add_argument("--to-win", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=2, help="maximum search depth per position")
+    parser.add_argument("--time", type=float, default=None, help="time budget in seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget per position for minimax")
+    parser.add_argument("--memory", type=int, default=None, help="memory ceiling per worker in MB for minimax")
+    parser.add_argument("--engine", choices=["minimax", "mcts"], default="minimax")
+    parser.add_argument("--playouts", type=int, default=2000, help="playouts per position for mcts")
+    parser.add_argument("--multipv", type=int, default=1, help="number of best moves to report for minimax")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument(
+        "--max-pending", type=int, default=None, help="maximum number of positions in flight (default 4 per worker)"
+    )
+    args = parser.parse_args(argv)
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+
+    workers = args.workers or os.cpu_count() or 1
+    max_pending = args.max_pending or 4 * workers
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    with stream:
+        pending = set()
+        positions = {}
+
+        # Begränsa antalet positioner i luften så att minnet inte växer med indatans storlek
+        for position in read_positions(stream):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write_results(done, positions)
+
+            task = (
+                analyze_position,
+                position,
+                args.rows,
+                args.cols,
+                args.to_win,
+                args.depth,
+                args.time,
+                args.engine,
+                args.playouts,
+                args.nodes,
+                args.memory and args.memory * 1024 * 1024,
+                args.multipv,
+            )
+            try:
+                future = pool.submit(*task)
+            except BrokenProcessPool:
+                # En dödad arbetare gör poolen obrukbar, ersätt den så att resten av positionerna kan analyseras
+                pool.shutdown(wait=False)
+                pool = ProcessPoolExecutor(max_workers=workers)
+                future = pool.submit(*task)
+            positions[future] = position
+            pending.add(future)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write_results(done, positions)
+    pool.shutdown()
+
+
+def write_results(futures, positions: dict) -> None:
+    """Skriv färdiga resultat som JSON-rader till stdout.
+
+    En position vars arbetare kraschade, t.ex. för att processen dödades, rapporteras som ett fel på
+    samma sätt som en ogiltig position i stället för att avbryta hela körningen.
+
+    Args:
+        futures: Färdiga futures från arbetarpoolen
+        positions (dict): Positionen i textform för varje future, posterna tas bort när de skrivs
+    """
+    for future in futures:
+        position = positions.pop(future)
+        try:
+            result = future.result()
+        except Exception as error:
+            result = {"position": position, "error": f"{type(error).__name__}: {error}"}
+        sys.stdout.write(json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
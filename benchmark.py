@@ -0,0 +1,101 @@
+import argparse
+import time
+
+from cluster import *
+from player import *
+from position import *
+
+# Positioner från partier där AI:n spelat mot sig själv, på formen (brädstorlek, draglista)
+BENCHMARK_POSITIONS = [
+    (15, "7,7 6,7 7,8 7,6 5,8 6,8"),
+    (15, "7,7 6,8 6,7 5,7 7,9 7,8 8,8 5,8 4,8 5,9"),
+    (15, "7,7 7,8 6,9 6,7 8,9 7,9 7,10 5,8 9,8 6,11 10,7 11,6 9,7 11,7"),
+    (15, "7,7 8,7 7,8 7,6 9,8 8,8 8,9 8,6 8,5 9,6 10,6 6,6 5,6 6,7 7,10 10,7 6,5 7,9"),
+    (19, "9,9 9,10 10,9 8,9 10,11 10,10 11,10 7,10"),
+    (19, "9,9 10,10 9,8 9,10 8,10 10,8 10,9 11,9 11,10 12,11 8,7 7,6"),
+    (19, "9,9 8,10 7,10 7,9 9,11 9,10 10,10 8,8 8,12 11,9 7,13 6,14 7,12 7,14 6,12 9,12"),
+    (
+        19,
+        "9,9 10,9 9,8 9,10 11,8 10,8 10,7 10,11 10,10 8,9 7,8 11,12 12,13 8,11 7,12 11,11 9,11 11,13 "
+        "11,14 8,12 8,10 10,12",
+    ),
+]
+
+
+def run_benchmark(max_depth: int, evaluation: str = "runs", **options) -> list[dict]:
+    """Sök alla benchmarkpositioner till ett fast djup och mät noder och tid.
+
+    Args:
+        max_depth (int): Sökdjupet
+        evaluation (str): Brädets evalueringsfunktion, "runs" eller "segments"
+        **options: Övriga inställningar för AI_Player, t.ex. late_move_reductions=False
+
+    Returns:
+        list[dict]: Ett resultat per position med drag, poäng, noder och tid i millisekunder.
+    """
+    results = []
+    for size, moves in BENCHMARK_POSITIONS:
+        board = parse_position(moves, size, size, 5, evaluation)
+        player = AI_Player(side_to_move(board), max_depth=max_depth, **options)
+
+        start = time.perf_counter()
+        move = player.make_move(board)
+        results.append(
+            {
+                "position": moves,
+                "move": move,
+                "score": player.last_score,
+                "nodes": player.nodes,
+                "ms": (time.perf_counter() - start) * 1000,
+            }
+        )
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Kör benchmarkpositionerna och skriv ut en tabell, för att jämföra sökinställningar med varandra."""
+    parser = argparse.ArgumentParser(description="Search benchmark over fixed positions.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--no-lmr", action="store_true", help="disable late move reductions")
+    parser.add_argument("--no-futility", action="store_true", help="disable futility pruning")
+    parser.add_argument("--no-quiescence", action="store_true", help="disable quiescence search at the leaves")
+    parser.add_argument("--policy", default=None, help="policy model weights for move ordering")
+    parser.add_argument("--policy-top-k", type=int, default=None, help="quiet moves searched below the root")
+    parser.add_argument("--evaluation", choices=["runs", "segments"], default="runs")
+    parser.add_argument("--workers", nargs="*", default=[], help="search worker addresses, host:port")
+    parser.add_argument("--local-workers", type=int, default=0, help="search worker processes to start on this host")
+    args = parser.parse_args(argv)
+
+    processes, addresses = start_local_workers(args.local_workers)
+    addresses += [parse_address(address) for address in args.workers]
+    cluster = Coordinator(addresses) if addresses else None
+    try:
+        results = run_benchmark(
+            args.depth,
+            args.evaluation,
+            late_move_reductions=not args.no_lmr,
+            futility_pruning=not args.no_futility,
+            quiescence=not args.no_quiescence,
+            policy=args.policy,
+            policy_top_k=args.policy_top_k,
+            cluster=cluster,
+        )
+    finally:
+        if cluster is not None:
+            cluster.close()
+        stop_local_workers(processes)
+
+    print(f"{'#':>2} {'move':>9} {'score':>8} {'nodes':>8} {'ms':>9}")
+    for number, result in enumerate(results, start=1):
+        print(
+            f"{number:>2} {str(result['move']):>9} {str(result['score']):>8} "
+            f"{result['nodes']:>8} {result['ms']:>9.1f}"
+        )
+    print(
+        f"{'total':>20} {sum(result['nodes'] for result in results):>8} "
+        f"{sum(result['ms'] for result in results):>9.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,51 @@
 from hashing import *
-import copy
+from patterns import *
+from segments import *
+
+WIN_SCORE = PARAMETERS["win_score"]  # Poängen för en vunnen position i evaluate_board
 
 
 class Board:
     """Logisk representation av spelbrädet."""
     
-    def __init__(self, rows: int, cols: int, to_win: int) -> None:
+    def __init__(self, rows: int, cols: int, to_win: int, evaluation: str = "runs", rule: str = "freestyle") -> None:
+        if evaluation not in ("runs", "segments"):
+            raise ValueError(f"Unknown evaluation {evaluation!r}")
+        if rule not in RULES:
+            raise ValueError(f"Unknown rule {rule!r}")
+
         self.rows = rows
         self.cols = cols
         self.to_win = to_win
+        self.evaluation = evaluation
+        self.rule = rule
         self.board = self.create_board()
         self.marked_cells = 0
         self.ordered_moves: list[tuple[int, int]] = []
+        # Packade linjer per riktning, som håller fönstren för mönstertabellerna uppdaterade
+        self.lines = [
+            [empty_line(length, to_win) for length in lengths]
+            for lengths in line_geometry(rows, cols)[1]
+        ]
+        # Hotindex per spelare: hotklass per riktning för tomma celler, samt cellerna per hotklass
+        self.track_threats = True
+        self.cell_threats = {"X": {}, "O": {}}
+        self.threats = {
+            symbol: {threat: set() for threat in range(THREE, FIVE + 1)} for symbol in ("X", "O")
+        }
+        # Renju: riktningarna där ett drag av X ger överlinje respektive två fyror på samma linje, samt de
+        # tomma celler där X inte får spela
+        self.cell_overlines = {}
+        self.cell_double_fours = {}
+        self.forbidden = set()
+        # Antal symboler per spelare i varje segment av längd to_win, brädets segmentpoäng för X och antal fulla segment
+        segments = len(segment_index(rows, cols, to_win).segments)
+        self.segment_counts = {"X": [0] * segments, "O": [0] * segments}
+        self.segment_score = 0
+        self.completed_segments = {"X": 0, "O": 0}
+        # Zobrist-nyckel för positionen, uppdateras stegvis i mark_cell och undo_cell
+        self.zobrist = zobrist_table(rows, cols)
+        self.hash = 0
 
     def create_board(self) -> list[list[int]]:
         """Skapa en spelplan för att representera matchens tillstånd samt för att kunna visualisera spelplanen grafiskt.
@@ -19,9 +53,35 @@ class Board:
         Returns:
             list[list[int]]: Brädet representerat av en 2 dimensionell lista.
         """
-        self.board = [[0 for _ in range(self.rows)] for _ in range(self.cols)]
+        self.board = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
         return self.board
 
+    def copy(self) -> "Board":
+        """Returnera en kopia av brädet, betydligt snabbare än copy.deepcopy eftersom bara de föränderliga listorna kopieras.
+
+        Returns:
+            Board: Ett nytt brädobjekt med samma tillstånd.
+        """
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.board = [row[:] for row in self.board]
+        board.ordered_moves = self.ordered_moves[:]
+        board.lines = [lines[:] for lines in self.lines]
+        board.cell_threats = {
+            symbol: {cell: classes[:] for cell, classes in cells.items()}
+            for symbol, cells in self.cell_threats.items()
+        }
+        board.threats = {
+            symbol: {threat: cells.copy() for threat, cells in threats.items()}
+            for symbol, threats in self.threats.items()
+        }
+        board.cell_overlines = {cell: overlines[:] for cell, overlines in self.cell_overlines.items()}
+        board.cell_double_fours = {cell: fours[:] for cell, fours in self.cell_double_fours.items()}
+        board.forbidden = self.forbidden.copy()
+        board.segment_counts = {symbol: counts[:] for symbol, counts in self.segment_counts.items()}
+        board.completed_segments = self.completed_segments.copy()
+        return board
+
     def get_empty_cells(self) -> list[tuple[int, int]]:
         """Returnera drag som inte har gjorts, för att underlätta felhantering när vi ska kontrollera om ett drag är godkänt.
 
@@ -56,6 +116,244 @@ class Board:
         self.board[position[0]][position[1]] = symbol
         self.marked_cells += 1
         self.ordered_moves.append((position[0], position[1]))
+        self.hash ^= self.zobrist[position[0]][position[1]][index_of(symbol)]
+
+        code = cell_code(symbol)
+        cell_lines = line_geometry(self.rows, self.cols)[0]
+        for direction in range(len(DIRECTIONS)):
+            line, index = cell_lines[direction][position[0]][position[1]]
+            self.lines[direction][line] |= code << (2 * (index + self.to_win))
+
+        self.update_segments(symbol, position, 1)
+
+        if self.track_threats:
+            self.update_threats(position)
+
+    def undo_cell(self) -> tuple[int, int]:
+        """Ångra det senast markerade draget, så att AI:n kan söka i samma brädobjekt i stället för att kopiera det.
+
+        Returns:
+            tuple[int, int]: Positionen som tömdes (row, col)
+        """
+        position = self.ordered_moves.pop()
+        symbol = self.board[position[0]][position[1]]
+        self.board[position[0]][position[1]] = 0
+        self.marked_cells -= 1
+        self.hash ^= self.zobrist[position[0]][position[1]][index_of(symbol)]
+
+        cell_lines = line_geometry(self.rows, self.cols)[0]
+        for direction in range(len(DIRECTIONS)):
+            line, index = cell_lines[direction][position[0]][position[1]]
+            self.lines[direction][line] &= ~(3 << (2 * (index + self.to_win)))
+
+        self.update_segments(symbol, position, -1)
+
+        if self.track_threats:
+            self.update_threats(position)
+        return position
+
+    def update_segments(self, symbol: str, position: tuple[int, int], change: int) -> None:
+        """Uppdatera antalet symboler i segmenten genom en position, samt segmentpoängen och antalet fulla segment.
+
+        Args:
+            symbol (str): Symbolen som placerades eller togs bort
+            position (tuple[int, int]): Positionen som ändrades (row, col)
+            change (int): 1 när symbolen placerades, -1 när den togs bort
+        """
+        index = segment_index(self.rows, self.cols, self.to_win)
+        x_counts = self.segment_counts["X"]
+        o_counts = self.segment_counts["O"]
+        counts = self.segment_counts[symbol]
+        scores = index.scores
+        score = self.segment_score
+
+        for segment in index.cell_segments[position[0]][position[1]]:
+            score -= scores[x_counts[segment]][o_counts[segment]]
+            if counts[segment] == self.to_win:
+                self.completed_segments[symbol] -= 1
+            counts[segment] += change
+            if counts[segment] == self.to_win:
+                self.completed_segments[symbol] += 1
+            score += scores[x_counts[segment]][o_counts[segment]]
+
+        self.segment_score = score
+
+    def update_threats(self, position: tuple[int, int]) -> None:
+        """Uppdatera hotindexet efter att en position markerats eller tömts.
+
+        Bara tomma celler inom hottabellernas radie från positionen, längs linjen i respektive riktning, kan ha
+        fått ett annat fönster. Hotklassen räknas om för dem i den riktningen.
+
+        Args:
+            position (tuple[int, int]): Positionen som ändrades (row, col)
+        """
+        tables = get_tables(self.to_win, self.rule)
+        cell_lines, line_lengths = line_geometry(self.rows, self.cols)
+        radius = tables.threat_radius
+        side_mask = (1 << (2 * radius)) - 1
+        renju = tables.overline_x is not None
+
+        for direction, (dr, dc) in enumerate(DIRECTIONS):
+            line_id, index = cell_lines[direction][position[0]][position[1]]
+            line = self.lines[direction][line_id]
+            length = line_lengths[direction][line_id]
+
+            for offset in range(-radius, radius + 1):
+                if not 0 <= index + offset < length:
+                    continue
+
+                cell = (position[0] + offset * dr, position[1] + offset * dc)
+                window = line >> (2 * (index + offset - radius + self.to_win))
+                if (window >> (2 * radius)) & 3:
+                    if offset == 0:
+                        self.clear_threats(cell)
+                    continue  # Markerade celler kan inte spelas och saknar hot
+
+                code = (window & side_mask) | (((window >> (2 * radius + 2)) & side_mask) << (2 * radius))
+                self.set_threat("X", cell, direction, tables.threat_x[code])
+                self.set_threat("O", cell, direction, tables.threat_o[code])
+                if renju:
+                    self.set_line_flag(self.cell_overlines, cell, direction, tables.overline_x[code])
+                    self.set_line_flag(self.cell_double_fours, cell, direction, tables.double_four_x[code])
+                    self.update_forbidden(cell)
+
+    def set_threat(self, symbol: str, cell: tuple[int, int], direction: int, threat: int) -> None:
+        """Sätt hotklassen för en cell i en riktning och uppdatera mängderna av celler per hotklass."""
+        classes = self.cell_threats[symbol].get(cell)
+        previous = classes[direction] if classes is not None else NONE
+        if previous == threat:
+            return
+
+        if classes is None:
+            classes = self.cell_threats[symbol][cell] = [NONE] * len(DIRECTIONS)
+        classes[direction] = threat
+
+        if previous != NONE and previous not in classes:
+            self.threats[symbol][previous].discard(cell)
+        if threat != NONE:
+            self.threats[symbol][threat].add(cell)
+        if not any(classes):
+            del self.cell_threats[symbol][cell]
+
+    def clear_threats(self, cell: tuple[int, int]) -> None:
+        """Ta bort en nyss markerad cell ur hotindexet."""
+        for symbol in ("X", "O"):
+            classes = self.cell_threats[symbol].pop(cell, None)
+            if classes is not None:
+                for threat in set(classes) - {NONE}:
+                    self.threats[symbol][threat].discard(cell)
+        self.cell_overlines.pop(cell, None)
+        self.cell_double_fours.pop(cell, None)
+        self.forbidden.discard(cell)
+
+    @staticmethod
+    def set_line_flag(flags: dict, cell: tuple[int, int], direction: int, value: int) -> None:
+        """Markera om ett drag av X på en tom cell ger en överlinje eller en dubbelfyra i en riktning (renju).
+
+        Args:
+            flags (dict): cell_overlines eller cell_double_fours
+            cell (tuple[int, int]): Den tomma cellen
+            direction (int): Index för riktningen i DIRECTIONS
+            value (int): 1 om draget ger överlinjen eller dubbelfyran i riktningen, annars 0
+        """
+        directions = flags.get(cell)
+        if directions is None:
+            if not value:
+                return
+            directions = flags[cell] = [0] * len(DIRECTIONS)
+        directions[direction] = value
+        if not any(directions):
+            del flags[cell]
+
+    def update_forbidden(self, cell: tuple[int, int]) -> None:
+        """Räkna om om en tom cell är ett förbjudet drag för X under renju.
+
+        Ett drag som ger exakt fem i rad är alltid tillåtet. Annars är överlinje, två fyror (dubbelfyra), även
+        på samma linje, och två öppna treor (dubbeltrea) förbjudna. Treorna prövas inte rekursivt, dvs en trea räknas som öppen
+        även om draget som gör den till en öppen fyra i sin tur skulle vara förbjudet.
+        """
+        classes = self.cell_threats["X"].get(cell)
+        if classes is not None and FIVE in classes:
+            forbidden = False
+        elif cell in self.cell_overlines or cell in self.cell_double_fours:
+            forbidden = True
+        elif classes is None:
+            forbidden = False
+        else:
+            fours = sum(threat >= FOUR for threat in classes)
+            forbidden = fours >= 2 or classes.count(OPEN_THREE) >= 2
+
+        if forbidden:
+            self.forbidden.add(cell)
+        else:
+            self.forbidden.discard(cell)
+
+    def is_forbidden(self, symbol: str, position: tuple[int, int]) -> bool:
+        """Kontrollera om ett drag är förbjudet för en spelare, vilket bara förekommer för X under renju.
+
+        Args:
+            symbol (str): Evaluerad symbol
+            position (tuple[int, int]): Evaluerad tom position på brädet (row, col)
+
+        Returns:
+            bool: True om draget är förbjudet annars False.
+        """
+        if self.rule != "renju" or symbol != "X":
+            return False
+        if self.track_threats:
+            return position in self.forbidden
+
+        tables = get_tables(self.to_win, self.rule)
+        classes = [tables.threat_x[self.threat_code(position, direction)] for direction in range(len(DIRECTIONS))]
+        if FIVE in classes:
+            return False
+        codes = [self.threat_code(position, direction) for direction in range(len(DIRECTIONS))]
+        if any(tables.overline_x[code] or tables.double_four_x[code] for code in codes):
+            return True
+        return sum(threat >= FOUR for threat in classes) >= 2 or classes.count(OPEN_THREE) >= 2
+
+    def window(self, position: tuple[int, int], direction: int) -> int:
+        """Returnera det packade fönstret kring en position, vilket används som index i mönstertabellerna.
+
+        Args:
+            position (tuple[int, int]): Evaluerad position på brädet (row, col)
+            direction (int): Index för riktningen i DIRECTIONS
+
+        Returns:
+            int: Fönstrets kod utan den evaluerade cellen.
+        """
+        line, index = line_geometry(self.rows, self.cols)[0][direction][position[0]][position[1]]
+        window = self.lines[direction][line] >> (2 * index)
+        side_mask = (1 << (2 * self.to_win)) - 1
+        return (window & side_mask) | (((window >> (2 * self.to_win + 2)) & side_mask) << (2 * self.to_win))
+
+    def threat_class(self, symbol: str, position: tuple[int, int]) -> int:
+        """Returnera det starkaste hotet som uppstår om en spelare placerar sin symbol på en tom position.
+
+        Args:
+            symbol (str): Evaluerad symbol
+            position (tuple[int, int]): Evaluerad position på brädet (row, col)
+
+        Returns:
+            int: Hotklassen, från NONE till FIVE.
+        """
+        if self.track_threats:
+            classes = self.cell_threats[symbol].get(position)
+            return max(classes) if classes is not None else NONE
+
+        tables = get_tables(self.to_win, self.rule)
+        threats = tables.threat_x if symbol == "X" else tables.threat_o
+        return max(threats[self.threat_code(position, direction)] for direction in range(len(DIRECTIONS)))
+
+    def threat_code(self, position: tuple[int, int], direction: int) -> int:
+        """Returnera fönstret kring en position med hottabellernas radie, vilket används som index i hottabellerna."""
+        radius = get_tables(self.to_win, self.rule).threat_radius
+        trim = self.to_win - radius
+        inner_mask = (1 << (2 * radius)) - 1
+        window = self.window(position, direction)
+        return ((window >> (2 * trim)) & inner_mask) | (
+            ((window >> (2 * self.to_win)) & inner_mask) << (2 * radius)
+        )
 
     def is_winning_move(self, symbol: int, move: tuple[int, int]) -> bool:
         """Kontrollera om ett drag är ett vinnande drag för att minska tiden AI:n tar på att göra vinnande drag.
@@ -67,10 +365,9 @@ class Board:
         Returns:
             bool: True om draget leder till vinst annars False.
         """
-        temp_board = copy.deepcopy(self)
-        temp_board.mark_cell(symbol, move)
-
-        return temp_board.is_winner(symbol)
+        if self.track_threats:
+            return move in self.threats[symbol][FIVE]
+        return self.threat_class(symbol, move) == FIVE
 
     def board_full(self) -> True:
         """Kontrollera om brädet är fullt, vilken används för att kontrollera om en omgång är slut.
@@ -92,12 +389,42 @@ class Board:
     def get_potential_moves(self, symbol: str) -> list[tuple[int, int]]:
         """Returnera en lista med potentiella drag kring drag som redan gjorts för att minska antalet drag som AI:n behöver evaluera i minimax algoritmen.
 
+        Om spelaren kan vinna direkt returneras bara de vinnande dragen, och om motståndaren hotar att vinna
+        returneras bara de drag som blockerar hotet.
+
         Args:
             symbol (str): Spelarens symbol 
 
         Returns:
             list[tuple[int, int]]: Drag dikt an drag som redan gjorts.
         """
+        potential_moves = self.candidate_cells()
+
+        # Under renju får X inte spela förbjudna drag
+        if self.rule == "renju" and symbol == "X":
+            potential_moves = {move for move in potential_moves if not self.is_forbidden(symbol, move)}
+            if not potential_moves:
+                potential_moves = {move for move in self.get_empty_cells() if not self.is_forbidden(symbol, move)}
+
+        # Kan spelaren vinna direkt räcker det att pröva de vinnande dragen
+        winning_moves = [move for move in potential_moves if self.is_winning_move(symbol, move)]
+        if winning_moves:
+            return winning_moves
+
+        # Har motståndaren en fyra måste den blockeras, övriga drag förlorar direkt
+        opponent = "O" if symbol == "X" else "X"
+        forced_moves = [move for move in potential_moves if self.is_winning_move(opponent, move)]
+        if forced_moves:
+            return forced_moves
+
+        return list(potential_moves)
+
+    def candidate_cells(self) -> set[tuple[int, int]]:
+        """Returnera de tomma cellerna intill drag som redan gjorts, vilka är kandidaterna för nästa drag.
+
+        Returns:
+            set[tuple[int, int]]: Tomma grannceller på formen (row, col).
+        """
         potential_moves = set()
 
         # Gränsvektorer för att kontrollera cellerna kring en given position (upp, ner, vänster, höger, diagonaler)
@@ -118,14 +445,34 @@ class Board:
                 ):
                     potential_moves.add(neighbor)
 
-        sorted_moves = []
-        for move in list(potential_moves):
-            if self.is_winning_move(symbol, move):
-                sorted_moves.insert(0, move)
-            else:
-                sorted_moves.append(move)
+        return potential_moves
+
+    def is_candidate(self, position: tuple[int, int]) -> bool:
+        """Kontrollera om en position är en av candidate_cells, utan att bygga hela mängden.
 
-        return sorted_moves
+        Args:
+            position (tuple[int, int]): Evaluerad position på brädet (row, col)
+
+        Returns:
+            bool: True om positionen är tom och har en markerad granncell annars False.
+        """
+        row, col = position
+        if self.out_of_range(position) or self.board[row][col] != 0:
+            return False
+        return any(
+            0 <= row + dr < self.rows and 0 <= col + dc < self.cols and self.board[row + dr][col + dc] != 0
+            for dr, dc in NEIGHBORS
+        )
+
+    def open_three_score(self) -> int:
+        """Poängen för en öppen trea i brädets evaluering, som sökningens marginaler skalas efter.
+
+        Returns:
+            int: Poängen för en öppen trea, minst 1.
+        """
+        if self.evaluation == "segments":
+            return SEGMENT_SCORES[3]
+        return max(RUN_SCORES.get(3, (0, 0))[0], 1)
 
     def evaluate_board(
         self, player_symbol: str, opponent_symbol: str
@@ -139,40 +486,37 @@ class Board:
         Returns:
             int: Brädets relativa värde
         """
-        score = 0
-        already_evaluated = set()
-
         if self.is_winner(player_symbol):
-            return float("100000") 
+            return WIN_SCORE
 
         if self.is_winner(opponent_symbol):
-            return float("-100000")
+            return -WIN_SCORE
 
-        directions = [
-            (1, 0),
-            (0, 1),
-            (1, 1),
-            (-1, 1),
-        ]  # Horisontellt, vertikalt, diagonaler
-
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.board[row][col] != 0:
-                    continue  # Hoppa över redan markerade celler
-
-                for direction in directions:
-                    # Generera en unik key för respektive evaluerad "linje"
-                    line_key = (row, col, direction)
-                    if line_key in already_evaluated:
-                        continue  # Hoppa över redan evaluerade "linjer"
-
-                    line_score = self.evaluate_line_with_defense(
-                        row, col, direction, player_symbol, opponent_symbol
-                    )
-                    score += line_score
-                    already_evaluated.add(line_key)
+        if self.evaluation == "segments":
+            return self.segment_score if player_symbol == "X" else -self.segment_score
 
-        return score
+        tables = get_tables(self.to_win, self.rule)
+        side_mask = (1 << (2 * self.to_win)) - 1
+        center_shift = 2 * self.to_win
+        head_shift = 2 * self.to_win + 2
+        line_lengths = line_geometry(self.rows, self.cols)[1]
+
+        # Summera X:s poäng minus O:s poäng för varje tom cell i varje riktning (horisontellt, vertikalt, diagonaler)
+        score = 0
+        for lines, lengths in zip(self.lines, line_lengths):
+            for line, length in zip(lines, lengths):
+                if not (line >> center_shift) & ((1 << (2 * length)) - 1):
+                    continue  # Hoppa över tomma linjer, där inget fönster ger poäng
+
+                for index in range(length):
+                    window = line >> (2 * index)
+                    if (window >> center_shift) & 3:
+                        continue  # Hoppa över redan markerade celler
+
+                    code = (window & side_mask) | (((window >> head_shift) & side_mask) << center_shift)
+                    score += tables.score_x[code] - tables.score_o[code]
+
+        return score if player_symbol == "X" else -score
 
     def evaluate_line_with_defense(
         self,
@@ -234,53 +578,9 @@ class Board:
         Returns:
             int: Linjens värde
         """
-        
-        cur_len = 0
-        blocked_start = False
-        blocked_end = False
-        max_range = self.to_win
-
-        head = (row + direction[0], col + direction[1])
-        # Evaluera i ena riktningen upp till max_range celler
-        if not self.out_of_range(head):
-            while self.board[head[0]][head[1]] == symbol and cur_len < max_range:
-                cur_len += 1
-                head = (head[0] + direction[0], head[1] + direction[1])
-                if self.out_of_range(head):
-                    break
-            if self.out_of_range(head) or self.board[head[0]][head[1]] != 0:
-                blocked_end = True
-
-        tail = (row - direction[0], col - direction[1])
-        # Evaluera i andra riktningen upp till max_range celler
-        if not self.out_of_range(tail):
-            while self.board[tail[0]][tail[1]] == symbol and cur_len < max_range:
-                cur_len += 1
-                tail = (tail[0] - direction[0], tail[1] - direction[1])
-                if self.out_of_range(tail):
-                    break
-            if self.out_of_range(tail) or self.board[tail[0]][tail[1]] != 0:
-                blocked_start = True
-
-        # Poängsättning baserat på antal symboler i rad
-        score = 0
-        if cur_len == 4:
-            if not blocked_start and not blocked_end:
-                score = 10000
-            elif not blocked_start or not blocked_end:
-                score = 5000
-        elif cur_len == 3:
-            if not blocked_start and not blocked_end:
-                score = 1000
-            elif not blocked_start or not blocked_end:
-                score = 500
-        elif cur_len == 2:
-            if not blocked_start and not blocked_end:
-                score = 100
-            elif not blocked_start or not blocked_end:
-                score = 50
-
-        return score
+        tables = get_tables(self.to_win, self.rule)
+        scores = tables.score_x if symbol == "X" else tables.score_o
+        return scores[self.window((row, col), DIRECTIONS.index(direction))]
 
     def is_winner(self, player_symbol: str) -> bool:
         """Evaluera om en spelare vunnit givet dess symbol, för att kunna veta när en omgång ska avslutas samt vilka drag som AI:n ska prioritera.
@@ -291,37 +591,26 @@ class Board:
         Returns:
             bool: True om spelaren vunnit eller False om spelaren inte vunnit
         """
-
-        for row in range(self.rows):
-            for col in range(self.cols - self.to_win + 1):
-                if all(
-                    self.board[row][col + i] == player_symbol
-                    for i in range(self.to_win)
-                ):
-                    return True
-
-        for col in range(self.cols):
-            for row in range(self.rows - self.to_win + 1):
-                if all(
-                    self.board[row + i][col] == player_symbol
-                    for i in range(self.to_win)
-                ):
-                    return True
-
-        for row in range(self.rows - self.to_win + 1):
-            for col in range(self.cols - self.to_win + 1):
-                if all(
-                    self.board[row + i][col + i] == player_symbol
-                    for i in range(self.to_win)
-                ):
-                    return True
-
-        for row in range(self.to_win - 1, self.rows):
-            for col in range(self.cols - self.to_win + 1):
-                if all(
-                    self.board[row - i][col + i] == player_symbol
-                    for i in range(self.to_win)
-                ):
+        # Ett segment där alla to_win celler har spelarens symbol är en vinst
+        if not self.completed_segments[player_symbol]:
+            return False
+        if not self.exact_five(player_symbol):
+            return True
+
+        # Med exakt fem måste raden avgränsas av något annat än spelarens symbol i båda ändar
+        code = cell_code(player_symbol)
+        for lines in self.lines:
+            for line in lines:
+                # En bit per cell som innehåller spelarens symbol (kantcellerna har båda bitarna satta)
+                cells = (line >> (code - 1)) & ~(line >> (2 - code)) & CELL_MASK
+                runs = cells
+                for _ in range(self.to_win - 1):
+                    runs &= runs >> 2
+                if runs & ~(cells << 2) & ~(cells >> (2 * self.to_win)):
                     return True
 
         return False
+
+    def exact_five(self, symbol: str) -> bool:
+        """Kontrollera om en spelare måste få exakt to_win i rad för att vinna under brädets regelvariant."""
+        return self.rule == "exact" or (self.rule == "renju" and symbol == "X")
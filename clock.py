@@ -0,0 +1,95 @@
+import time
+
+
+class GameClock:
+    """Schackklocka för en spelomgång, med en tidsbank per spelare och ett tillägg efter varje drag."""
+
+    def __init__(self, initial: float, increment: float = 0.0, symbols: tuple[str, str] = ("X", "O")) -> None:
+        self.initial = initial
+        self.increment = increment
+        self.remaining = {symbol: float(initial) for symbol in symbols}
+        self.running_symbol = None
+        self.started_at = None
+
+    def start(self, symbol: str) -> None:
+        """Starta klockan för spelaren som ska göra nästa drag."""
+        self.running_symbol = symbol
+        self.started_at = time.perf_counter()
+
+    def stop(self) -> float:
+        """Stoppa den gående klockan, dra av den förbrukade tiden och lägg till tillägget.
+
+        Returns:
+            float: Tiden draget tog i sekunder.
+        """
+        elapsed = time.perf_counter() - self.started_at
+        self.remaining[self.running_symbol] -= elapsed
+        if self.remaining[self.running_symbol] >= 0:
+            self.remaining[self.running_symbol] += self.increment
+        self.running_symbol = None
+        self.started_at = None
+        return elapsed
+
+    def time_left(self, symbol: str) -> float:
+        """Returnera spelarens återstående tid i sekunder, inklusive tid som förbrukas just nu."""
+        remaining = self.remaining[symbol]
+        if symbol == self.running_symbol:
+            remaining -= time.perf_counter() - self.started_at
+        return remaining
+
+    def is_flagged(self, symbol: str) -> bool:
+        """Kontrollera om spelarens tid har tagit slut, vilket innebär förlust."""
+        return self.time_left(symbol) < 0
+
+
+class TimeManager:
+    """Fördelar en spelares återstående tid på dragen, så att AI:n aldrig förlorar på tid men lägger tiden där den behövs."""
+
+    def __init__(
+        self,
+        expected_moves: int = 30,
+        minimum_moves_to_go: int = 10,
+        safety_margin: float = 0.1,
+        volatility_scale: float = 2000.0,
+    ) -> None:
+        self.expected_moves = expected_moves
+        self.minimum_moves_to_go = minimum_moves_to_go
+        self.safety_margin = safety_margin
+        self.volatility_scale = volatility_scale
+
+    def allocate(self, remaining: float, increment: float, move_number: int, volatility: float = 0.0) -> float:
+        """Beräkna tidsbudgeten för ett drag.
+
+        Grundbudgeten är den återstående tiden fördelad på de drag som förväntas återstå plus större delen av
+        tillägget. Budgeten ökas upp till det dubbla när poängen svängt mellan sökvarven i föregående sökning,
+        och begränsas så att det alltid finns tid kvar för resten av partiet.
+
+        Args:
+            remaining (float): Spelarens återstående tid i sekunder
+            increment (float): Tillägg per drag i sekunder
+            move_number (int): Spelarens dragnummer, från 0
+            volatility (float): Största poängsvängningen mellan sökvarven i föregående sökning
+
+        Returns:
+            float: Tidsbudgeten för draget i sekunder.
+        """
+        usable = max(remaining - self.safety_margin, 0.0)
+        moves_to_go = max(self.expected_moves - move_number, self.minimum_moves_to_go)
+
+        budget = usable / moves_to_go + 0.8 * increment
+        budget *= 1.0 + min(volatility / self.volatility_scale, 1.0)
+
+        # Lägg aldrig mer än en fjärdedel av den användbara tiden på ett enskilt drag
+        return min(budget, usable / 4)
+
+
+def score_volatility(scores: list[float]) -> float:
+    """Returnera den största poängsvängningen mellan två på varandra följande sökvarv.
+
+    Args:
+        scores (list[float]): Poängen från varje fullständigt sökvarv
+
+    Returns:
+        float: Största absoluta skillnaden, 0 om färre än två varv.
+    """
+    return max((abs(after - before) for before, after in zip(scores, scores[1:])), default=0.0)
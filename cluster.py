@@ -0,0 +1,522 @@
+import argparse
+import json
+import os
+import selectors
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from player import *
+from position import *
+
+# Ökas när protokollet ändras, så att en koordinator inte använder arbetare med en annan version
+PROTOCOL_VERSION = 1
+
+# AI_Players inställningar som skickas med varje jobb, så att arbetarna söker på samma sätt som koordinatorn.
+# Policymodellen skickas inte, arbetarna sorterar dragen utan den
+WORKER_OPTIONS = (
+    "late_move_reductions",
+    "reduction_threshold",
+    "futility_pruning",
+    "futility_margin",
+    "table_size",
+    "quiescence",
+    "quiescence_depth",
+    "quiescence_nodes",
+)
+
+# Högsta antal AI_Player som en arbetare behåller, var och en med sin egen transpositionstabell
+MAX_PLAYERS = 8
+
+
+def parse_address(text: str) -> tuple[str, int]:
+    """Tolka en adress på formen "host:port", eller bara "port" för localhost.
+
+    Raises:
+        ValueError: Om porten inte är ett heltal.
+    """
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def search_child(
+    player: AI_Player, board: Board, move: tuple[int, int], max_depth: int, alpha: float
+) -> tuple[int, list[tuple[int, int]]]:
+    """Sök ett rotdrag med fönstret (alpha, oändligheten), på samma sätt som minimax söker rotens barn.
+
+    Ett värde som inte är större än alpha är bara en övre gräns, ett större värde är exakt.
+
+    Args:
+        player (AI_Player): Spelaren som söker, med rotspelarens symbol
+        board (Board): Rotpositionen, återställs innan funktionen returnerar
+        move (tuple[int, int]): Rotdraget
+        max_depth (int): Djupet för varvet, räknat från roten
+        alpha (float): Bästa värdet hittills vid roten
+
+    Returns:
+        tuple[int, list[tuple[int, int]]]: Poängen och principalvariationen från roten.
+    """
+    board.mark_cell(player.symbol, move)
+    try:
+        score, _, pv = player.minimax(board, 1, max_depth, alpha, float("inf"), False)
+    finally:
+        board.undo_cell()
+    return score, [move] + pv
+
+
+class Worker:
+    """Söker rotdrag åt en koordinator, se Coordinator för protokollet.
+
+    En AI_Player behålls per brädstorlek, regel, evaluering, symbol och inställningar, så att transpositionstabellen,
+    killer-dragen och historiken från tidigare jobb används i nästa. Jobben söks ett i taget, så en dator med
+    flera kärnor kör en arbetarprocess per kärna. Bara inställningarna i WORKER_OPTIONS tas emot, och högst
+    MAX_PLAYERS spelare behålls, så att en klient inte kan styra övriga konstruktorargument eller minnet.
+    """
+
+    def __init__(self) -> None:
+        self.players: dict[tuple, AI_Player] = {}
+        self.lock = threading.Lock()
+        self.jobs = 0
+
+    def handle(self, message: dict) -> dict:
+        """Besvara ett meddelande från koordinatorn.
+
+        Raises:
+            KeyError: Om ett obligatoriskt fält saknas.
+            ValueError: Om kommandot eller positionen inte går att tolka.
+        """
+        if message["cmd"] == "ping":
+            return {"ok": True, "version": PROTOCOL_VERSION, "jobs": self.jobs}
+        if message["cmd"] != "search":
+            raise ValueError(f"Unknown command {message['cmd']!r}")
+
+        board = parse_position(
+            message["moves"], message["rows"], message["cols"], message["to_win"], message["evaluation"], message["rule"]
+        )
+        options = {name: value for name, value in message["options"].items() if name in WORKER_OPTIONS}
+        key = (
+            message["rows"],
+            message["cols"],
+            message["to_win"],
+            message["rule"],
+            message["evaluation"],
+            message["symbol"],
+            json.dumps(options, sort_keys=True),
+        )
+        alpha = float("-inf") if message["alpha"] is None else message["alpha"]
+
+        with self.lock:
+            player = self.players.get(key)
+            if player is None:
+                if len(self.players) >= MAX_PLAYERS:
+                    del self.players[next(iter(self.players))]  # Den äldsta spelaren tas bort
+                player = self.players[key] = AI_Player(
+                    message["symbol"], max_depth=message["depth"], proof_search=False, **options
+                )
+            player.max_depth = message["depth"]
+            player.nodes = 0
+            # Ett jobb som koordinatorn har gett upp får inte blockera låset, så sökningen avbryts senast vid timeout
+            limits = [limit for limit in (message["time"], message.get("timeout")) if limit is not None]
+            player.deadline = time.perf_counter() + min(limits) if limits else None
+            player.node_limit = message["nodes"]
+            player.set_margins(board)
+
+            try:
+                score, pv = search_child(player, board, tuple(message["move"]), message["depth"], alpha)
+            except SearchLimitReached as limit:
+                return {"ok": False, "error": "limit", "limit": str(limit), "nodes": player.nodes}
+            self.jobs += 1
+            return {"ok": True, "score": score, "pv": [list(move) for move in pv], "nodes": player.nodes}
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """En anslutning från en koordinator: en JSON-förfrågan per rad och ett svar per rad, med förfrågans id."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            message = {}
+            try:
+                message = json.loads(line)
+                response = self.server.worker.handle(message)
+            except (KeyError, TypeError, ValueError) as error:
+                response = {"ok": False, "error": str(error)}
+            response["id"] = message.get("id") if isinstance(message, dict) else None
+            try:
+                self.wfile.write((json.dumps(response) + "\n").encode())
+            except OSError:
+                return  # Koordinatorn har gett upp jobbet och stängt anslutningen
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """TCP-server för en Worker. Flera koordinatorer kan vara anslutna, men jobben söks ett i taget."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple[str, int]) -> None:
+        super().__init__(address, WorkerHandler)
+        self.worker = Worker()
+
+
+class WorkerConnection:
+    """Koordinatorns anslutning till en arbetare, med högst ett jobb ute åt gången."""
+
+    def __init__(self, address: tuple[str, int]) -> None:
+        self.address = address
+        self.socket: socket.socket | None = None
+        self.file = None
+        self.next_id = 0
+        self.expected: int | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self.socket is not None
+
+    def connect(self, timeout: float) -> None:
+        """Anslut och kontrollera att arbetaren talar samma protokollversion.
+
+        Raises:
+            OSError: Om arbetaren inte går att nå.
+            ConnectionError: Om arbetaren har en annan protokollversion.
+        """
+        self.socket = socket.create_connection(self.address, timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile("rb")
+        self.expected = None
+        self.send({"cmd": "ping"})
+        response = self.receive(timeout)
+        if response.get("version") != PROTOCOL_VERSION:
+            self.close()
+            raise ConnectionError(f"worker {self.address} speaks protocol {response.get('version')}")
+
+    def send(self, message: dict) -> None:
+        """Skicka en förfrågan med ett nytt id, svaret hämtas med receive."""
+        self.next_id += 1
+        self.expected = self.next_id
+        self.socket.sendall((json.dumps({**message, "id": self.next_id}) + "\n").encode())
+
+    def receive(self, timeout: float) -> dict:
+        """Vänta på svaret på den senaste förfrågan. Svar på äldre, övergivna förfrågningar hoppas över.
+
+        Raises:
+            OSError: Om anslutningen bryts eller svaret inte kommer inom tiden (socket.timeout).
+            ValueError: Om svaret inte är giltig JSON.
+        """
+        self.socket.settimeout(timeout)
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError(f"worker {self.address} closed the connection")
+            response = json.loads(line)
+            if response.get("id") == self.expected:
+                self.expected = None
+                return response
+
+    def close(self) -> None:
+        """Stäng anslutningen, arbetaren räknas som död tills den ansluts igen."""
+        if self.socket is not None:
+            try:
+                self.file.close()
+                self.socket.close()
+            except OSError:
+                pass
+        self.socket = None
+        self.file = None
+        self.expected = None
+
+
+class Coordinator:
+    """Fördelar rotdragen i AI_Players sökning på arbetarprocesser, på samma eller andra datorer, över TCP.
+
+    Protokollet är radbaserad JSON, likt server.py. Positionen skickas som draglista (se encode_moves):
+        * {"cmd": "ping", "id": 1} -> {"ok": true, "version": 1, "jobs": 0, "id": 1}
+        * {"cmd": "search", "id": 2, "moves": "7,7 8,8", "rows": 15, "cols": 15, "to_win": 5,
+          "evaluation": "runs", "rule": "freestyle", "symbol": "X", "move": [7, 8], "depth": 4,
+          "alpha": null, "time": 9.5, "timeout": 10.5, "nodes": null, "options": {...}}
+          -> {"ok": true, "score": 120, "pv": [[7, 8], [7, 9]], "nodes": 5310, "id": 2}
+    Om arbetarens budget tar slut svarar den {"ok": false, "error": "limit"}. Efter timeout sekunder har
+    koordinatorn gett upp jobbet, och arbetaren avbryter då sökningen så att den kan ta nästa jobb.
+
+    Varje varv söks först det bästa rotdraget ensamt med hela fönstret, och sedan de övriga parallellt med
+    fönstret (bästa värdet hittills, oändligheten), så att de senare dragen får avskärningar från de tidigare.
+    En arbetare som inte svarar inom timeout sekunder eller tappar anslutningen kopplas bort, och dess jobb ges
+    till en annan arbetare. Ett jobb som har misslyckats retries gånger, eller som inte har någon levande
+    arbetare kvar, söks lokalt av AI_Player. Bortkopplade arbetare ansluts igen vid nästa varv.
+    """
+
+    def __init__(
+        self,
+        addresses: list[tuple[str, int]],
+        timeout: float = 30.0,
+        connect_timeout: float = 2.0,
+        retries: int = 2,
+    ) -> None:
+        self.workers = [WorkerConnection(address) for address in addresses]
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.reassigned = 0
+
+    def connect(self) -> list[WorkerConnection]:
+        """Anslut arbetare som inte är anslutna och returnera de levande."""
+        for worker in self.workers:
+            if not worker.alive:
+                try:
+                    worker.connect(self.connect_timeout)
+                except (OSError, ValueError):
+                    worker.close()
+        return [worker for worker in self.workers if worker.alive]
+
+    def close(self) -> None:
+        """Stäng alla anslutningar."""
+        for worker in self.workers:
+            worker.close()
+
+    def search_root(
+        self, player: AI_Player, board: Board, max_depth: int
+    ) -> tuple[int, tuple[int, int], list[tuple[int, int]]]:
+        """Sök roten till ett djup med arbetarna, i stället för AI_Player.aspiration_search.
+
+        Args:
+            player (AI_Player): Spelaren som söker, vars budgetar, dragsortering och nodräknare används
+            board (Board): Rotpositionen
+            max_depth (int): Djupet för varvet
+
+        Raises:
+            SearchLimitReached: Om sökningens budget tar slut, player.root_best håller då det bästa draget hittills.
+
+        Returns:
+            tuple[int, tuple[int, int], list[tuple[int, int]]]: Poäng, bästa drag och principalvariation
+        """
+        player.root_best = None
+        ordered = [move for move, _ in player.pick_moves(board, 0, player.symbol)]
+        if not ordered:
+            return float("-inf"), None, []
+
+        position = {
+            "cmd": "search",
+            "moves": encode_moves(board),
+            "rows": board.rows,
+            "cols": board.cols,
+            "to_win": board.to_win,
+            "evaluation": board.evaluation,
+            "rule": board.rule,
+            "symbol": player.symbol,
+            "depth": max_depth,
+            "options": {name: getattr(player, name) for name in WORKER_OPTIONS},
+        }
+        # Det första draget söks ensamt, så att övriga drag får ett fönster att skära av mot
+        self.run_jobs(player, board, position, ordered[:1], max_depth)
+        self.run_jobs(player, board, position, ordered[1:], max_depth)
+        return player.root_best
+
+    def run_jobs(
+        self,
+        player: AI_Player,
+        board: Board,
+        position: dict,
+        moves: list[tuple[int, int]],
+        max_depth: int,
+    ) -> None:
+        """Sök rotdragen på arbetarna och uppdatera player.root_best med varje drag som är bättre än det hittills bästa."""
+        pending = deque((move, 0) for move in moves)
+        # Arbetare -> (rotdrag, antal försök, tidsgräns, nodbudget)
+        busy: dict[WorkerConnection, tuple[tuple[int, int], int, float, int | None]] = {}
+        idle = self.connect()
+        selector = selectors.DefaultSelector()
+
+        try:
+            while pending or busy:
+                # Ge lediga arbetare nya jobb, med det bästa värdet hittills som fönstrets undre gräns
+                while idle and pending:
+                    worker = idle.pop()
+                    move, attempts = pending.popleft()
+                    reserved = sum(job[3] or 0 for job in busy.values())
+                    limits = self.job_limits(player, move, reserved, len(idle) + 1)
+                    try:
+                        worker.send({**position, **limits})
+                    except OSError:
+                        worker.close()
+                        pending.appendleft((move, attempts))
+                        continue
+                    busy[worker] = (move, attempts, time.perf_counter() + limits["timeout"], limits["nodes"])
+                    selector.register(worker.socket, selectors.EVENT_READ, worker)
+
+                if not busy:
+                    # Ingen arbetare lever, resten av dragen söks lokalt
+                    while pending:
+                        self.search_locally(player, board, pending.popleft()[0], max_depth)
+                    break
+
+                timeout = max(min(job[2] for job in busy.values()) - time.perf_counter(), 0)
+                ready = [key.data for key, _ in selector.select(timeout)]
+                expired = [worker for worker, job in busy.items() if worker not in ready and job[2] <= time.perf_counter()]
+
+                for worker in ready + expired:
+                    move, attempts, deadline, _ = busy.pop(worker)
+                    selector.unregister(worker.socket)
+                    try:
+                        if worker in expired:
+                            raise TimeoutError(f"worker {worker.address} timed out")
+                        response = worker.receive(max(deadline - time.perf_counter(), 0.001))
+                        if not response.get("ok") and response.get("error") != "limit":
+                            raise ValueError(f"worker {worker.address}: {response.get('error')}")
+                    except (OSError, ValueError):
+                        # Arbetaren är död, hänger sig eller klarar inte jobbet, jobbet ges till någon annan
+                        worker.close()
+                        self.reassigned += 1
+                        if attempts + 1 > self.retries:
+                            self.search_locally(player, board, move, max_depth)
+                        else:
+                            pending.append((move, attempts + 1))
+                        continue
+
+                    idle.append(worker)
+                    player.nodes += response.get("nodes", 0)
+                    if not response["ok"]:
+                        raise SearchLimitReached(response.get("limit", "nodes"))
+                    self.record(player, response["score"], [tuple(move) for move in response["pv"]])
+                    player.check_limits()
+        finally:
+            # Om sökningen avbryts överges jobb som fortfarande pågår. Anslutningarna stängs så att svaren inte
+            # blandas ihop med nästa jobb, och arbetarna ansluts igen vid nästa varv
+            for worker in busy:
+                worker.close()
+            selector.close()
+
+    def job_limits(self, player: AI_Player, move: tuple[int, int], reserved: int, idle: int) -> dict:
+        """Returnera jobbets rotdrag, fönster och budget.
+
+        Tidsbudgeten är den återstående tiden, och timeout tiden innan jobbet ges upp, se job_timeout. Av nodbudgeten dras först det som redan är utdelat till pågående
+        jobb, och resten delas lika mellan de lediga arbetarna, så att arbetarna tillsammans inte söker fler
+        noder än sökningens budget.
+
+        Args:
+            player (AI_Player): Spelaren som söker
+            move (tuple[int, int]): Rotdraget
+            reserved (int): Noder som är utdelade till pågående jobb
+            idle (int): Antal lediga arbetare, inklusive den som får jobbet
+        """
+        alpha = None if player.root_best is None else player.root_best[0]
+        remaining_time = None if player.deadline is None else max(player.deadline - time.perf_counter(), 0.0)
+        remaining_nodes = None
+        if player.node_limit is not None:
+            remaining_nodes = max(player.node_limit - player.nodes - reserved, 0) // max(idle, 1)
+        return {
+            "move": list(move),
+            "alpha": alpha,
+            "time": remaining_time,
+            "timeout": self.job_timeout(player),
+            "nodes": remaining_nodes,
+        }
+
+    def job_timeout(self, player: AI_Player) -> float:
+        """Returnera hur länge ett jobb får ta innan arbetaren räknas som död, högst en sekund efter sökningens tidsgräns."""
+        if player.deadline is None:
+            return self.timeout
+        return min(self.timeout, max(player.deadline - time.perf_counter(), 0.0) + 1.0)
+
+    def search_locally(self, player: AI_Player, board: Board, move: tuple[int, int], max_depth: int) -> None:
+        """Sök ett rotdrag i den egna processen, när ingen arbetare kan ta det."""
+        alpha = float("-inf") if player.root_best is None else player.root_best[0]
+        score, pv = search_child(player, board, move, max_depth, alpha)
+        self.record(player, score, pv)
+
+    @staticmethod
+    def record(player: AI_Player, score: int, pv: list[tuple[int, int]]) -> None:
+        """Spara ett rotdrag som player.root_best om det är bättre än det bästa hittills."""
+        if player.root_best is None or score > player.root_best[0]:
+            player.root_best = (score, pv[0], pv)
+
+
+def start_local_workers(count: int, host: str = "127.0.0.1") -> tuple[list[subprocess.Popen], list[tuple[str, int]]]:
+    """Starta arbetarprocesser på den här datorn, på lediga portar, t.ex. för att prova klustret utan fler datorer.
+
+    Returns:
+        tuple[list[subprocess.Popen], list[tuple[str, int]]]: Processerna och deras adresser.
+    """
+    processes = []
+    addresses = []
+    for _ in range(count):
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "worker", "--host", host, "--port", "0"],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        # Arbetaren skriver sin adress på första raden när den lyssnar
+        processes.append(process)
+        addresses.append(parse_address(process.stdout.readline().split()[-1]))
+    return processes, addresses
+
+
+def stop_local_workers(processes: list[subprocess.Popen]) -> None:
+    """Avsluta arbetarprocesser som startats med start_local_workers."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+        process.stdout.close()
+
+
+def run_worker(host: str, port: int) -> None:
+    """Kör en arbetare tills processen avbryts."""
+    with WorkerServer((host, port)) as server:
+        print(f"worker listening on {server.server_address[0]}:{server.server_address[1]}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Kör en arbetare, eller sök en position med arbetare och jämför med en sökning i en process."""
+    parser = argparse.ArgumentParser(description="Distributed root-split search over TCP workers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = commands.add_parser("worker", help="serve search jobs")
+    worker_parser.add_argument("--host", default="127.0.0.1", help="address to listen on, 0.0.0.0 for all")
+    worker_parser.add_argument("--port", type=int, default=7100, help="port to listen on, 0 for any free port")
+
+    search_parser = commands.add_parser("search", help="search a position with workers")
+    search_parser.add_argument("position", help='move list or board string, e.g. "7,7 8,8 7,8"')
+    search_parser.add_argument("--size", type=int, default=15)
+    search_parser.add_argument("--rule", choices=RULES, default="freestyle")
+    search_parser.add_argument("--depth", type=int, default=4)
+    search_parser.add_argument("--time", type=float, default=None, help="time budget in seconds")
+    search_parser.add_argument("--workers", nargs="*", default=[], help="worker addresses, host:port")
+    search_parser.add_argument("--local-workers", type=int, default=0, help="worker processes to start on this host")
+    search_parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a job is reassigned")
+    search_parser.add_argument("--compare", action="store_true", help="also search without workers")
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        run_worker(args.host, args.port)
+        return
+
+    processes, addresses = start_local_workers(args.local_workers)
+    coordinator = Coordinator([parse_address(address) for address in args.workers] + addresses, args.timeout)
+    try:
+        for cluster in ([coordinator, None] if args.compare else [coordinator]):
+            board = parse_position(args.position, args.size, args.size, 5, rule=args.rule)
+            player = AI_Player(side_to_move(board), max_depth=args.depth, time_limit=args.time, cluster=cluster)
+            start = time.perf_counter()
+            move = player.make_move(board)
+            label = f"{len(coordinator.connect())} workers" if cluster is not None else "single process"
+            print(
+                f"{label}: move {move}, score {player.last_score}, depth {player.last_depth}, "
+                f"{player.nodes} nodes, {time.perf_counter() - start:.2f}s"
+            )
+        print(f"reassigned jobs: {coordinator.reassigned}")
+    finally:
+        coordinator.close()
+        stop_local_workers(processes)
+
+
+if __name__ == "__main__":
+    main()
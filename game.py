@@ -1,13 +1,27 @@
-from graphics import *
+from typing import TYPE_CHECKING
+
 from board import *
 from player import *
-from time import sleep
+from clock import *
+from telemetry import *
+from time import perf_counter, sleep
+
+# Grafiken importeras bara för typkontroll, så att partier kan spelas utan pygame (t.ex. i servern)
+if TYPE_CHECKING:
+    from graphics import Graphics
 
 
 class Game:
 
     def __init__(
-        self, board: Board, graphics: Graphics, player1: Player, player2: Player
+        self,
+        board: Board,
+        graphics: "Graphics | None",
+        player1: Player,
+        player2: Player,
+        clock: GameClock | None = None,
+        time_manager: TimeManager | None = None,
+        telemetry: Telemetry | None = None,
     ):
         self.board = board
         self.graphics = graphics
@@ -18,6 +32,10 @@ class Game:
         )
         self.winner = None
         self.running = True
+        self.principal_variation: list[tuple[int, int]] = []
+        self.clock = clock
+        self.time_manager = time_manager or TimeManager()
+        self.telemetry = telemetry
 
     def switch_turns(self) -> None:
         """Byt vilken spelares tur det är att göra ett drag för att kunna alternera under spelets gång.
@@ -41,28 +59,113 @@ class Game:
                 self.winner = None
             return True
 
+    def play_move(self, move: tuple[int, int]) -> bool:
+        """Gör den nuvarande spelarens drag och byt tur, utan grafik, så att partiet även kan drivas utifrån.
+
+        Args:
+            move (tuple[int, int]): Draget (row, col)
+
+        Raises:
+            ValueError: Om draget är utanför brädet, cellen redan är markerad eller draget är förbjudet.
+
+        Returns:
+            bool: True om omgången är över efter draget annars False.
+        """
+        if self.board.out_of_range(move) or self.board.board[move[0]][move[1]] != 0:
+            raise ValueError(f"Illegal move {move}")
+        if self.board.is_forbidden(self.current_player.symbol, move):
+            raise ValueError(f"Forbidden move {move}")
+
+        self.board.mark_cell(self.current_player.symbol, move)
+        game_over = bool(self.is_game_over()) or self.board.board_full()
+        self.switch_turns()
+        return game_over
+
+    def undo_move(self) -> tuple[int, int]:
+        """Ta tillbaka det senaste draget och ge turen tillbaka till spelaren som gjorde det.
+
+        Returns:
+            tuple[int, int]: Draget som togs tillbaka (row, col)
+        """
+        move = self.board.undo_cell()
+        self.winner = None
+        self.switch_turns()
+        return move
+
+    def time_budget(self) -> float | None:
+        """Beräkna AI:ns tidsbudget för nästa drag utifrån klockan, för att AI:n ska kunna spela med tidskontroll.
+
+        Returns:
+            float | None: Tidsbudgeten i sekunder, eller None om partiet spelas utan klocka.
+        """
+        if self.clock is None:
+            return None
+
+        return self.time_manager.allocate(
+            self.clock.time_left(self.current_player.symbol),
+            self.clock.increment,
+            len(self.board.ordered_moves) // 2,
+            score_volatility(getattr(self.current_player, "iteration_scores", [])),
+        )
+
+    def ai_move(self) -> tuple[int, int]:
+        """Låt AI:n som står på tur söka fram sitt drag, och spara tid, djup och noder om telemetri används.
+
+        Returns:
+            tuple[int, int]: AI:ns drag (row, col)
+        """
+        player = self.current_player
+        stones = self.board.marked_cells
+        start = perf_counter()
+        move = player.make_move(self.board, time_limit=self.time_budget())
+        if self.telemetry is not None:
+            self.telemetry.record(
+                player.symbol,
+                perf_counter() - start,
+                getattr(player, "last_depth", None),
+                getattr(player, "nodes", None),
+                stones,
+                self.board.rows * self.board.cols,
+            )
+        return move
+
     def play(self) -> None:
         """Algoritmen för spelandet av en omgång, där två spelare alternerar att göra drag tills omgången är slut.
         """
         while self.running:
             self.graphics.draw_board()
+            if self.principal_variation:
+                self.graphics.display_principal_variation(self.principal_variation)
+
+            if self.clock is not None:
+                self.graphics.display_clock(self.clock)
+                self.clock.start(self.current_player.symbol)
 
             # Hanterande av den nuvarande spelarens drag
-            if isinstance(self.current_player, AI_Player):
-                move = self.current_player.make_move(self.board)
-            elif isinstance(self.current_player, User_Player):
+            if isinstance(self.current_player, User_Player):
                 move = self.current_player.make_move(self.board, self.graphics.cell_size)
+                self.principal_variation = []
+            else:
+                move = self.ai_move()
+                # Visa AI:ns förväntade fortsättning efter det gjorda draget
+                self.principal_variation = self.current_player.principal_variation[1:]
 
-            self.board.mark_cell(self.current_player.symbol, move)
+            if self.clock is not None:
+                self.clock.stop()
+                if self.clock.is_flagged(self.current_player.symbol):
+                    # Spelaren som överskred sin tid förlorar
+                    self.switch_turns()
+                    self.winner = self.current_player
+                    self.graphics.display_game_over_message(self.winner)
+                    self.running = False
+                    break
 
             # Kontrollera om omgången är över efter varje drag
-            if self.is_game_over():
+            if self.play_move(move):
                 self.graphics.draw_board()
                 self.graphics.display_game_over_message(self.winner)
                 self.running = False
 
-            self.switch_turns()
-
     def play_again(self) -> bool:
         """Kontrollera om användaren vill spela ytterligare en omgång för att avgöra när spelsessionen ska stängas ner.
 
@@ -108,6 +108,26 @@ class Graphics:
             self.screen, (66, 66, 66), center, radius, self.line_width * 2
         )
 
+    def display_principal_variation(self, principal_variation: list[tuple[int, int]]) -> None:
+        """Numrera AI:ns förväntade fortsättning på brädet."""
+        font = pygame.font.Font(None, self.cell_size // 2)
+        for number, (row, col) in enumerate(principal_variation, start=1):
+            center = (
+                col * self.cell_size + self.cell_size // 2,
+                row * self.cell_size + self.cell_size // 2,
+            )
+            text = font.render(str(number), True, (200, 230, 225))
+            self.screen.blit(text, text.get_rect(center=center))
+        pygame.display.update()
+
+    def display_clock(self, clock) -> None:
+        """Visa spelarnas återstående tid i fönstrets titel."""
+        times = "   ".join(
+            f"{symbol} {int(max(clock.time_left(symbol), 0)) // 60}:{int(max(clock.time_left(symbol), 0)) % 60:02d}"
+            for symbol in clock.remaining
+        )
+        pygame.display.set_caption(f"Five in a Row   {times}")
+
     def draw_button(self, text: str, rect, color) -> None:
         """Rita upp en knapp."""
         pygame.draw.rect(self.screen, color, rect)
@@ -1,9 +1,14 @@
 import random
 
-def random_int():
+# Fast frö så att samma position får samma nyckel i alla processer och körningar
+ZOBRIST_SEED = 0x5EED
+
+_zobrist_tables = {}
+
+def random_int(rng=random):
     min = 2
     max = pow(2,64)
-    return random.randint(min, max)
+    return rng.randint(min, max)
 
 
 def index_of(symbol):
@@ -15,10 +20,27 @@ def index_of(symbol):
         return 0
     
 
-def initTable(rows,cols):
-    zobrist_table = [[[random_int() for k in range(3)] for j in range(cols)] for i in range(rows)]
+def initTable(rows,cols,seed=None):
+    rng = random.Random(seed) if seed is not None else random
+    zobrist_table = [[[random_int(rng) for k in range(3)] for j in range(cols)] for i in range(rows)]
     return zobrist_table
 
+
+def zobrist_table(rows: int, cols: int) -> list[list[list[int]]]:
+    """Returnera Zobrist-tabellen för en brädstorlek, skapad med ett fast frö och bara en gång per storlek.
+
+    Args:
+        rows (int): Antal rader på brädet
+        cols (int): Antal kolumner på brädet
+
+    Returns:
+        list[list[list[int]]]: Ett slumptal per cell och cellinnehåll (tom, X, O).
+    """
+    key = (rows, cols)
+    if key not in _zobrist_tables:
+        _zobrist_tables[key] = initTable(rows, cols, ZOBRIST_SEED)
+    return _zobrist_tables[key]
+
 def compute_hash(board, zobrist_table):
     h = 0
     rows = len(board)
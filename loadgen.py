@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from patterns import NEIGHBORS
+from telemetry import percentile
+
+
+class LoadStatistics:
+    """Latens per drag samt antal partier och avvisade förfrågningar under en lastkörning."""
+
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+        self.games = 0
+        self.rejected = 0
+        self.errors = 0
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, message: dict) -> dict:
+    """Skicka en förfrågan till servern och vänta på svaret."""
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("server closed the connection")
+    return json.loads(line)
+
+
+async def retry_request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    message: dict,
+    statistics: LoadStatistics,
+) -> dict:
+    """Skicka en förfrågan och försök igen med ökande väntetid så länge servern svarar att den är överbelastad."""
+    delay = 0.01
+    while True:
+        response = await request(reader, writer, message)
+        if not response.get("retry"):
+            return response
+        statistics.rejected += 1
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+
+def choose_move(occupied: set[tuple[int, int]], size: int) -> tuple[int, int]:
+    """Välj ett slumpmässigt tomt drag intill ett markerat, eller mitten på ett tomt bräde."""
+    candidates = [
+        (row + dr, col + dc)
+        for row, col in occupied
+        for dr, dc in NEIGHBORS
+        if 0 <= row + dr < size and 0 <= col + dc < size and (row + dr, col + dc) not in occupied
+    ]
+    return random.choice(candidates) if candidates else (size // 2, size // 2)
+
+
+async def client(
+    host: str,
+    port: int,
+    games: int,
+    size: int,
+    depth: int,
+    statistics: LoadStatistics,
+) -> None:
+    """En klient som spelar ett antal partier mot servern i tur och ordning och mäter latensen per drag."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(games):
+            symbol = random.choice(["X", "O"])
+            response = await retry_request(
+                reader, writer, {"cmd": "new", "size": size, "symbol": symbol, "depth": depth}, statistics
+            )
+            if not response["ok"]:
+                statistics.errors += 1
+                continue
+
+            session = response["session"]
+            occupied = set()
+            if response["ai_move"] is not None:
+                occupied.add(tuple(response["ai_move"]))
+
+            winner = None
+            while winner is None and len(occupied) < size * size:
+                move = choose_move(occupied, size)
+                occupied.add(move)
+
+                start = time.perf_counter()
+                response = await retry_request(
+                    reader, writer, {"cmd": "move", "session": session, "move": move}, statistics
+                )
+                statistics.latencies.append(time.perf_counter() - start)
+
+                if not response["ok"]:
+                    statistics.errors += 1
+                    break
+                if response["ai_move"] is not None:
+                    occupied.add(tuple(response["ai_move"]))
+                winner = response["winner"]
+
+            await request(reader, writer, {"cmd": "close", "session": session})
+            statistics.games += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, clients: int, games: int, size: int, depth: int) -> LoadStatistics:
+    """Kör alla klienter samtidigt och samla statistiken."""
+    statistics = LoadStatistics()
+    await asyncio.gather(*(client(host, port, games, size, depth, statistics) for _ in range(clients)))
+    return statistics
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Belasta spelservern med samtidiga klienter och skriv ut genomströmning och latens per drag."""
+    parser = argparse.ArgumentParser(description="Generate load against the game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=100, help="concurrent connections")
+    parser.add_argument("--games", type=int, default=1, help="games per client")
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--depth", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    statistics = asyncio.run(run_load(args.host, args.port, args.clients, args.games, args.size, args.depth))
+    elapsed = time.perf_counter() - start
+
+    moves = len(statistics.latencies)
+    print(f"games: {statistics.games}, moves: {moves}, rejected: {statistics.rejected}, errors: {statistics.errors}")
+    print(f"throughput: {moves / elapsed:.1f} moves/s over {elapsed:.1f}s")
+    print(
+        f"latency: p50 {percentile(statistics.latencies, 0.50) * 1000:.1f} ms, "
+        f"p99 {percentile(statistics.latencies, 0.99) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,53 @@
+import argparse
+
 from game import *
+from mcts import *
 from player import *
 from graphics import *
 from board import *
 
 
-def main() -> None:
-    """Spela tills att användaren väljer att avsluta spelet"""
+def main(
+    engine: str = "minimax",
+    minutes: float | None = None,
+    increment: float = 0.0,
+    metrics: str | None = None,
+    metrics_port: int | None = None,
+) -> None:
+    """Spela tills att användaren väljer att avsluta spelet
+
+    Args:
+        engine (str): AI:ns sökstrategi, "minimax" eller "mcts"
+        minutes (float | None): Betänketid per spelare i minuter, None för att spela utan klocka
+        increment (float): Tillägg per drag i sekunder
+        metrics (str | None): JSON-fil som AI:ns tider per drag skrivs till efter varje drag
+        metrics_port (int | None): Lokal port där tiderna kan hämtas på /metrics
+    """
+    # Telemetrin delas mellan omgångarna så att percentilerna bygger på alla spelade drag
+    telemetry = Telemetry(metrics) if metrics is not None or metrics_port is not None else None
+    if metrics_port is not None:
+        port = telemetry.serve(metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+    player2 = None
     while True:
         board = Board(19, 19, 5)
         graphics = Graphics(board)
         user_symbol, ai_symbol = graphics.choose_symbol()
 
         player1 = User_Player(user_symbol)
-        player2 = AI_Player(ai_symbol)
+        # AI:n behålls mellan omgångarna så att dess transpositionstabell och historik återanvänds,
+        # men dess tabeller gäller bara för den egna symbolen
+        if player2 is None or player2.symbol != ai_symbol:
+            if engine == "mcts":
+                player2 = MCTS_Player(ai_symbol, verbose=True)
+            else:
+                # Med klocka styrs sökningen av tidsbudgeten i stället för ett lågt fast djup
+                player2 = AI_Player(ai_symbol, max_depth=2 if minutes is None else 10, verbose=True)
         
         # Instansiering av en ny spelomgång 
-        game: Game = Game(board, graphics, player1, player2) 
+        clock = None if minutes is None else GameClock(minutes * 60, increment)
+        game: Game = Game(board, graphics, player1, player2, clock, telemetry=telemetry) 
 
         game.play() 
         
@@ -25,4 +57,11 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Five in a Row against the AI.")
+    parser.add_argument("--engine", choices=["minimax", "mcts"], default="minimax")
+    parser.add_argument("--minutes", type=float, default=None, help="thinking time per player")
+    parser.add_argument("--increment", type=float, default=0.0, help="seconds added after each move")
+    parser.add_argument("--metrics", default=None, help="write per-move AI latency percentiles to this JSON file")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve the same report on localhost")
+    args = parser.parse_args()
+    main(args.engine, args.minutes, args.increment, args.metrics, args.metrics_port)
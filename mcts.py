@@ -0,0 +1,320 @@
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from player import *
+
+
+class TreeNode:
+    """En nod i sökträdet, representerar positionen efter att move har spelats av player_just_moved."""
+
+    def __init__(self, move: tuple[int, int] | None, player_just_moved: str, parent=None) -> None:
+        self.move = move
+        self.player_just_moved = player_just_moved
+        self.parent = parent
+        self.children: dict[tuple[int, int], TreeNode] = {}
+        self.untried_moves: list[tuple[int, int]] | None = None
+        self.visits = 0
+        self.wins = 0.0
+        self.winner = None  # Symbolen för vinnaren om noden är ett vunnet slutläge
+
+    def select_child(self, exploration: float) -> "TreeNode":
+        """Välj barnet med högst UCT-värde, för att balansera mellan lovande och outforskade drag."""
+        log_visits = math.log(self.visits)
+        return max(
+            self.children.values(),
+            key=lambda child: child.wins / child.visits
+            + exploration * math.sqrt(log_visits / child.visits),
+        )
+
+
+class MCTS_Player(Player):
+    """Klass för spelare av typen AI som söker med Monte Carlo-trädsökning (UCT) i stället för minimax."""
+
+    def __init__(
+        self,
+        symbol: str,
+        playouts: int = 2000,
+        time_limit: float | None = None,
+        exploration: float = 1.4,
+        workers: int = 1,
+        verbose: bool = False,
+    ) -> None:
+        super().__init__(symbol)
+        self.opponent_symbol = "O" if symbol == "X" else "X"
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.workers = workers
+        self.verbose = verbose
+        self.root: TreeNode | None = None
+        # Processpoolen skapas vid första parallella sökningen och återanvänds för alla följande drag
+        self.pool: ProcessPoolExecutor | None = None
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+        self.principal_variation: list[tuple[int, int]] = []
+
+    def make_move(self, board: Board, time_limit: float | None = None) -> tuple[int, int]:
+        """Returnera AI:ns drag, det mest besökta draget från roten efter att budgeten förbrukats.
+
+        Med en arbetare återanvänds delträdet under det förra draget och motståndarens svar. Med flera
+        arbetare byggs ett oberoende träd i varje process och rotstatistiken slås ihop.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+            time_limit (float | None): Tidsbudget i sekunder, annars AI:ns egen
+
+        Returns:
+            tuple[int, int]: AI:ns drag (row, col)
+        """
+        time_limit = self.time_limit if time_limit is None else time_limit
+        start = time.perf_counter()
+
+        if board.marked_cells == 0:
+            move = (int(board.rows / 2), int(board.cols / 2))
+            self.principal_variation = [move]
+            return move
+
+        if self.workers > 1:
+            statistics = self.parallel_search(board, time_limit, start)
+        else:
+            self.root = self.reuse_tree(board)
+            search(board, self.root, self.symbol, self.playouts, time_limit, self.exploration)
+            statistics = {
+                move: (child.visits, child.wins) for move, child in self.root.children.items()
+            }
+
+        if not statistics:
+            raise ValueError("AI could not find a valid move!")
+
+        move = max(statistics, key=lambda move: statistics[move][0])
+        visits, wins = statistics[move]
+        self.nodes = sum(visits for visits, _ in statistics.values())
+        self.last_score = round(wins / visits, 3)
+        self.principal_variation = self.best_line(move)
+        self.last_depth = len(self.principal_variation)
+
+        if self.verbose:
+            print(f"MCTS: {self.nodes} playouts, best move = {move}, win rate = {self.last_score}")
+        return move
+
+    def reuse_tree(self, board: Board) -> TreeNode:
+        """Returnera delträdet som motsvarar brädets position, om det finns kvar från föregående drag.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+
+        Returns:
+            TreeNode: Roten för sökningen.
+        """
+        node = self.root
+        if node is not None and len(board.ordered_moves) >= 2:
+            node = node.children.get(board.ordered_moves[-2])
+            if node is not None:
+                node = node.children.get(board.ordered_moves[-1])
+
+        if node is None or node.player_just_moved != self.opponent_symbol:
+            return TreeNode(None, self.opponent_symbol)
+
+        node.parent = None
+        node.move = None
+        return node
+
+    def parallel_search(self, board: Board, time_limit: float | None, start: float) -> dict:
+        """Rotparallellisering: sök oberoende träd i en processpool och summera statistiken för rotens drag.
+
+        Poolen startas bara en gång per spelare. Tiden det tar, liksom tiden sedan draget började, dras från
+        tidsbudgeten som skickas till arbetarna, så att draget inte drar över sin budget.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+            time_limit (float | None): Tidsbudget i sekunder
+            start (float): Tidpunkten då draget började (time.perf_counter)
+
+        Returns:
+            dict: (besök, vinster) per drag från roten.
+        """
+        self.root = None
+        playouts = -(-self.playouts // self.workers)
+        seeds = [random.getrandbits(32) for _ in range(self.workers)]
+
+        pool = self.worker_pool(board)
+        if time_limit is not None:
+            time_limit = max(time_limit - (time.perf_counter() - start), 0.0)
+        results = pool.map(
+            search_root,
+            [board] * self.workers,
+            [self.symbol] * self.workers,
+            [playouts] * self.workers,
+            [time_limit] * self.workers,
+            [self.exploration] * self.workers,
+            seeds,
+        )
+
+        statistics = {}
+        for result in results:
+            for move, (visits, wins) in result.items():
+                total_visits, total_wins = statistics.get(move, (0, 0.0))
+                statistics[move] = (total_visits + visits, total_wins + wins)
+        return statistics
+
+    def worker_pool(self, board: Board) -> ProcessPoolExecutor:
+        """Returnera processpoolen, och starta den första gången med mönstertabellerna inlästa i varje process."""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            list(self.pool.map(warm_up, [board.to_win] * self.workers, [board.rule] * self.workers))
+        return self.pool
+
+    def close(self) -> None:
+        """Stäng processpoolen om den har startats."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def best_line(self, move: tuple[int, int]) -> list[tuple[int, int]]:
+        """Returnera den mest besökta vägen genom trädet från ett givet drag."""
+        line = [move]
+        node = self.root.children.get(move) if self.root is not None else None
+        while node is not None and node.children:
+            node = max(node.children.values(), key=lambda child: child.visits)
+            line.append(node.move)
+        return line
+
+
+def search(
+    board: Board,
+    root: TreeNode,
+    symbol: str,
+    playouts: int,
+    time_limit: float | None,
+    exploration: float,
+) -> None:
+    """Kör UCT-iterationer (urval, expansion, slumpparti, uppdatering) från roten tills budgeten är förbrukad.
+
+    Args:
+        board (Board): Positionen i roten, lämnas oförändrad
+        root (TreeNode): Roten, där motståndaren till symbol senast gjorde ett drag
+        symbol (str): Symbolen för spelaren som står på tur i roten
+        playouts (int): Antal slumpmässiga partier
+        time_limit (float | None): Tidsbudget i sekunder
+        exploration (float): UCT-konstanten
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    for iteration in range(playouts):
+        if deadline is not None and iteration % 16 == 0 and time.perf_counter() > deadline:
+            break
+
+        node = root
+        current = board.copy()
+
+        # Urval: gå ned i trädet så länge noden är fullt expanderad
+        while node.winner is None and node.untried_moves == [] and node.children:
+            node = node.select_child(exploration)
+            current.mark_cell(node.player_just_moved, node.move)
+
+        # Expansion: lägg till ett oprövat drag
+        if node.winner is None:
+            to_move = "O" if node.player_just_moved == "X" else "X"
+            if node.untried_moves is None:
+                # Vinnande drag sorteras först och ska prövas först
+                node.untried_moves = current.get_potential_moves(to_move)[::-1]
+            if node.untried_moves:
+                move = node.untried_moves.pop()
+                child = TreeNode(move, to_move, node)
+                if current.is_winning_move(to_move, move):
+                    child.winner = to_move
+                current.mark_cell(to_move, move)
+                node.children[move] = child
+                node = child
+
+        # Slumpparti från den nya noden
+        if node.winner is not None:
+            winner = node.winner
+        elif node.untried_moves == [] and not node.children:
+            winner = None  # Brädet är fullt
+        else:
+            winner = playout(current, "O" if node.player_just_moved == "X" else "X")
+
+        # Uppdatering av statistiken på vägen tillbaka till roten
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.player_just_moved:
+                node.wins += 1
+            node = node.parent
+
+
+def playout(board: Board, symbol: str) -> str | None:
+    """Spela slumpmässiga drag bland tomma grannar till markerade celler tills någon vinner eller draget tar slut.
+
+    Args:
+        board (Board): Positionen att spela från, ändras av partiet
+        symbol (str): Symbolen för spelaren som står på tur
+
+    Returns:
+        str | None: Vinnarens symbol, eller None vid oavgjort.
+    """
+    # Hotindexet kostar mer att underhålla än det sparar i ett slumpparti, brädet är en kopia som kastas efteråt
+    board.track_threats = False
+
+    frontier = []
+    in_frontier = set()
+    for row, col in board.ordered_moves:
+        for dr, dc in NEIGHBORS:
+            cell = (row + dr, col + dc)
+            if cell not in in_frontier and not board.out_of_range(cell) and board.board[cell[0]][cell[1]] == 0:
+                frontier.append(cell)
+                in_frontier.add(cell)
+
+    while frontier:
+        # Dra en slumpmässig cell och ta bort den genom att byta plats med den sista
+        index = random.randrange(len(frontier))
+        frontier[index], frontier[-1] = frontier[-1], frontier[index]
+        move = frontier.pop()
+
+        if board.is_forbidden(symbol, move):
+            # Cellen kan fortfarande spelas av O och läggs tillbaka när en granne markeras
+            in_frontier.discard(move)
+            continue
+
+        if board.is_winning_move(symbol, move):
+            return symbol
+        board.mark_cell(symbol, move)
+
+        for dr, dc in NEIGHBORS:
+            cell = (move[0] + dr, move[1] + dc)
+            if cell not in in_frontier and not board.out_of_range(cell) and board.board[cell[0]][cell[1]] == 0:
+                frontier.append(cell)
+                in_frontier.add(cell)
+
+        symbol = "O" if symbol == "X" else "X"
+
+    return None
+
+
+def warm_up(to_win: int, rule: str) -> None:
+    """Läs in mönstertabellerna i en arbetarprocess innan den får sitt första sökjobb."""
+    get_tables(to_win, rule)
+
+
+def search_root(
+    board: Board,
+    symbol: str,
+    playouts: int,
+    time_limit: float | None,
+    exploration: float,
+    seed: int,
+) -> dict:
+    """Bygg ett eget träd i en arbetarprocess och returnera statistiken för rotens drag.
+
+    Returns:
+        dict: (besök, vinster) per drag från roten.
+    """
+    random.seed(seed)
+    root = TreeNode(None, "O" if symbol == "X" else "X")
+    search(board, root, symbol, playouts, time_limit, exploration)
+    return {move: (child.visits, child.wins) for move, child in root.children.items()}
@@ -0,0 +1,447 @@
+import array
+import hashlib
+import json
+import os
+import pickle
+
+# Riktningarna som brädet evalueras i: vertikalt, horisontellt och båda diagonalerna
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (-1, 1)]
+
+# De åtta granncellerna runt en cell
+NEIGHBORS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+# Cellkoder i de packade linjerna, två bitar per cell
+EMPTY, X_CELL, O_CELL, WALL = 0, 1, 2, 3
+
+# Hotklasser för ett drag i en riktning, ordnade efter styrka
+NONE, THREE, OPEN_THREE, FOUR, OPEN_FOUR, FIVE = range(6)
+
+# Regelvarianter: fritt (fem eller fler vinner), exakt fem för båda, samt renju där bara X (svart) måste få
+# exakt fem och har förbjudna drag (dubbeltrea, dubbelfyra och överlinje)
+RULES = ("freestyle", "exact", "renju")
+
+# Standardvikterna för evalueringen, som används om parameterfilen saknas
+DEFAULT_PARAMETERS = {
+    # Poäng för antal symboler i rad: (öppen i båda ändar, öppen i en ände)
+    "run_scores": {
+        4: (10000, 5000),
+        3: (1000, 500),
+        2: (100, 50),
+    },
+    # Poängen för en vunnen position
+    "win_score": 100000,
+}
+
+# Parameterfilen med evalueringens vikter, kan bytas ut med miljövariabeln GOMOKU_PARAMETERS
+PARAMETERS_FILE = os.environ.get(
+    "GOMOKU_PARAMETERS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "parameters.json")
+)
+
+# Den lägsta biten i varje cell, för linjer upp till 512 celler inklusive kantceller
+CELL_MASK = int("01" * 512, 2)
+
+TABLE_VERSION = 3
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pattern_cache")
+# Antal uppsättningar vikter vars tabeller sparas i cachen per antal i rad och regelvariant
+CACHE_KEEP = 2
+
+_tables = {}
+_geometries = {}
+
+
+def load_parameters(path: str = PARAMETERS_FILE) -> dict:
+    """Läs evalueringens vikter från en JSON-fil, eller standardvikterna om filen saknas.
+
+    Filen har formen {"run_scores": {"4": [10000, 5000], ...}, "win_score": 100000}, där nycklarna i
+    run_scores är antal symboler i rad och värdena poängen för en öppen respektive halvöppen rad.
+
+    Args:
+        path (str): Sökvägen till parameterfilen
+
+    Raises:
+        ValueError: Om filen inte har rätt format.
+
+    Returns:
+        dict: Vikterna på samma form som DEFAULT_PARAMETERS.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return {"run_scores": dict(DEFAULT_PARAMETERS["run_scores"]), "win_score": DEFAULT_PARAMETERS["win_score"]}
+
+    try:
+        return {
+            "run_scores": {
+                int(run): (int(scores[0]), int(scores[1])) for run, scores in data["run_scores"].items()
+            },
+            "win_score": int(data["win_score"]),
+        }
+    except (KeyError, TypeError, IndexError, AttributeError, ValueError) as error:
+        raise ValueError(f"Invalid parameter file {path}: {error!r}") from None
+
+
+PARAMETERS = load_parameters()
+RUN_SCORES = PARAMETERS["run_scores"]
+
+
+def cell_code(symbol) -> int:
+    """Returnera cellkoden för en symbol på brädet."""
+    if symbol == "X":
+        return X_CELL
+    elif symbol == "O":
+        return O_CELL
+    else:
+        return EMPTY
+
+
+class PatternTables:
+    """Förberäknade tabeller som avbildar ett fönster kring en cell på dess poäng och hotklass.
+
+    Ett fönster består av to_win celler på var sida om den evaluerade cellen i en riktning, packade
+    med två bitar per cell och den evaluerade cellen borttagen. Cellen närmast i negativ riktning
+    ligger i de högsta bitarna av den nedre halvan och cellen närmast i positiv riktning i de lägsta
+    bitarna av den övre halvan.
+
+    Hottabellerna använder fönster med to_win - 1 celler på var sida (threat_radius). Med regler där
+    exakt fem krävs behövs en cell till på var sida för att se om en rad blir för lång, och för renju
+    finns även tabeller över drag som ger X en överlinje respektive två fyror på samma linje.
+    """
+
+    def __init__(self, to_win: int, rule: str = "freestyle") -> None:
+        self.to_win = to_win
+        self.rule = rule
+        self.score_x, self.score_o = build_score_tables(to_win)
+
+        exact = {"freestyle": (False, False), "exact": (True, True), "renju": (True, False)}[rule]
+        self.threat_radius = to_win if any(exact) else to_win - 1
+        self.threat_x, self.threat_o = build_threat_tables(to_win, self.threat_radius, exact)
+        self.overline_x = build_overline_table(to_win, self.threat_radius) if rule == "renju" else None
+        self.double_four_x = build_double_four_table(to_win, self.threat_radius) if rule == "renju" else None
+
+
+def get_tables(to_win: int, rule: str = "freestyle") -> PatternTables:
+    """Returnera tabellerna för ett givet antal i rad och en regelvariant, från minnet, från diskcachen eller nygenererade.
+
+    Args:
+        to_win (int): Antal symboler i rad som krävs för vinst
+        rule (str): Regelvarianten, se RULES
+
+    Returns:
+        PatternTables: Tabellerna för to_win och regelvarianten.
+    """
+    tables = _tables.get((to_win, rule))
+    if tables is not None:
+        return tables
+
+    digest = hashlib.sha1(repr((TABLE_VERSION, sorted(RUN_SCORES.items()))).encode()).hexdigest()[:12]
+    path = os.path.join(CACHE_DIR, f"patterns_{to_win}_{rule}_{digest}.pickle")
+
+    try:
+        with open(path, "rb") as file:
+            tables = pickle.load(file)
+        os.utime(path)  # Markera filen som nyligen använd, se prune_cache
+    except (OSError, pickle.UnpicklingError, EOFError):
+        tables = PatternTables(to_win, rule)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(path + ".tmp", "wb") as file:
+                pickle.dump(tables, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+            prune_cache(f"patterns_{to_win}_{rule}_")
+        except OSError:
+            pass  # Utan skrivbar cache genereras tabellerna vid varje start
+
+    _tables[to_win, rule] = tables
+    return tables
+
+
+def prune_cache(prefix: str) -> None:
+    """Ta bort cachade tabeller med ett givet prefix utom de CACHE_KEEP senast använda.
+
+    Poängen ingår i tabellerna, så varje ny uppsättning vikter (t.ex. från tune.py) ger en ny fil.
+
+    Args:
+        prefix (str): Filnamnets början, t.ex. "patterns_5_renju_"
+    """
+    paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.startswith(prefix)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[CACHE_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # En annan process kan redan ha tagit bort filen
+
+
+def build_score_tables(to_win: int, run_scores: dict | None = None) -> tuple[array.array, array.array]:
+    """Beräkna poängen för varje fönster med samma regler som den cellvisa genomgången av en linje.
+
+    Från den evaluerade cellen räknas först symboler i positiv riktning och sedan i negativ riktning,
+    sammanlagt högst to_win stycken. En ände är blockerad om raden slutar vid motståndarens symbol
+    eller brädets kant, utom när kanten ligger direkt intill den evaluerade cellen.
+
+    Args:
+        to_win (int): Antal symboler i rad som krävs för vinst
+        run_scores (dict | None): Poängen per antal i rad, annars RUN_SCORES
+
+    Returns:
+        tuple[array.array, array.array]: Poängtabellerna för X och O.
+    """
+    side_codes = 4**to_win
+    score_tables = []
+
+    for symbol in (X_CELL, O_CELL):
+        # (antal i rad, blockerad) för den positiva sidan, givet dess celler
+        heads = [
+            count_side([(head >> (2 * i)) & 3 for i in range(to_win)], symbol, to_win)
+            for head in range(side_codes)
+        ]
+        # (antal i rad, blockerad) för den negativa sidan, givet hur många symboler som återstår
+        tails = [
+            [
+                count_side([(tail >> (2 * (to_win - 1 - i))) & 3 for i in range(to_win)], symbol, cap)
+                for tail in range(side_codes)
+            ]
+            for cap in range(to_win + 1)
+        ]
+
+        rows = {}
+        table = array.array("i")
+        for head_run, blocked_end in heads:
+            key = (head_run, blocked_end)
+            if key not in rows:
+                rows[key] = [
+                    run_score(head_run + tail_run, blocked_start, blocked_end, run_scores)
+                    for tail_run, blocked_start in tails[to_win - head_run]
+                ]
+            table.extend(rows[key])
+        score_tables.append(table)
+
+    return score_tables[0], score_tables[1]
+
+
+def count_side(cells: list[int], symbol: int, cap: int) -> tuple[int, bool]:
+    """Räkna symboler i rad från den evaluerade cellen åt ena hållet.
+
+    Args:
+        cells (list[int]): Cellkoderna med den närmaste cellen först
+        symbol (int): Evaluerad cellkod
+        cap (int): Högsta antal symboler som får räknas
+
+    Returns:
+        tuple[int, bool]: Antal symboler i rad och om raden är blockerad.
+    """
+    if cells[0] == WALL:
+        return 0, False
+
+    run = 0
+    while run < len(cells) and cells[run] == symbol and run < cap:
+        run += 1
+
+    # Celler bortom fönstret kan bara nås av en redan vunnen rad och räknas som blockerade
+    return run, run == len(cells) or cells[run] != EMPTY
+
+
+def run_score(run: int, blocked_start: bool, blocked_end: bool, run_scores: dict | None = None) -> int:
+    """Poängsätt en rad baserat på antal symboler i rad och blockerade ändar."""
+    run_scores = RUN_SCORES if run_scores is None else run_scores
+    if run not in run_scores:
+        return 0
+    open_score, half_open_score = run_scores[run]
+    if not blocked_start and not blocked_end:
+        return open_score
+    elif not blocked_start or not blocked_end:
+        return half_open_score
+    return 0
+
+
+def side_patterns(radius: int, symbol: int) -> list[tuple[int, ...]]:
+    """Returnera cellerna på ena sidan av ett drag för varje kod, ur den dragandes perspektiv.
+
+    Cellerna anges som 1 = egen, 0 = tom och 2 = blockerad (motståndare eller kant), i linjens ordning.
+    """
+    return [
+        tuple(
+            1 if cell == symbol else 0 if cell == EMPTY else 2
+            for cell in ((code >> (2 * i)) & 3 for i in range(radius))
+        )
+        for code in range(4**radius)
+    ]
+
+
+def build_threat_tables(
+    to_win: int, radius: int | None = None, exact: tuple[bool, bool] = (False, False)
+) -> tuple[bytearray, bytearray]:
+    """Beräkna hotklassen för ett drag i varje inre fönster, dvs radius celler på var sida om draget.
+
+    Args:
+        to_win (int): Antal symboler i rad som krävs för vinst
+        radius (int | None): Antal celler på var sida, annars to_win - 1
+        exact (tuple[bool, bool]): Om X respektive O måste få exakt to_win i rad för att vinna
+
+    Returns:
+        tuple[bytearray, bytearray]: Hotklasserna för drag av X och O.
+    """
+    radius = to_win - 1 if radius is None else radius
+    side_mask = 4**radius - 1
+    threat_tables = []
+
+    for symbol, exact_five in zip((X_CELL, O_CELL), exact):
+        sides = side_patterns(radius, symbol)
+        classes = {}
+        table = bytearray(4 ** (2 * radius))
+        for code in range(len(table)):
+            pattern = sides[code & side_mask] + (1,) + sides[code >> (2 * radius)]
+            if pattern not in classes:
+                classes[pattern] = classify(pattern, radius, to_win, exact_five)
+            table[code] = classes[pattern]
+        threat_tables.append(table)
+
+    return threat_tables[0], threat_tables[1]
+
+
+def build_overline_table(to_win: int, radius: int) -> bytearray:
+    """Markera de fönster där ett drag av X ger fler än to_win i rad genom draget, en överlinje."""
+    side_mask = 4**radius - 1
+    sides = side_patterns(radius, X_CELL)
+    table = bytearray(4 ** (2 * radius))
+    for code in range(len(table)):
+        pattern = sides[code & side_mask] + (1,) + sides[code >> (2 * radius)]
+        table[code] = run_through(pattern, radius) > to_win
+    return table
+
+
+def build_double_four_table(to_win: int, radius: int) -> bytearray:
+    """Markera de fönster där ett drag av X ger två fyror på samma linje, t.ex. X.XXX.X (renju).
+
+    Hotklassen räknar bara en fyra per riktning, så en dubbelfyra på en linje syns inte i hottabellerna.
+    """
+    side_mask = 4**radius - 1
+    sides = side_patterns(radius, X_CELL)
+    table = bytearray(4 ** (2 * radius))
+    for code in range(len(table)):
+        pattern = sides[code & side_mask] + (1,) + sides[code >> (2 * radius)]
+        table[code] = count_fours(pattern, radius, to_win) >= 2
+    return table
+
+
+def count_fours(pattern: tuple[int, ...], center: int, to_win: int) -> int:
+    """Räkna fyrorna genom mittcellen för X under renju, där en öppen fyra räknas som en fyra.
+
+    Varje tom cell som ger exakt fem i rad är en fyra, utom när två sådana celler omsluter samma rad
+    om to_win - 1 egna symboler, vilket är en och samma öppna fyra.
+    """
+    if is_five(pattern, center, to_win, exact=True):
+        return 0
+    completions = five_completions(pattern, center, to_win, exact=True)
+    fours = len(completions)
+    for first, second in zip(completions, completions[1:]):
+        if second - first == to_win and all(cell == 1 for cell in pattern[first + 1 : second]):
+            fours -= 1
+    return fours
+
+
+def classify(pattern: tuple[int, ...], center: int, to_win: int, exact: bool = False) -> int:
+    """Klassificera ett drag givet linjen kring draget, där draget redan är placerat i mitten.
+
+    Args:
+        pattern (tuple[int, ...]): Linjen med 1 = egen, 0 = tom och 2 = blockerad
+        center (int): Dragets index i linjen
+        to_win (int): Antal symboler i rad som krävs för vinst
+        exact (bool): True om en rad längre än to_win inte vinner
+
+    Returns:
+        int: Dragets hotklass.
+    """
+    if is_five(pattern, center, to_win, exact):
+        return FIVE
+
+    completions = len(five_completions(pattern, center, to_win, exact))
+    if completions >= 2:
+        return OPEN_FOUR
+    if completions == 1:
+        return FOUR
+
+    threat = NONE
+    for index, cell in enumerate(pattern):
+        if cell != 0:
+            continue
+        extended = pattern[:index] + (1,) + pattern[index + 1 :]
+        completions = len(five_completions(extended, center, to_win, exact))
+        if completions >= 2:
+            return OPEN_THREE
+        if completions == 1:
+            threat = THREE
+    return threat
+
+
+def is_five(pattern: tuple[int, ...], center: int, to_win: int, exact: bool = False) -> bool:
+    """Kontrollera om raden genom mittcellen vinner, dvs är to_win lång eller längre om exakt fem inte krävs."""
+    run = run_through(pattern, center)
+    return run == to_win if exact else run >= to_win
+
+
+def five_completions(pattern: tuple[int, ...], center: int, to_win: int, exact: bool = False) -> list[int]:
+    """Returnera de tomma celler som ger en vinnande rad genom mittcellen."""
+    return [
+        index
+        for index, cell in enumerate(pattern)
+        if cell == 0
+        and is_five(pattern[:index] + (1,) + pattern[index + 1 :], center, to_win, exact)
+    ]
+
+
+def run_through(pattern: tuple[int, ...], center: int) -> int:
+    """Räkna egna symboler i rad genom mittcellen."""
+    start = center
+    while start > 0 and pattern[start - 1] == 1:
+        start -= 1
+    end = center
+    while end < len(pattern) - 1 and pattern[end + 1] == 1:
+        end += 1
+    return end - start + 1
+
+
+def line_geometry(rows: int, cols: int) -> tuple[list, list]:
+    """Returnera hur brädets celler fördelas på linjer i varje riktning.
+
+    Args:
+        rows (int): Antal rader på brädet
+        cols (int): Antal kolumner på brädet
+
+    Returns:
+        tuple[list, list]: Per riktning, (linje, index) för varje cell [row][col] samt längden på varje linje.
+    """
+    geometry = _geometries.get((rows, cols))
+    if geometry is not None:
+        return geometry
+
+    cell_lines = []
+    line_lengths = []
+    for dr, dc in DIRECTIONS:
+        cells = [[None] * cols for _ in range(rows)]
+        lengths = []
+        for row in range(rows):
+            for col in range(cols):
+                # Varje linje börjar i den cell som saknar granne i negativ riktning
+                if 0 <= row - dr < rows and 0 <= col - dc < cols:
+                    continue
+                index, r, c = 0, row, col
+                while 0 <= r < rows and 0 <= c < cols:
+                    cells[r][c] = (len(lengths), index)
+                    index, r, c = index + 1, r + dr, c + dc
+                lengths.append(index)
+        cell_lines.append(cells)
+        line_lengths.append(lengths)
+
+    geometry = (cell_lines, line_lengths)
+    _geometries[(rows, cols)] = geometry
+    return geometry
+
+
+def empty_line(length: int, to_win: int) -> int:
+    """Returnera en packad tom linje med to_win kantceller på var sida."""
+    line = 0
+    for index in list(range(to_win)) + list(range(to_win + length, 2 * to_win + length)):
+        line |= WALL << (2 * index)
+    return line
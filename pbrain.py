@@ -0,0 +1,285 @@
+import argparse
+import sys
+import threading
+import time
+
+from clock import *
+from player import *
+
+# Standardvärden för tidsgränserna i protokollet, i millisekunder
+DEFAULT_TIMEOUT_TURN = 5000
+DEFAULT_TIMEOUT_MATCH = 180000
+
+# Tid i sekunder som reserveras för att läsa in och skicka svaret
+RESPONSE_MARGIN = 0.05
+
+ABOUT = 'name="Gomuko-AI", version="1.0", author="walterchef", country="SE"'
+
+# Bitar i INFO rule: exakt fem i rad respektive renju
+RULE_EXACT = 1
+RULE_RENJU = 4
+
+
+class ProtocolEngine:
+    """Motor som talar Gomocup/Piskvork-protokollet på stdin och stdout, utan grafik, så att turneringsprogram kan starta den.
+
+    Motorn spelar med X och motståndaren med O, oavsett vem som börjar. Under renju har bara den som börjar
+    förbjudna drag, så där spelar den som börjar med X. Koordinaterna i protokollet är "x,y" där x är kolumnen
+    och y är raden.
+    """
+
+    def __init__(self, output=sys.stdout) -> None:
+        self.output = output
+        self.board: Board | None = None
+        self.rule = "freestyle"
+        self.player: AI_Player | None = None
+        self.info = {
+            "timeout_turn": DEFAULT_TIMEOUT_TURN,
+            "timeout_match": DEFAULT_TIMEOUT_MATCH,
+            "time_left": DEFAULT_TIMEOUT_MATCH,
+            "max_memory": 0,
+        }
+        self.time_manager = TimeManager()
+        self.board_lines: list[str] | None = None
+        self.running = True
+        # Tråden som läser in mönstertabellerna efter START, se load_tables
+        self.loader: threading.Thread | None = None
+        # Tidpunkten då det senaste kommandot togs emot, tiden sedan dess dras från dragets budget
+        self.received = time.perf_counter()
+
+    def send(self, line: str) -> None:
+        """Skriv en rad till turneringsprogrammet."""
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def handle(self, line: str) -> None:
+        """Behandla en rad från turneringsprogrammet.
+
+        Args:
+            line (str): Raden utan radslut
+        """
+        self.received = time.perf_counter()
+        line = line.strip()
+        if not line:
+            return
+
+        # Mellan BOARD och DONE är raderna positionens drag
+        if self.board_lines is not None:
+            if line.upper() == "DONE":
+                self.finish_board()
+            else:
+                self.board_lines.append(line)
+            return
+
+        command, _, arguments = line.partition(" ")
+        command = command.upper()
+        # Kommandon som rör brädet väntar tills tabellerna är inlästa, så att de inte läses in två gånger samtidigt
+        if command not in ("START", "RECTSTART", "INFO", "ABOUT", "END"):
+            self.wait_for_tables()
+        try:
+            if command == "START":
+                self.start(int(arguments), int(arguments))
+            elif command == "RECTSTART":
+                cols, rows = (int(value) for value in arguments.split(","))
+                self.start(rows, cols)
+            elif command == "RESTART":
+                self.start(self.require_board().rows, self.board.cols)
+            elif command == "BEGIN":
+                self.choose_symbol(first=True)
+                self.play_move()
+            elif command == "TURN":
+                if self.require_board().marked_cells == 0:
+                    self.choose_symbol(first=False)
+                self.mark(self.parse_cell(arguments), self.player.opponent_symbol)
+                self.play_move()
+            elif command == "BOARD":
+                self.require_board()
+                self.board_lines = []
+            elif command == "TAKEBACK":
+                self.take_back(self.parse_cell(arguments))
+                self.send("OK")
+            elif command == "INFO":
+                self.set_info(arguments)
+            elif command == "ABOUT":
+                self.send(ABOUT)
+            elif command == "END":
+                self.running = False
+            else:
+                self.send(f"UNKNOWN {command}")
+        except ValueError as error:
+            self.send(f"ERROR {error}")
+
+    def start(self, rows: int, cols: int) -> None:
+        """Skapa ett tomt bräde och en ny AI, och svara OK."""
+        if rows < 5 or cols < 5:
+            raise ValueError(f"unsupported board size {cols}x{rows}")
+
+        self.wait_for_tables()
+        self.board = Board(rows, cols, 5, rule=self.rule)
+        self.player = AI_Player("X", max_depth=10)
+        self.send("OK")
+        self.load_tables()
+
+    def load_tables(self) -> None:
+        """Börja läsa in mönstertabellerna för regelvarianten i bakgrunden.
+
+        Renjutabellerna är flera megabyte, så START svarar direkt och tabellerna läses in medan
+        turneringsprogrammet skickar INFO. Från diskcachen tar det bråkdelar av en sekund, men saknas cachen
+        tar det flera sekunder att bygga tabellerna, så bygg den i förväg med pbrain.py --prebuild.
+        """
+        self.loader = threading.Thread(target=get_tables, args=(self.board.to_win, self.rule), daemon=True)
+        self.loader.start()
+
+    def wait_for_tables(self) -> None:
+        """Vänta tills en pågående inläsning av mönstertabellerna är klar."""
+        if self.loader is not None:
+            self.loader.join()
+            self.loader = None
+
+    def choose_symbol(self, first: bool) -> None:
+        """Låt motorn spela med X om den börjar och annars med O under renju, där färgerna inte är likvärdiga."""
+        self.require_board()
+        symbol = "X" if first or self.rule != "renju" else "O"
+        if self.player.symbol != symbol:
+            self.player = AI_Player(symbol, max_depth=10)
+
+    def require_board(self) -> Board:
+        """Returnera brädet, eller avvisa kommandot om START inte har skickats."""
+        if self.board is None:
+            raise ValueError("no board, send START first")
+        return self.board
+
+    def parse_cell(self, text: str) -> tuple[int, int]:
+        """Tolka "x,y" till en position (row, col) på brädet."""
+        x, y = (int(value) for value in text.split(",")[:2])
+        if self.require_board().out_of_range((y, x)):
+            raise ValueError(f"cell {x},{y} is outside the board")
+        return (y, x)
+
+    def mark(self, position: tuple[int, int], symbol: str) -> None:
+        """Markera en position på brädet efter att ha kontrollerat att den är tom."""
+        if self.board.board[position[0]][position[1]] != 0:
+            raise ValueError(f"cell {position[1]},{position[0]} is occupied")
+        self.board.mark_cell(symbol, position)
+
+    def finish_board(self) -> None:
+        """Ställ upp positionen som skickats mellan BOARD och DONE och gör ett drag."""
+        lines, self.board_lines = self.board_lines, None
+        self.board = Board(self.board.rows, self.board.cols, self.board.to_win, rule=self.rule)
+        try:
+            stones = [tuple(int(value) for value in line.split(",")) for line in lines]
+            # Har motorn lika många stenar som motståndaren var det motorn som började
+            own = sum(owner == 1 for _, _, owner in stones)
+            self.choose_symbol(first=own == len(stones) - own)
+            for x, y, owner in stones:
+                self.mark(self.parse_cell(f"{x},{y}"), self.player.symbol if owner == 1 else self.player.opponent_symbol)
+        except ValueError as error:
+            self.send(f"ERROR {error}")
+            return
+        self.play_move()
+
+    def take_back(self, position: tuple[int, int]) -> None:
+        """Ta tillbaka ett drag. Det senaste draget ångras direkt, andra drag genom att spela om partiet utan det."""
+        board = self.require_board()
+        if board.ordered_moves and board.ordered_moves[-1] == position:
+            board.undo_cell()
+            return
+
+        if position not in board.ordered_moves:
+            raise ValueError(f"cell {position[1]},{position[0]} is empty")
+
+        moves = [(move, board.board[move[0]][move[1]]) for move in board.ordered_moves if move != position]
+        self.board = Board(board.rows, board.cols, board.to_win, rule=self.rule)
+        for move, symbol in moves:
+            self.board.mark_cell(symbol, move)
+
+    def set_info(self, arguments: str) -> None:
+        """Spara en INFO-inställning, de som inte påverkar motorn ignoreras."""
+        key, _, value = arguments.partition(" ")
+        if key == "rule":
+            self.set_rule(int(value))
+        elif key in self.info:
+            try:
+                self.info[key] = int(value)
+            except ValueError:
+                pass
+
+    def set_rule(self, flags: int) -> None:
+        """Byt regelvariant enligt bitarna i INFO rule och ställ upp brädet på nytt med samma drag."""
+        rule = "renju" if flags & RULE_RENJU else "exact" if flags & RULE_EXACT else "freestyle"
+        if rule == self.rule:
+            return
+
+        self.wait_for_tables()
+        self.rule = rule
+        if self.board is not None:
+            board = self.board
+            self.board = Board(board.rows, board.cols, board.to_win, rule=rule)
+            for move in board.ordered_moves:
+                self.board.mark_cell(board.board[move[0]][move[1]], move)
+            self.load_tables()
+
+    def time_budget(self) -> float:
+        """Beräkna tidsbudgeten för draget utifrån INFO timeout_turn, time_left och timeout_match.
+
+        Returns:
+            float: Tidsbudgeten i sekunder.
+        """
+        budget = self.info["timeout_turn"] / 1000
+        if self.info["timeout_match"] > 0:
+            match_budget = self.time_manager.allocate(
+                self.info["time_left"] / 1000, 0.0, len(self.board.ordered_moves) // 2
+            )
+            budget = min(budget, match_budget) if budget > 0 else match_budget
+        return max(budget - RESPONSE_MARGIN, 0.01)
+
+    def play_move(self) -> None:
+        """Sök fram och gör motorns drag, och skicka det som "x,y"."""
+        board = self.require_board()
+        if board.board_full():
+            raise ValueError("board is full")
+
+        max_memory = self.info["max_memory"] or None
+        # Väntan på tabellerna och uppställningen av positionen räknas in i dragets tid
+        elapsed = time.perf_counter() - self.received
+        budget = self.time_budget()
+        if elapsed >= budget:
+            # Draget kommer för sent oavsett sökningen, säg det i stället för att tyst dra över tiden
+            self.send(
+                f"MESSAGE {elapsed * 1000:.0f} ms passed before the search, mostly loading pattern tables; "
+                "build the cache with pbrain.py --prebuild"
+            )
+        time_limit = max(budget - elapsed, 0.01)
+        move = self.player.make_move(board, time_limit=time_limit, max_memory=max_memory)
+        board.mark_cell(self.player.symbol, move)
+        self.send(f"{move[1]},{move[0]}")
+
+
+def prebuild() -> None:
+    """Bygg diskcachen med mönstertabellerna för alla regelvarianter, så att motorn aldrig bygger dem under ett parti."""
+    for rule in RULES:
+        start = time.perf_counter()
+        get_tables(5, rule)
+        print(f"{rule}: {time.perf_counter() - start:.1f}s")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Läs kommandon från stdin tills END eller filslut."""
+    parser = argparse.ArgumentParser(description="Gomocup protocol engine on stdin and stdout.")
+    parser.add_argument(
+        "--prebuild", action="store_true", help="build the pattern table cache for all rules and exit"
+    )
+    args = parser.parse_args(argv)
+    if args.prebuild:
+        prebuild()
+        return
+
+    engine = ProtocolEngine()
+    for line in sys.stdin:
+        engine.handle(line)
+        if not engine.running:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,33 @@
-import pygame
-import copy
+import os
 import sys
 import random
+import time
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Iterator
+
 from board import *
+from solver import *
+
+# Policymodellen och klustret importeras bara för typkontroll, så att AI:n kan användas utan numpy
+if TYPE_CHECKING:
+    from cluster import Coordinator
+    from policy import PolicyModel
+
+
+def current_memory() -> int:
+    """Returnera processens nuvarande minnesanvändning (RSS) i byte.
+
+    Returns:
+        int: Använt minne i byte, eller processens högsta användning om det nuvarande inte går att läsa av.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
 
 
 class Player(ABC):
@@ -32,6 +56,8 @@ class User_Player(Player):
         Returns:
             tuple[int, int]: Användarens drag (row, col)
         """
+        import pygame
+
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -44,51 +70,677 @@ class User_Player(Player):
                         return (row, col)
 
 
+# Drag med lägre prioritet i order_moves varken skapar eller blockerar en öppen trea och räknas som tysta
+QUIET_PRIORITY = 2 * OPEN_THREE - 1
+
+
+# Antal drag efter lövnoden där quiescence-sökningen även provar drag som skapar en öppen trea
+QUIESCENCE_THREE_PLIES = 2
+
+
+# Typ av värde i transpositionstabellen: exakt, undre gräns (avskärning) eller övre gräns (inget drag nådde alfa)
+EXACT, LOWER, UPPER = range(3)
+
+# Antal sökningar som en post i transpositionstabellen behålls när tabellen börjar bli full
+TABLE_AGE = 4
+
+# Poäng över den här gränsen är vunna positioner, vars avstånd till vinsten beror på djupet
+WIN_BOUND = WIN_SCORE - 1000
+
+
+class SearchLimitReached(Exception):
+    """Signalerar att AI:ns budget för ett drag (tid, noder eller minne) har förbrukats mitt i en sökning."""
+
+
 class AI_Player(Player):
     """Klass för spelare av typen AI."""
 
     def __init__(
-        self, symbol: str, max_depth: int = 2
+        self,
+        symbol: str,
+        max_depth: int = 2,
+        time_limit: float | None = None,
+        verbose: bool = False,
+        max_nodes: int | None = None,
+        max_memory: int | None = None,
+        late_move_reductions: bool = True,
+        reduction_threshold: int = 3,
+        futility_pruning: bool = True,
+        futility_margin: int | None = None,
+        table_size: int = 1 << 20,
+        quiescence: bool = True,
+        quiescence_depth: int = 6,
+        quiescence_nodes: int = 48,
+        proof_search: bool = True,
+        proof_threshold: int = 8,
+        proof_nodes: int = 2000,
+        policy: "str | PolicyModel | None" = None,
+        policy_top_k: int | None = None,
+        warm_start: bool = True,
+        cluster: "Coordinator | None" = None,
     ) -> None:  
         super().__init__(symbol)
         self.opponent_symbol = "O" if symbol == "X" else "X"
         self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.verbose = verbose
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+        self.late_move_reductions = late_move_reductions
+        self.reduction_threshold = reduction_threshold
+        self.futility_pruning = futility_pruning
+        # Marginalen och aspirationsfönstret mäts i brädets evaluering, se set_margins. En angiven marginal
+        # används som den är, annars blir den tre öppna treor
+        self.futility_margin = futility_margin
+        self.margin = futility_margin
+        self.table_size = table_size
+        self.quiescence = quiescence
+        self.quiescence_depth = quiescence_depth
+        self.quiescence_nodes = quiescence_nodes
+        self.quiescence_budget = 0
+        self.proof_search = proof_search
+        self.proof_threshold = proof_threshold
+        self.proof_nodes = proof_nodes
+        # Lösaren behålls mellan dragen, så att bevis från tidigare drag återanvänds
+        self.solver = ProofSolver()
+        # Policymodellen kräver numpy och läses bara in om den används, från en viktfil eller som ett färdigt objekt
+        if isinstance(policy, str):
+            from policy import PolicyModel
 
-    def make_move(self, board: Board) -> tuple[int, int]:
+            policy = PolicyModel.load(policy)
+        self.policy = policy
+        self.policy_top_k = policy_top_k
+        self.warm_start = warm_start
+        # Med en koordinator söks rotdragen av arbetarprocesser, se cluster.py
+        self.cluster = cluster
+        # Transpositionstabell: Zobrist-nyckel -> (återstående djup, poäng, typ av värde, bästa drag, generation)
+        self.transpositions: dict[int, tuple[int, int, int, tuple[int, int] | None, int]] = {}
+        # Räknas upp för varje sökning, så att poster från gamla sökningar kan rensas bort först
+        self.generation = 0
+        # Rotdrag som inte ska sökas, används för att hitta det näst bästa draget osv. i analyze
+        self.excluded_moves: set[tuple[int, int]] = set()
+        self.killers: dict[int, list[tuple[int, int]]] = {}
+        self.history: dict[tuple[int, int], int] = {}
+        # Dragen fram till föregående söknings rot, för att se hur långt principalvariationen har följts
+        self.root_moves: list[tuple[int, int]] = []
+        self.deadline = None
+        self.node_limit = None
+        self.memory_limit = None
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+        self.principal_variation: list[tuple[int, int]] = []
+        self.iteration_scores: list[int] = []
+        self.root_best = None
+        self.aspiration_window = None
+        # Hur det senaste draget valdes: "opening", "forced", "proof", "search" (ett fullständigt sökt djup),
+        # "interrupted" (bästa rotdraget från ett avbrutet varv) eller "fallback" (inget djup hann sökas)
+        self.move_source: str | None = None
+
+    def make_move(
+        self,
+        board: Board,
+        time_limit: float | None = None,
+        max_nodes: int | None = None,
+        max_memory: int | None = None,
+    ) -> tuple[int, int]:
         """Returnera AI:ns drag baserat på svårighetsgraden.
 
+        Sökningen fördjupas iterativt upp till maximala djupet. Varje varv söks med ett aspirationsfönster
+        kring föregående varvs poäng, och föregående varvs principalvariation provas först. Med en koordinator
+        (cluster) söks rotdragen i stället av arbetarprocesser.
+        Om budgeten tar slut mitt i ett varv avbryts sökningen och det bästa draget hittills returneras.
+
         Args:
             board (Board): Logisk representation av spelbrädet
+            time_limit (float | None): Tidsbudget i sekunder, annars AI:ns egen
+            max_nodes (int | None): Högsta antal noder som får sökas, annars AI:ns eget
+            max_memory (int | None): Högsta minnesanvändning för processen i byte, annars AI:ns egen
 
         Returns:
             tuple[int, int]: AI:ns drag (row, col)
         """
+        time_limit, start = self.prepare_search(board, time_limit, max_nodes, max_memory)
 
         if board.marked_cells == 0:
             move = (int(board.rows / 2), int(board.cols / 2))
+            self.principal_variation = [move]
+            self.move_source = "opening"
+            return move
+
+        move = self.forced_move(board)
+        if move is not None:
+            self.move_source = "forced"
+            return move
+
+        move = self.proven_move(board)
+        if move is not None:
+            self.move_source = "proof"
+            return move
+
+        move = None
+        marked_before = len(board.ordered_moves)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                if self.cluster is None:
+                    score, best_move, pv = self.aspiration_search(board, depth)
+                else:
+                    score, best_move, pv = self.cluster.search_root(self, board, depth)
+            except SearchLimitReached:
+                # Återställ brädet och använd det bästa fullständigt sökta rotdraget från det avbrutna varvet
+                while len(board.ordered_moves) > marked_before:
+                    board.undo_cell()
+                if self.root_best is not None and self.root_best[1] != move:
+                    self.last_score, move, self.principal_variation = self.root_best
+                    self.move_source = "interrupted"
+                break
+
+            if best_move is not None:
+                move = best_move
+                self.move_source = "search"
+                self.last_score = score
+                self.last_depth = depth
+                self.principal_variation = pv
+                self.iteration_scores.append(score)
+
+            # Nästa varv tar oftast längre tid än alla tidigare tillsammans, påbörja det inte om halva budgeten är förbrukad
+            if time_limit is not None and time.perf_counter() - start > time_limit / 2:
+                break
+
+        if move is None:
+            move = self.fallback_move(board)
+            self.move_source = "fallback"
+        return move    
+
+    def fallback_move(self, board: Board) -> tuple[int, int]:
+        """Välj ett drag när budgeten inte ens räckte för djup ett.
+
+        Principalvariationens drag från föregående sökning väljs om partiet har följt den, annars det
+        första rimliga draget.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+
+        Raises:
+            ValueError: Om det inte finns något rimligt drag.
+
+        Returns:
+            tuple[int, int]: Draget (row, col)
+        """
+        moves = board.get_potential_moves(self.symbol)
+        pv_move = self.principal_variation[0] if self.principal_variation else None
+        move = pv_move if pv_move in moves else next(iter(moves), None)
+        if move is None:
+            raise ValueError("AI could not find a valid move!")
+        self.principal_variation = [move]
+        return move
+
+    def forced_move(self, board: Board) -> tuple[int, int] | None:
+        """Returnera draget utan sökning när det är givet: ett vinnande drag eller det enda draget som blockerar.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+
+        Returns:
+            tuple[int, int] | None: Det givna draget, annars None.
+        """
+        moves = sorted(board.get_potential_moves(self.symbol))
+        if moves and board.is_winning_move(self.symbol, moves[0]):
+            self.last_score = WIN_SCORE
+        elif len(moves) != 1:
+            return None
+        self.principal_variation = [moves[0]]
+        return moves[0]
+
+    def proven_move(self, board: Board) -> tuple[int, int] | None:
+        """Fråga bevislösaren när bara ett fåtal kandidatdrag återstår, och returnera draget om vinsten bevisas.
+
+        Lösarens noder räknas in i sökningens nodbudget, och den får högst en fjärdedel av tidsbudgeten.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+
+        Returns:
+            tuple[int, int] | None: Det bevisat vinnande draget, annars None.
+        """
+        if not self.proof_search or not board.track_threats:
+            return None
+        if not 1 < len(board.get_potential_moves(self.symbol)) <= self.proof_threshold:
+            return None
+
+        max_nodes = self.proof_nodes
+        if self.node_limit is not None:
+            max_nodes = min(max_nodes, self.node_limit // 2)
+        time_limit = None if self.deadline is None else max(self.deadline - time.perf_counter(), 0) / 4
+
+        nodes_before = self.solver.nodes
+        result, move = self.solver.solve(board, self.symbol, max_nodes, time_limit)
+        self.nodes += self.solver.nodes - nodes_before
+        if result != "win" or move is None:
+            return None
+
+        self.last_score = WIN_SCORE
+        self.principal_variation = [move]
+        return move
+
+    def prepare_search(
+        self, board: Board, time_limit: float | None, max_nodes: int | None, max_memory: int | None
+    ) -> tuple[float | None, float]:
+        """Nollställ sökningens statistik och sätt budgetarna inför ett nytt drag.
+
+        Med warm_start behålls transpositionstabellen, killer-dragen, historiken och principalvariationen
+        från föregående sökning, se age_search_state. Annars nollställs även de.
+
+        Args:
+            board (Board): Positionen som ska sökas
+            time_limit (float | None): Tidsbudget i sekunder, annars AI:ns egen
+            max_nodes (int | None): Högsta antal noder som får sökas, annars AI:ns eget
+            max_memory (int | None): Högsta minnesanvändning för processen i byte, annars AI:ns egen
+
+        Returns:
+            tuple[float | None, float]: Tidsbudgeten som gäller och tidpunkten då sökningen startade.
+        """
+        self.nodes = 0
+        self.iteration_scores = []
+        self.excluded_moves = set()
+        if self.warm_start:
+            self.age_search_state(board)
         else:
-            move = self.minimax(
+            self.clear_search_state()
+        self.last_score = None
+        self.last_depth = 0
+        self.root_moves = board.ordered_moves[:]
+        self.set_margins(board)
+
+        time_limit = self.time_limit if time_limit is None else time_limit
+        start = time.perf_counter()
+        self.deadline = None if time_limit is None else start + time_limit
+        self.node_limit = self.max_nodes if max_nodes is None else max_nodes
+        self.memory_limit = self.max_memory if max_memory is None else max_memory
+        return time_limit, start
+
+    def set_margins(self, board: Board) -> None:
+        """Skala futility-marginalen och aspirationsfönstret efter brädets evaluering.
+
+        Med "runs" ger standardvikterna marginalen 3000 och fönstret 250, med "segments" är poängen en tiondel
+        så stora och marginalerna likaså.
+
+        Args:
+            board (Board): Positionen som ska sökas
+        """
+        unit = board.open_three_score()
+        self.margin = 3 * unit if self.futility_margin is None else self.futility_margin
+        self.aspiration_window = max(unit // 4, 1)
+
+    def age_search_state(self, board: Board) -> None:
+        """Anpassa det som lärts i tidigare sökningar till en ny rot i stället för att kasta bort det.
+
+        Om partiet har följt föregående principalvariation fortsätter den från den nya roten och killer-dragen
+        flyttas lika många nivåer upp. Annars nollställs båda. Historikpoängen halveras så att nya avskärningar
+        väger tyngre, och när tabellen är mer än halvfull rensas poster som är äldre än TABLE_AGE sökningar.
+        Den iterativa fördjupningen börjar ändå på djup ett, men de grunda varven blir billiga med den varma
+        tabellen och ger alltid ett fullständigt sökt drag att falla tillbaka på.
+
+        Args:
+            board (Board): Positionen som ska sökas
+        """
+        self.generation += 1
+        played = board.ordered_moves[len(self.root_moves) :]
+        if board.ordered_moves[: len(self.root_moves)] == self.root_moves and played == self.principal_variation[
+            : len(played)
+        ]:
+            self.principal_variation = self.principal_variation[len(played) :]
+            self.killers = {
+                depth - len(played): killers for depth, killers in self.killers.items() if depth >= len(played)
+            }
+        else:
+            self.principal_variation = []
+            self.killers = {}
+
+        self.history = {move: score >> 1 for move, score in self.history.items() if score > 1}
+        if len(self.transpositions) > self.table_size // 2:
+            self.evict_entries(TABLE_AGE)
+
+    def evict_entries(self, generations: int) -> None:
+        """Rensa poster som är äldre än ett antal sökningar ur transpositionstabellen.
+
+        Om tabellen fortfarande är mer än halvfull behålls bara den djupare hälften av posterna, så att
+        en full tabell mitt i en sökning inte behöver tömmas helt.
+
+        Args:
+            generations (int): Antal tidigare sökningar vars poster behålls
+        """
+        oldest = self.generation - generations
+        self.transpositions = {key: entry for key, entry in self.transpositions.items() if entry[4] >= oldest}
+        if len(self.transpositions) > self.table_size // 2:
+            entries = sorted(self.transpositions.items(), key=lambda item: item[1][0], reverse=True)
+            self.transpositions = dict(entries[: self.table_size // 2])
+
+    def clear_search_state(self) -> None:
+        """Glöm allt som lärts i tidigare sökningar, t.ex. inför analys av en orelaterad position."""
+        self.principal_variation = []
+        self.killers = {}
+        self.history = {}
+        self.transpositions = {}
+
+    def analyze(
+        self,
+        board: Board,
+        k: int = 3,
+        time_limit: float | None = None,
+        max_nodes: int | None = None,
+        max_memory: int | None = None,
+    ) -> list[tuple[tuple[int, int], int, list[tuple[int, int]]]]:
+        """Returnera de k bästa dragen med poäng och principalvariation (multi-PV), för analys och tips.
+
+        Varje varv i den iterativa fördjupningen söker roten k gånger, och varje gång utesluts de drag som
+        redan hittats. Sökningarna delar transpositionstabell, killer-drag och historik, så de senare
+        sökningarna blir betydligt billigare än den första. Om motståndaren hotar att vinna finns bara de
+        blockerande dragen och listan kan bli kortare än k.
+
+        Args:
+            board (Board): Logisk representation av spelbrädet
+            k (int): Antal drag
+            time_limit (float | None): Tidsbudget i sekunder, annars AI:ns egen
+            max_nodes (int | None): Högsta antal noder som får sökas, annars AI:ns eget
+            max_memory (int | None): Högsta minnesanvändning för processen i byte, annars AI:ns egen
+
+        Returns:
+            list[tuple[tuple[int, int], int, list[tuple[int, int]]]]: (drag, poäng, principalvariation), bäst först.
+        """
+        time_limit, start = self.prepare_search(board, time_limit, max_nodes, max_memory)
+
+        if board.marked_cells == 0:
+            move = (int(board.rows / 2), int(board.cols / 2))
+            return [(move, 0, [move])]
+
+        lines = []
+        marked_before = len(board.ordered_moves)
+        for depth in range(1, self.max_depth + 1):
+            found = []
+            try:
+                for rank in range(k):
+                    # Föregående varvs linje på samma plats sorteras först
+                    self.principal_variation = lines[rank][2] if rank < len(lines) else []
+                    score, move, pv = self.minimax(board, 0, depth, float("-inf"), float("inf"), True)
+                    if move is None:
+                        break
+                    found.append((move, score, pv))
+                    self.excluded_moves.add(move)
+            except SearchLimitReached:
+                while len(board.ordered_moves) > marked_before:
+                    board.undo_cell()
+                break
+            finally:
+                self.excluded_moves = set()
+
+            lines = sorted(found, key=lambda line: line[1], reverse=True)
+            self.last_depth = depth
+
+            if time_limit is not None and time.perf_counter() - start > time_limit / 2:
+                break
+
+        if lines:
+            self.last_score = lines[0][1]
+            self.principal_variation = lines[0][2]
+        return lines
+
+    def check_limits(self) -> None:
+        """Avbryt sökningen om tids-, nod- eller minnesbudgeten är förbrukad.
+
+        Raises:
+            SearchLimitReached: Om någon av budgetarna är förbrukad.
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchLimitReached("time")
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchLimitReached("nodes")
+        # Minnet är dyrare att läsa av och kontrolleras därför bara med jämna mellanrum
+        if self.memory_limit is not None and self.nodes % 256 == 0 and current_memory() > self.memory_limit:
+            raise SearchLimitReached("memory")
+
+    def aspiration_search(
+        self, board: Board, max_depth: int
+    ) -> tuple[int, tuple[int, int], list[tuple[int, int]]]:
+        """Sök från roten med ett smalt fönster kring föregående varvs poäng, och vidga fönstret om sökningen faller utanför.
+
+        Args:
+            board (Board): Logisk representation av brädet
+            max_depth (int): Djupet för det här varvet
+
+        Returns:
+            tuple[int, tuple[int, int], list[tuple[int, int]]]: Poäng, bästa drag och principalvariation
+        """
+        alpha, beta = float("-inf"), float("inf")
+        if self.last_score is not None and abs(self.last_score) < WIN_SCORE - self.max_depth:
+            alpha = self.last_score - self.aspiration_window
+            beta = self.last_score + self.aspiration_window
+
+        while True:
+            self.root_best = None
+            score, move, pv = self.minimax(
                 board,
                 depth=0,
-                max_depth=self.max_depth,
-                alpha=float("-inf"),
-                beta=float("inf"),
+                max_depth=max_depth,
+                alpha=alpha,
+                beta=beta,
                 maximizing=True,
-            )[1]
-            if move is None:
-                raise ValueError("AI could not find a valid move!")
-        return move    
-    
+            )
+
+            if score <= alpha:
+                alpha = float("-inf")
+            elif score >= beta:
+                beta = float("inf")
+            else:
+                return score, move, pv
 
     @staticmethod
     def weighted_board_score(score, depth):
-        if score == 1000000:
+        if score == WIN_SCORE:
             return score - depth
-        elif score == -1000000:
+        elif score == -WIN_SCORE:
             return score + depth
         else:
             return score
-        
+
+    def order_moves(
+        self,
+        board: Board,
+        moves: list[tuple[int, int]],
+        depth: int,
+        symbol: str,
+        table_move: tuple[int, int] | None = None,
+    ) -> list[tuple[tuple[int, int], int]]:
+        """Sortera dragen så att de som troligast är bäst söks först, vilket ger fler alfa-beta-avskärningar.
+
+        Transpositionstabellens drag söks först, sedan föregående varvs principalvariation, därefter drag efter
+        hur starkt hot de skapar eller blockerar, sedan killer-drag och sist övriga drag efter policymodellens
+        prior, om en modell används, och historikpoäng.
+
+        Args:
+            board (Board): Logisk representation av brädet
+            moves (list[tuple[int, int]]): Potentiella drag
+            depth (int): Djupet i sökträdet
+            symbol (str): Symbolen för spelaren som står på tur
+            table_move (tuple[int, int] | None): Bästa draget enligt transpositionstabellen
+
+        Returns:
+            list[tuple[tuple[int, int], int]]: Dragen i den ordning de ska sökas, med dragets prioritet enligt hoten.
+        """
+        opponent = "O" if symbol == "X" else "X"
+        pv_move = self.principal_variation[depth] if depth < len(self.principal_variation) else None
+        killers = self.killers.get(depth, [])
+        # Alla kandidater poängsätts i ett anrop till modellen, som cachar resultatet per position
+        priors = self.policy.score(board, symbol, moves) if self.policy is not None and moves else {}
+
+        ordered = []
+        for move in moves:
+            # Egna hot går före motsvarande blockeringar: egen femma 10, blockera femma 9, egen öppen fyra 8 osv.
+            priority = max(
+                2 * board.threat_class(symbol, move), 2 * board.threat_class(opponent, move) - 1, 0
+            )
+            ordered.append((move, priority))
+
+        ordered.sort(
+            key=lambda item: (
+                item[0] == table_move,
+                item[0] == pv_move,
+                item[1],
+                item[0] in killers,
+                priors.get(item[0], 0.0),
+                self.history.get(item[0], 0),
+                item[0],
+            ),
+            reverse=True,
+        )
+        return ordered
+
+    def pick_moves(
+        self,
+        board: Board,
+        depth: int,
+        symbol: str,
+        table_move: tuple[int, int] | None = None,
+        quiet_moves: bool = True,
+    ) -> Iterator[tuple[tuple[int, int], int]]:
+        """Generera dragen i samma ordning som order_moves, men i steg och bara så långt som sökningen kommer.
+
+        Transpositionstabellens drag kommer alltid först när det är spelbart. Med hotindexet hämtas vinnande
+        drag och tvingade blockeringar direkt ur hotmängderna, och finns sådana är bara de spelbara. Annars
+        kommer transpositionstabellens och principalvariationens drag, sedan alla drag som skapar eller
+        blockerar ett hot enligt hotmängderna, sorterade med samma nyckel som i order_moves, och sist drag
+        utan hot, med killer-dragen först. Först i sista steget byggs hela kandidatmängden, så noder som skär av på
+        något av de första dragen slipper det. Utan hotindex sorteras hela kandidatlistan med order_moves.
+
+        Args:
+            board (Board): Logisk representation av brädet. Får inte ändras mellan två drag från generatorn
+            depth (int): Djupet i sökträdet
+            symbol (str): Symbolen för spelaren som står på tur
+            table_move (tuple[int, int] | None): Bästa draget enligt transpositionstabellen
+            quiet_moves (bool): False om tysta drag bara ska genereras när inga andra drag finns (futility pruning)
+
+        Yields:
+            tuple[tuple[int, int], int]: Draget och dess prioritet enligt hoten.
+        """
+        # Under roten söks bara de bästa tysta dragen enligt modellen, hotfulla drag söks alltid
+        top_k = self.policy_top_k if self.policy is not None and depth > 0 else None
+        excluded = self.excluded_moves if depth == 0 else set()
+
+        if not board.track_threats or board.marked_cells == 0:
+            moves = board.get_potential_moves(symbol) if board.marked_cells != 0 else board.get_empty_cells()
+            moves = [move for move in moves if move not in excluded]
+            for index, item in enumerate(self.order_moves(board, moves, depth, symbol, table_move)):
+                if top_k is None or index < top_k or item[1] >= QUIET_PRIORITY:
+                    yield item
+            return
+
+        opponent = "O" if symbol == "X" else "X"
+        threats = board.threats[symbol]
+        opponent_threats = board.threats[opponent]
+
+        def priority(move: tuple[int, int]) -> int:
+            return max(2 * board.threat_class(symbol, move), 2 * board.threat_class(opponent, move) - 1, 0)
+
+        # Kan spelaren vinna direkt räcker de vinnande dragen, och har motståndaren en fyra måste den blockeras.
+        # Transpositionstabellens drag går först även här, om det är ett av dem. Uteslutna drag i roten räknas
+        # som tvingade, så att analyze inte fortsätter med andra drag när alla blockeringar redan är hittade
+        if threats[FIVE]:
+            forced = threats[FIVE]
+        else:
+            forced = {move for move in opponent_threats[FIVE] if not board.is_forbidden(symbol, move)}
+        if forced:
+            forced = sorted(forced - excluded)
+            if table_move in forced:
+                forced.remove(table_move)
+                forced.insert(0, table_move)
+            for move in forced:
+                yield move, priority(move)
+            return
+
+        def playable(move: tuple[int, int] | None) -> bool:
+            return (
+                move is not None
+                and move not in yielded
+                and move not in excluded
+                and board.is_candidate(move)
+                and not board.is_forbidden(symbol, move)
+            )
+
+        yielded = set()
+        pv_move = self.principal_variation[depth] if depth < len(self.principal_variation) else None
+        for move in (table_move, pv_move):
+            if playable(move):
+                yielded.add(move)
+                yield move, priority(move)
+
+        def skipped(move_priority: int) -> bool:
+            # Tysta drag behövs bara när inget drag har sökts eller när de inte beskärs bort
+            if move_priority >= QUIET_PRIORITY:
+                return False
+            return (top_k is not None and len(yielded) >= top_k) or (not quiet_moves and bool(yielded))
+
+        killers = self.killers.get(depth, [])
+        threatening = set().union(*(threats[threat] | opponent_threats[threat] for threat in range(THREE, FIVE + 1)))
+        threatening = [move for move in threatening if playable(move)]
+        priors = self.policy.score(board, symbol, threatening) if self.policy is not None and threatening else {}
+        ordered = [(move, priority(move)) for move in threatening]
+        ordered.sort(
+            key=lambda item: (
+                item[1], item[0] in killers, priors.get(item[0], 0.0), self.history.get(item[0], 0), item[0]
+            ),
+            reverse=True,
+        )
+        for move, move_priority in ordered:
+            if skipped(move_priority):
+                return
+            yielded.add(move)
+            yield move, move_priority
+
+        # Resten är drag utan hot, och bland dem går killer-dragen först precis som i order_moves
+        killer_moves = [move for move in killers if playable(move)]
+        priors = self.policy.score(board, symbol, killer_moves) if self.policy is not None and killer_moves else {}
+        killer_moves.sort(key=lambda move: (priors.get(move, 0.0), self.history.get(move, 0), move), reverse=True)
+        for move in killer_moves:
+            if skipped(0):
+                return
+            yielded.add(move)
+            yield move, priority(move)
+
+        quiet = [
+            move
+            for move in board.candidate_cells()
+            if move not in yielded and move not in excluded and not board.is_forbidden(symbol, move)
+        ]
+        if not quiet and not yielded and board.rule == "renju" and symbol == "X":
+            # Alla kandidater är förbjudna, X får då spela var som helst där det är tillåtet
+            quiet = [
+                move for move in board.get_empty_cells() if move not in excluded and not board.is_forbidden(symbol, move)
+            ]
+        priors = self.policy.score(board, symbol, quiet) if self.policy is not None and quiet else {}
+        ordered = [(move, priority(move)) for move in quiet]
+        ordered.sort(
+            key=lambda item: (item[1], priors.get(item[0], 0.0), self.history.get(item[0], 0), item[0]), reverse=True
+        )
+        for move, move_priority in ordered:
+            if skipped(move_priority):
+                return
+            yielded.add(move)
+            yield move, move_priority
+
+    def update_heuristics(self, move: tuple[int, int], depth: int, max_depth: int) -> None:
+        """Spara ett tyst drag som gav avskärning, så att det provas tidigt i systernoder och senare varv.
+
+        Args:
+            move (tuple[int, int]): Draget som gav avskärning
+            depth (int): Djupet i sökträdet
+            max_depth (int): Maximala djupet för sökningen
+        """
+        killers = self.killers.setdefault(depth, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + (max_depth - depth) ** 2
+
     def minimax(
         self,
         board: Board,
@@ -97,9 +749,14 @@ class AI_Player(Player):
         alpha: int,
         beta: int,
         maximizing: bool,
-    ) -> tuple[int, int]:  
+    ) -> tuple[int, tuple[int, int], list[tuple[int, int]]]:  
         """Returnera det bästa möjliga draget med minimaxalgoritmen för svårighetsgrad två av AI:n.
 
+        Sökningen är en principalvariationssökning: det första draget söks med hela fönstret och övriga
+        drag med ett nollfönster, som bara söks om med hela fönstret när draget visar sig vara bättre.
+        Sena tysta drag söks först med reducerat djup, och i noder närmast löven hoppas tysta drag över
+        när brädets statiska värde ligger för långt från fönstret för att kunna påverka resultatet.
+
         Args:
             board (Board): Logisk representation av brädet
             depth (int): Djup när vi kallar på metoden
@@ -109,85 +766,350 @@ class AI_Player(Player):
             maximizing (bool): True om minimerande spelaren kallar på metoden annars False 
 
         Returns:
-            tuple[int, int]: Bästa draget AI:n kan göra (row, col)
+            tuple[int, tuple[int, int], list[tuple[int, int]]]: Poäng, bästa draget AI:n kan göra (row, col)
+            och principalvariationen från den här noden
         """
-        AI_Player.print_depth(depth, f"Enter Minimax: depth = {depth}")
+        self.nodes += 1
+        self.check_limits()
+
+        self.print_depth(depth, f"Enter Minimax: depth = {depth}")
+
+        if depth >= max_depth or board.is_terminal(): # Evaluera brädets poäng när vi nått maximalt djup eller ett terminalt stadie.
+            if self.quiescence and board.track_threats and not board.is_terminal():
+                # Vid horisonten söks hotfulla drag vidare tills positionen är lugn
+                self.quiescence_budget = self.quiescence_nodes
+                board_score, pv = self.quiescence_search(board, depth, 0, alpha, beta, maximizing)
+                self.print_depth(depth, f"Exit Minimax, quiescence = {board_score}")
+                return board_score, None, pv
 
-        if depth == max_depth or board.is_terminal(): # Evaluera brädets poäng när vi nått maximalt djup eller ett terminalt stadie.
             board_score = board.evaluate_board(
                 self.symbol, self.opponent_symbol
             )
             
-            AI_Player.print_depth(depth, f"Exit Minimax, eval = {board_score}")
-            return self.weighted_board_score(board_score, depth), None
+            self.print_depth(depth, f"Exit Minimax, eval = {board_score}")
+            return self.weighted_board_score(board_score, depth), None, []
 
+        # Transpositionstabellen: i nollfönster räcker ett tillräckligt djupt lagrat värde, annars ger den ett bra första drag
+        table_move = None
+        entry = self.transpositions.get(board.hash) if depth > 0 else None
+        if entry is not None:
+            entry_depth, entry_score, bound, table_move, _ = entry
+            if entry_depth >= max_depth - depth and beta - alpha == 1:
+                score = self.score_from_table(entry_score, depth)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score, table_move, [table_move] if table_move is not None else []
+        original_alpha, original_beta = alpha, beta
 
         best_move = None
-        potential_moves = (
-            board.get_potential_moves(self.symbol)
-            if board.marked_cells != 0
-            else board.get_empty_cells()
-        ) 
+        best_pv = []
+        symbol = self.symbol if maximizing else self.opponent_symbol
+
+        # Futility pruning: kan inget tyst drag lyfta det statiska värdet till fönstret söks bara hotfulla drag
+        futile = False
+        if self.futility_pruning and max_depth - depth == 1:
+            static_score = board.evaluate_board(self.symbol, self.opponent_symbol)
+            if maximizing:
+                futile = static_score + self.margin <= alpha
+            else:
+                futile = static_score - self.margin >= beta
+
+        # Dragen genereras i steg medan de söks, så en tidig avskärning sparar genereringen av de tysta dragen
+        potential_moves = self.pick_moves(board, depth, symbol, table_move, quiet_moves=not futile)
 
         if maximizing:
             max_eval = float("-inf") # Sämsta möjliga evalueringen för den maximerande spelaren
 
             # Iteration över möjliga drag
-            for move in potential_moves: 
-                temp_board = copy.deepcopy(board)
-                temp_board.mark_cell(self.symbol, move)
-                AI_Player.print_depth(depth, f"move = {move}")
+            for index, (move, priority) in enumerate(potential_moves): 
+                quiet = priority < QUIET_PRIORITY
+                if futile and quiet and index > 0:
+                    continue
 
-                # Rekursivt anrop av funktionen
-                evaluation = self.minimax(
-                    temp_board, depth + 1, max_depth, alpha, beta, False
-                )[0]
+                board.mark_cell(self.symbol, move)
+                self.print_depth(depth, f"move = {move}")
+
+                # Rekursivt anrop av funktionen, med nollfönster för alla drag utom det första
+                if index == 0:
+                    evaluation, _, pv = self.minimax(
+                        board, depth + 1, max_depth, alpha, beta, False
+                    )
+                else:
+                    evaluation = float("inf")
+                    if self.reduce_move(index, quiet, depth, max_depth):
+                        # Late move reduction, sök om med fullt djup bara om draget ser ut att höja alfa
+                        evaluation, _, pv = self.minimax(
+                            board, depth + 1, max_depth - 1, alpha, alpha + 1, False
+                        )
+                    if evaluation > alpha:
+                        evaluation, _, pv = self.minimax(
+                            board, depth + 1, max_depth, alpha, alpha + 1, False
+                        )
+                    if alpha < evaluation < beta:
+                        evaluation, _, pv = self.minimax(
+                            board, depth + 1, max_depth, evaluation, beta, False
+                        )
+
+                board.undo_cell()
 
                 if evaluation > max_eval:
                     max_eval = evaluation
                     best_move = move
+                    best_pv = [move] + pv
+                    # Värden som inte når över fönstret är bara övre gränser och får inte ersätta förra varvets drag
+                    if depth == 0 and max_eval > original_alpha:
+                        self.root_best = (max_eval, best_move, best_pv)
                     
                 # Alpha-Beta pruning för att minska antalet noder som behöver evalueras.
                 alpha = max(alpha, max_eval) 
                 if beta <= alpha:
+                    if quiet:
+                        self.update_heuristics(move, depth, max_depth)
                     break
 
-            AI_Player.print_depth(
+            self.print_depth(
                 depth, f"Exit Minimax, eval = {max_eval}, best move = {best_move}"
             )
 
-            return max_eval, best_move
+            self.store(board, depth, max_depth, max_eval, original_alpha, original_beta, best_move)
+            return max_eval, best_move, best_pv
 
         if not maximizing:
             min_eval = float("inf") # Sämsta möjliga evalueringen för den minimerande spelaren
 
             # Iteration över möjliga drag
-            for move in potential_moves: 
-                temp_board = copy.deepcopy(board)
-                temp_board.mark_cell(self.opponent_symbol, move)
-                AI_Player.print_depth(depth, f"move = {move}")
+            for index, (move, priority) in enumerate(potential_moves): 
+                quiet = priority < QUIET_PRIORITY
+                if futile and quiet and index > 0:
+                    continue
+
+                board.mark_cell(self.opponent_symbol, move)
+                self.print_depth(depth, f"move = {move}")
                 
-                #Rekursivt anrop av funktionen
-                evaluation = self.minimax(
-                    temp_board, depth + 1, max_depth, alpha, beta, True
-                )[0]
+                # Rekursivt anrop av funktionen, med nollfönster för alla drag utom det första
+                if index == 0:
+                    evaluation, _, pv = self.minimax(
+                        board, depth + 1, max_depth, alpha, beta, True
+                    )
+                else:
+                    evaluation = float("-inf")
+                    if self.reduce_move(index, quiet, depth, max_depth):
+                        # Late move reduction, sök om med fullt djup bara om draget ser ut att sänka beta
+                        evaluation, _, pv = self.minimax(
+                            board, depth + 1, max_depth - 1, beta - 1, beta, True
+                        )
+                    if evaluation < beta:
+                        evaluation, _, pv = self.minimax(
+                            board, depth + 1, max_depth, beta - 1, beta, True
+                        )
+                    if alpha < evaluation < beta:
+                        evaluation, _, pv = self.minimax(
+                            board, depth + 1, max_depth, alpha, evaluation, True
+                        )
+
+                board.undo_cell()
 
                 if evaluation < min_eval:
                     min_eval = evaluation
                     best_move = move
+                    best_pv = [move] + pv
 
                 # Alpha-Beta pruning för att minska antalet noder som behöver evalueras
                 beta = min(beta, min_eval) 
                 if beta <= alpha:
+                    if quiet:
+                        self.update_heuristics(move, depth, max_depth)
                     break
 
-            AI_Player.print_depth(
+            self.print_depth(
                 depth, f"Exit Minimax, eval = {min_eval}, best move = {best_move}"
             )
 
-            return min_eval, best_move
+            self.store(board, depth, max_depth, min_eval, original_alpha, original_beta, best_move)
+            return min_eval, best_move, best_pv
+
+    def quiescence_search(
+        self,
+        board: Board,
+        depth: int,
+        extension: int,
+        alpha: float,
+        beta: float,
+        maximizing: bool,
+    ) -> tuple[int, list[tuple[int, int]]]:
+        """Sök bara hotfulla drag från en lövnod tills positionen är lugn, för att undvika horisonteffekten.
+
+        Spelaren på tur kan stå kvar på brädets statiska värde, utom när motståndaren hotar att vinna och
+        draget måste blockera. Annars provas drag som skapar en fyra eller öppen trea, eller som blockerar
+        motståndarens öppna trea. Hoten läses ur brädets hotindex, så att generera dragen är billigt.
+        Sökningen har en egen nodbudget per lövnod och ett eget maximalt djup, och när någon av dem tar
+        slut används det statiska värdet.
+
+        Args:
+            board (Board): Logisk representation av brädet
+            depth (int): Djupet i sökträdet
+            extension (int): Antal drag som sökts efter lövnoden
+            alpha (float): Bästa värde för maximerande spelaren
+            beta (float): Bästa värde för minimerande spelaren
+            maximizing (bool): True om AI:n står på tur
+
+        Returns:
+            tuple[int, list[tuple[int, int]]]: Poäng och variationen av hotfulla drag.
+        """
+        self.nodes += 1
+        self.check_limits()
+        self.quiescence_budget -= 1
+
+        symbol = self.symbol if maximizing else self.opponent_symbol
+        opponent = self.opponent_symbol if maximizing else self.symbol
+        sign = 1 if maximizing else -1
+        threats = board.threats[symbol]
+        opponent_threats = board.threats[opponent]
+
+        # Spelaren på tur vinner med sitt nästa drag
+        if threats[FIVE]:
+            return sign * (WIN_SCORE - depth - 1), [next(iter(threats[FIVE]))]
+
+        blocks = [move for move in opponent_threats[FIVE] if not board.is_forbidden(symbol, move)]
+        if len(opponent_threats[FIVE]) >= 2 or (opponent_threats[FIVE] and not blocks):
+            # Två vinnande drag för motståndaren går inte att blockera
+            return -sign * (WIN_SCORE - depth - 2), []
+
+        static_score = board.evaluate_board(self.symbol, self.opponent_symbol)
+        if blocks:
+            moves = blocks  # Den enda blockeringen måste spelas, spelaren kan inte stå kvar
+        else:
+            if extension >= self.quiescence_depth or self.quiescence_budget <= 0:
+                return static_score, []
+
+            # Stå kvar: positionen är lugn nog om inget hotfullt drag förbättrar värdet
+            if maximizing:
+                if static_score >= beta:
+                    return static_score, []
+                alpha = max(alpha, static_score)
+            else:
+                if static_score <= alpha:
+                    return static_score, []
+                beta = min(beta, static_score)
+
+            # Egna fyror provas alltid. Har motståndaren en öppen trea provas blockeringarna, annars egna
+            # öppna treor närmast lövnoden, där de flesta hot som sökningen missar uppstår
+            moves = threats[OPEN_FOUR] | threats[FOUR]
+            if opponent_threats[OPEN_FOUR]:
+                moves = moves | opponent_threats[OPEN_FOUR]
+            elif extension < QUIESCENCE_THREE_PLIES:
+                moves = moves | threats[OPEN_THREE]
+            moves = [move for move in moves if not board.is_forbidden(symbol, move)]
+            if not moves:
+                return static_score, []
+
+        if extension >= self.quiescence_depth * 2:
+            return static_score, []  # Spärr mot ändlösa tvingade blockeringar
+
+        ordered = sorted(
+            moves,
+            key=lambda move: max(2 * board.threat_class(symbol, move), 2 * board.threat_class(opponent, move) - 1),
+            reverse=True,
+        )
+
+        best_score = None if blocks else static_score
+        best_pv = []
+        for move in ordered:
+            board.mark_cell(symbol, move)
+            score, pv = self.quiescence_search(board, depth + 1, extension + 1, alpha, beta, not maximizing)
+            board.undo_cell()
+
+            if best_score is None or (score > best_score if maximizing else score < best_score):
+                best_score = score
+                best_pv = [move] + pv
+            if maximizing:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if beta <= alpha:
+                break
 
+        return best_score, best_pv
+
+    def store(
+        self,
+        board: Board,
+        depth: int,
+        max_depth: int,
+        score: float,
+        alpha: float,
+        beta: float,
+        move: tuple[int, int] | None,
+    ) -> None:
+        """Spara en nods resultat i transpositionstabellen.
+
+        Args:
+            board (Board): Logisk representation av brädet
+            depth (int): Djupet i sökträdet
+            max_depth (int): Maximala djupet för sökningen
+            score (float): Nodens värde
+            alpha (float): Alfa när noden började sökas
+            beta (float): Beta när noden började sökas
+            move (tuple[int, int] | None): Nodens bästa drag
+        """
+        if depth == 0 or score in (float("inf"), float("-inf")):
+            return  # Roten kan ha uteslutna drag, och en nod utan drag har inget värde att spara
+
+        if score <= alpha:
+            bound = UPPER
+        elif score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+
+        if len(self.transpositions) >= self.table_size:
+            self.evict_entries(0)
+        self.transpositions[board.hash] = (
+            max_depth - depth,
+            self.score_to_table(score, depth),
+            bound,
+            move,
+            self.generation,
+        )
+
+    @staticmethod
+    def score_to_table(score: int, depth: int) -> int:
+        """Gör vinstpoäng oberoende av djupet i sökträdet, så att de kan återanvändas på andra djup."""
+        if score > WIN_BOUND:
+            return score + depth
+        if score < -WIN_BOUND:
+            return score - depth
+        return score
+
+    @staticmethod
+    def score_from_table(score: int, depth: int) -> int:
+        """Återställ vinstpoäng från transpositionstabellen till det aktuella djupet."""
+        if score > WIN_BOUND:
+            return score - depth
+        if score < -WIN_BOUND:
+            return score + depth
+        return score
+
+    def reduce_move(self, index: int, quiet: bool, depth: int, max_depth: int) -> bool:
+        """Avgör om ett drag ska sökas med reducerat djup (late move reduction).
+
+        Args:
+            index (int): Dragets plats i sorteringen
+            quiet (bool): True om draget varken skapar eller blockerar ett hot
+            depth (int): Djupet i sökträdet
+            max_depth (int): Maximala djupet för sökningen
+
+        Returns:
+            bool: True om draget ska reduceras.
+        """
+        return (
+            self.late_move_reductions
+            and quiet
+            and index >= self.reduction_threshold
+            and max_depth - depth >= 2
+        )
 
-    def print_depth(depth, str):
+    def print_depth(self, depth, str):
+        if not self.verbose:
+            return
         indent = "  " * (3 - depth)
-        print(indent + str)
\ No newline at end of file
+        print(indent + str)
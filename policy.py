@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from position import *
+
+# Ökas när särdragen eller modellens form ändras, så att gamla viktfiler inte används
+POLICY_VERSION = 1
+
+# Sidan på kvadraten kring en cell som modellen ser, samt antal dolda enheter
+PATCH = 5
+HIDDEN = 32
+
+# Särdragsplan: egna stenar, motståndarens stenar, utanför brädet, samt egen och motståndarens hotklass
+# (THREE till FIVE) för tomma celler enligt brädets hotindex
+PLANES = 3 + 2 * (FIVE - THREE + 1)
+
+POLICY_FILE = os.environ.get(
+    "GOMOKU_POLICY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy.npz")
+)
+
+
+def feature_planes(board: Board, symbol: str) -> np.ndarray:
+    """Bygg särdragsplanen för en position ur den dragandes perspektiv, med en kant av PATCH // 2 celler.
+
+    Args:
+        board (Board): Positionen, med hotindexet påslaget för att hotplanen ska fyllas i
+        symbol (str): Symbolen för spelaren som står på tur
+
+    Returns:
+        np.ndarray: Planen med formen (PLANES, rows + 2 * kant, cols + 2 * kant).
+    """
+    margin = PATCH // 2
+    planes = np.zeros((PLANES, board.rows + 2 * margin, board.cols + 2 * margin), dtype=np.float32)
+    planes[2] = 1
+    planes[2, margin:-margin, margin:-margin] = 0
+
+    for row, col in board.ordered_moves:
+        planes[0 if board.board[row][col] == symbol else 1, row + margin, col + margin] = 1
+
+    if board.track_threats:
+        opponent = "O" if symbol == "X" else "X"
+        for offset, player in ((3, symbol), (3 + FIVE - THREE + 1, opponent)):
+            for (row, col), classes in board.cell_threats[player].items():
+                threat = max(classes)
+                if threat >= THREE:
+                    planes[offset + threat - THREE, row + margin, col + margin] = 1
+
+    return planes
+
+
+def patch_features(planes: np.ndarray, moves: list[tuple[int, int]]) -> np.ndarray:
+    """Hämta kvadraten kring varje drag ur särdragsplanen i en enda indexering.
+
+    Returns:
+        np.ndarray: En rad per drag med PLANES * PATCH * PATCH särdrag.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(planes, (PATCH, PATCH), axis=(1, 2))
+    rows = np.fromiter((move[0] for move in moves), dtype=np.intp, count=len(moves))
+    cols = np.fromiter((move[1] for move in moves), dtype=np.intp, count=len(moves))
+    return windows[:, rows, cols].transpose(1, 0, 2, 3).reshape(len(moves), -1)
+
+
+class PolicyModel:
+    """Liten faltningsmodell som ger varje kandidatdrag en prior, för dragsortering i AI_Player.
+
+    Modellen är ett lager med PATCH x PATCH-filter över särdragsplanen följt av ReLU och en linjär
+    utgång per cell, dvs en faltning med ett dolt lager. Alla kandidater i en position poängsätts i ett
+    anrop, och resultatet sparas per Zobrist-nyckel så att samma position inte poängsätts två gånger.
+    """
+
+    def __init__(self, weights: dict[str, np.ndarray] | None = None, cache_size: int = 1 << 16) -> None:
+        if weights is None:
+            rng = np.random.default_rng(0)
+            inputs = PLANES * PATCH * PATCH
+            weights = {
+                "hidden": (rng.standard_normal((inputs, HIDDEN)) * np.sqrt(2 / inputs)).astype(np.float32),
+                "hidden_bias": np.zeros(HIDDEN, dtype=np.float32),
+                "output": (rng.standard_normal(HIDDEN) * np.sqrt(1 / HIDDEN)).astype(np.float32),
+            }
+        self.weights = weights
+        self.cache_size = cache_size
+        self.cache: dict[tuple[int, str], dict[tuple[int, int], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str = POLICY_FILE) -> "PolicyModel":
+        """Läs in en modell som sparats med save.
+
+        Raises:
+            ValueError: Om filen är skriven av en annan version av modellen.
+        """
+        with np.load(path) as data:
+            if int(data["version"]) != POLICY_VERSION:
+                raise ValueError(f"{path} is policy version {int(data['version'])}, expected {POLICY_VERSION}")
+            return cls({key: data[key] for key in ("hidden", "hidden_bias", "output")})
+
+    def save(self, path: str) -> None:
+        """Spara modellens vikter."""
+        np.savez(path, version=POLICY_VERSION, **self.weights)
+
+    def forward(self, features: np.ndarray) -> np.ndarray:
+        """Beräkna logits för en sats rader med särdrag."""
+        hidden = np.maximum(features @ self.weights["hidden"] + self.weights["hidden_bias"], 0)
+        return hidden @ self.weights["output"]
+
+    def score(self, board: Board, symbol: str, moves: list[tuple[int, int]]) -> dict[tuple[int, int], float]:
+        """Returnera modellens logit för varje drag, från cachen om positionen redan har poängsatts.
+
+        Args:
+            board (Board): Positionen
+            symbol (str): Symbolen för spelaren som står på tur
+            moves (list[tuple[int, int]]): Kandidatdragen
+
+        Returns:
+            dict[tuple[int, int], float]: Logit per drag, högre är bättre.
+        """
+        key = (board.hash, symbol)
+        scores = self.cache.get(key)
+        missing = moves if scores is None else [move for move in moves if move not in scores]
+        if not missing:
+            self.hits += 1
+            return scores
+
+        self.misses += 1
+        logits = self.forward(patch_features(feature_planes(board, symbol), missing))
+        if scores is None:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            scores = self.cache[key] = {}
+        scores.update(zip(missing, logits.tolist()))
+        return scores
+
+
+def game_samples(game: dict, size: int, skip: int) -> tuple[list[np.ndarray], list[int]]:
+    """Spela om ett parti och returnera kandidaternas särdrag och det spelade dragets index per position.
+
+    Positioner där draget inte är en kandidat (en granne till en sten) hoppas över, liksom öppningen.
+
+    Returns:
+        tuple[list[np.ndarray], list[int]]: Särdragen per position och det spelade dragets rad i dem.
+    """
+    game_size = game.get("size", size)
+    board = Board(game_size, game_size, 5, rule=game.get("rule", "freestyle"))
+    features = []
+    targets = []
+
+    symbol = "X"
+    for token in game["moves"].split():
+        move = tuple(int(value) for value in token.split(","))
+        if board.marked_cells >= skip:
+            candidates = sorted(board.candidate_cells())
+            if move in candidates:
+                features.append(patch_features(feature_planes(board, symbol), candidates).astype(np.uint8))
+                targets.append(candidates.index(move))
+        board.mark_cell(symbol, move)
+        symbol = "O" if symbol == "X" else "X"
+
+    return features, targets
+
+
+def train(
+    model: PolicyModel,
+    features: list[np.ndarray],
+    targets: list[int],
+    epochs: int,
+    batch: int,
+    learning_rate: float,
+) -> float:
+    """Träna modellen att förutsäga det spelade draget bland kandidaterna, med softmax per position och Adam.
+
+    Returns:
+        float: Medelförlusten (korsentropi) under sista epoken.
+    """
+    weights = model.weights
+    moments = {name: (np.zeros_like(value), np.zeros_like(value)) for name, value in weights.items()}
+    rng = np.random.default_rng(0)
+    step = 0
+    epoch_loss = 0.0
+
+    for _ in range(epochs):
+        order = rng.permutation(len(targets))
+        epoch_loss = 0.0
+        for start in range(0, len(order), batch):
+            chosen = order[start : start + batch]
+            rows = np.concatenate([features[index] for index in chosen]).astype(np.float32)
+            sizes = np.array([len(features[index]) for index in chosen])
+            starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            played = starts + np.array([targets[index] for index in chosen])
+
+            # Framåt: logits per kandidat och softmax inom varje position
+            pre = rows @ weights["hidden"] + weights["hidden_bias"]
+            hidden = np.maximum(pre, 0)
+            logits = hidden @ weights["output"]
+            shifted = logits - np.repeat(np.maximum.reduceat(logits, starts), sizes)
+            exp = np.exp(shifted)
+            sums = np.add.reduceat(exp, starts)
+            epoch_loss += float(np.sum(np.log(sums) - shifted[played]))
+
+            # Bakåt: gradienten av korsentropin med avseende på logits är softmax minus det spelade draget
+            grad_logits = exp / np.repeat(sums, sizes)
+            grad_logits[played] -= 1
+            grad_logits /= len(chosen)
+            grad_hidden = np.outer(grad_logits, weights["output"]) * (pre > 0)
+            gradients = {
+                "output": hidden.T @ grad_logits,
+                "hidden": rows.T @ grad_hidden,
+                "hidden_bias": grad_hidden.sum(axis=0),
+            }
+
+            step += 1
+            for name, gradient in gradients.items():
+                first, second = moments[name]
+                first *= 0.9
+                first += 0.1 * gradient
+                second *= 0.999
+                second += 0.001 * gradient**2
+                weights[name] -= (
+                    learning_rate * (first / (1 - 0.9**step)) / (np.sqrt(second / (1 - 0.999**step)) + 1e-8)
+                ).astype(np.float32)
+
+        epoch_loss /= max(len(targets), 1)
+    model.cache.clear()
+    return epoch_loss
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Träna policymodellen på inspelade partier och spara vikterna."""
+    parser = argparse.ArgumentParser(description="Train the move-ordering policy model from recorded games.")
+    parser.add_argument("archive", help="JSON lines with games, e.g. from tournament.py --record")
+    parser.add_argument("--output", default=POLICY_FILE)
+    parser.add_argument("--size", type=int, default=15, help="board size for records without one")
+    parser.add_argument("--skip", type=int, default=3, help="opening moves to skip in each game")
+    parser.add_argument("--max-positions", type=int, default=20000, help="positions to train on")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=64, help="positions per gradient step")
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    features, targets = [], []
+    with open(args.archive, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip() or len(targets) >= args.max_positions:
+                continue
+            game = json.loads(line)
+            # Partier som kraschade i turneringen sparas med error i stället för moves
+            if "moves" in game:
+                game_features, game_targets = game_samples(game, args.size, args.skip)
+                features.extend(game_features)
+                targets.extend(game_targets)
+    features, targets = features[: args.max_positions], targets[: args.max_positions]
+    print(f"{len(targets)} positions in {time.perf_counter() - start:.1f}s")
+    if not targets:
+        return
+
+    model = PolicyModel()
+    start = time.perf_counter()
+    loss = train(model, features, targets, args.epochs, args.batch, args.learning_rate)
+    top1 = sum(
+        int(np.argmax(model.forward(rows.astype(np.float32)))) == target for rows, target in zip(features, targets)
+    ) / len(targets)
+    print(f"loss {loss:.3f}, top-1 accuracy {top1:.1%} in {time.perf_counter() - start:.1f}s")
+
+    model.save(args.output)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
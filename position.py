@@ -0,0 +1,85 @@
+from board import *
+
+
+def parse_position(
+    text: str, rows: int, cols: int, to_win: int, evaluation: str = "runs", rule: str = "freestyle"
+) -> Board:
+    """Tolka en position i textform till ett brädobjekt, för att kunna analysera positioner utan det grafiska gränssnittet.
+
+    Två format stöds:
+        * Draglista: "7,7 8,8 7,8" där dragen görs växelvis med början på X.
+        * Brädsträng: "...X/..O./...." där raderna separeras med "/" och tomma celler markeras med ".".
+
+    Args:
+        text (str): Positionen i textform
+        rows (int): Antal rader på brädet
+        cols (int): Antal kolumner på brädet
+        to_win (int): Antal symboler i rad som krävs för vinst
+        evaluation (str): Brädets evalueringsfunktion, "runs" eller "segments"
+        rule (str): Regelvarianten, se RULES
+
+    Raises:
+        ValueError: Om positionen inte går att tolka eller innehåller otillåtna drag.
+
+    Returns:
+        Board: Brädet med positionens drag markerade.
+    """
+    text = text.strip()
+    board = Board(rows, cols, to_win, evaluation, rule)
+
+    if not text:
+        return board
+
+    if set(text) <= set(".XOxo/"):
+        board_rows = text.upper().split("/")
+        if len(board_rows) != rows or any(len(line) != cols for line in board_rows):
+            raise ValueError(f"Board string does not match a {rows}x{cols} board")
+
+        for row, line in enumerate(board_rows):
+            for col, cell in enumerate(line):
+                if cell != ".":
+                    board.mark_cell(cell, (row, col))
+        return board
+
+    symbol = "X"
+    for token in text.replace(";", " ").split():
+        try:
+            row, col = (int(value) for value in token.split(","))
+        except ValueError:
+            raise ValueError(f"Invalid move {token!r}") from None
+
+        if board.out_of_range((row, col)) or board.board[row][col] != 0:
+            raise ValueError(f"Illegal move {token!r}")
+        if board.is_forbidden(symbol, (row, col)):
+            raise ValueError(f"Forbidden move {token!r}")
+
+        board.mark_cell(symbol, (row, col))
+        symbol = "O" if symbol == "X" else "X"
+
+    return board
+
+
+def side_to_move(board: Board) -> str:
+    """Returnera symbolen för spelaren som står på tur, givet att X alltid gör första draget.
+
+    Args:
+        board (Board): Logisk representation av brädet
+
+    Returns:
+        str: Symbolen för spelaren som ska göra nästa drag.
+    """
+    x_count = sum(row.count("X") for row in board.board)
+    o_count = sum(row.count("O") for row in board.board)
+    return "X" if x_count <= o_count else "O"
+
+
+def encode_moves(board: Board) -> str:
+    """Koda brädets drag som en kompakt draglista, samma format som parse_position läser.
+
+    Args:
+        board (Board): Logisk representation av brädet
+
+    Returns:
+        str: Dragen i den ordning de gjordes, t.ex. "7,7 8,8".
+    """
+    return " ".join(f"{row},{col}" for row, col in board.ordered_moves)
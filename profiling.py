@@ -0,0 +1,143 @@
+import argparse
+import cProfile
+import os
+import pstats
+import signal
+import time
+from collections import Counter
+
+from benchmark import *
+from player import *
+from position import *
+
+# Moduler vars funktioner ingår i sammanfattningen av de mest kostsamma funktionerna
+ENGINE_FILES = ("board.py", "player.py", "patterns.py")
+
+
+def search_workload(max_depth: int) -> None:
+    """Sök alla benchmarkpositioner till ett fast djup."""
+    run_benchmark(max_depth)
+
+
+def play_workload(max_depth: int, moves: int = 30, size: int = 15) -> None:
+    """Låt AI:n spela mot sig själv utan grafik, för att profilera hela partier och inte bara enskilda positioner."""
+    board = Board(size, size, 5)
+    players = [AI_Player("X", max_depth=max_depth), AI_Player("O", max_depth=max_depth)]
+    for number in range(moves):
+        player = players[number % 2]
+        board.mark_cell(player.symbol, player.make_move(board))
+        if board.is_terminal() or board.board_full():
+            break
+
+
+class StackSampler:
+    """Samplande profilerare som med jämna mellanrum räknar den aktuella anropsstacken, för flamegraphs."""
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self.stacks = Counter()
+
+    def sample(self, signum, frame) -> None:
+        """Signalhanterare som sparar stacken från roten till den funktion som körs just nu."""
+        names = []
+        while frame is not None:
+            names.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def write_collapsed(self, path: str) -> None:
+        """Skriv stackarna i det kollapsade formatet som flamegraph.pl och speedscope läser."""
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+def hot_functions(stats: pstats.Stats, top: int, files: tuple[str, ...] = ENGINE_FILES) -> list[str]:
+    """Sammanfatta de funktioner i motorns moduler som tar mest egen tid.
+
+    Args:
+        stats (pstats.Stats): Resultatet från cProfile
+        top (int): Antal funktioner i sammanfattningen
+        files (tuple[str, ...]): Filnamnen som funktionerna ska komma från
+
+    Returns:
+        list[str]: En rad per funktion, sorterade efter egen tid.
+    """
+    rows = [
+        (tottime, cumtime, calls, f"{os.path.basename(filename)}:{line}({function})")
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items()
+        if os.path.basename(filename) in files
+    ]
+    rows.sort(reverse=True)
+
+    lines = [f"{'tottime':>9} {'cumtime':>9} {'calls':>9}  function"]
+    for tottime, cumtime, calls, name in rows[:top]:
+        lines.append(f"{tottime:>9.3f} {cumtime:>9.3f} {calls:>9}  {name}")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Profilera motorn utan grafik och skriv pstats, kollapsade stackar och en sammanfattning till en katalog."""
+    parser = argparse.ArgumentParser(description="Profile the engine headlessly.")
+    parser.add_argument("--mode", choices=["search", "play"], default="search")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--moves", type=int, default=30, help="moves to play in play mode")
+    parser.add_argument("--profiler", choices=["cprofile", "sample", "both"], default="both")
+    parser.add_argument("--interval", type=float, default=0.001, help="sampling interval in seconds")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", default="profile_output")
+    args = parser.parse_args(argv)
+
+    if args.mode == "search":
+        workload = lambda: search_workload(args.depth)
+    else:
+        workload = lambda: play_workload(args.depth, args.moves)
+
+    os.makedirs(args.out, exist_ok=True)
+
+    # Tabellerna genereras eller läses från disk en gång före mätningen så att det inte syns i profilen
+    get_tables(5)
+
+    if args.profiler in ("cprofile", "both"):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.runcall(workload)
+        elapsed = time.perf_counter() - start
+
+        stats_path = os.path.join(args.out, "profile.pstats")
+        profiler.dump_stats(stats_path)
+        summary = hot_functions(pstats.Stats(stats_path), args.top)
+
+        summary_path = os.path.join(args.out, "summary.txt")
+        with open(summary_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(summary) + "\n")
+
+        print(f"cProfile: {elapsed:.2f}s, wrote {stats_path} and {summary_path}")
+        print("\n".join(summary))
+
+    if args.profiler in ("sample", "both"):
+        if not hasattr(signal, "setitimer"):
+            print("Sampling profiler needs signal.setitimer, which this platform lacks")
+            return
+
+        start = time.perf_counter()
+        with StackSampler(args.interval) as sampler:
+            workload()
+        elapsed = time.perf_counter() - start
+
+        collapsed_path = os.path.join(args.out, "profile.collapsed")
+        sampler.write_collapsed(collapsed_path)
+        print(f"Sampler: {elapsed:.2f}s, {sum(sampler.stacks.values())} samples, wrote {collapsed_path}")
+
+
+if __name__ == "__main__":
+    main()
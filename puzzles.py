@@ -0,0 +1,297 @@
+import argparse
+import json
+import time
+
+from player import *
+
+# Taktiska positioner med de drag som löser dem. X står på tur om X och O har lika många stenar, annars O.
+PUZZLES = [
+    {
+        "name": "open four, win in 1",
+        "kind": "win-in-1",
+        "size": 15,
+        "x": [(7, 5), (7, 6), (7, 7), (7, 8)],
+        "o": [(6, 6), (8, 7), (3, 12), (12, 2)],
+        "solutions": [(7, 4), (7, 9)],
+    },
+    {
+        "name": "broken four, win in 1",
+        "kind": "win-in-1",
+        "size": 19,
+        "x": [(9, 7), (9, 8), (9, 10), (9, 11)],
+        "o": [(8, 9), (10, 8), (4, 15), (15, 4)],
+        "solutions": [(9, 9)],
+    },
+    {
+        "name": "win instead of blocking",
+        "kind": "win-in-1",
+        "size": 19,
+        "x": [(3, 3), (3, 4), (3, 5), (3, 6)],
+        "o": [(10, 10), (11, 10), (12, 10), (13, 10)],
+        "solutions": [(3, 2), (3, 7)],
+    },
+    {
+        "name": "block a four",
+        "kind": "must-block",
+        "size": 15,
+        "x": [(5, 2), (8, 8), (9, 10), (11, 7)],
+        "o": [(5, 3), (5, 4), (5, 5), (5, 6)],
+        "solutions": [(5, 7)],
+    },
+    {
+        "name": "block a broken diagonal four",
+        "kind": "must-block",
+        "size": 19,
+        "x": [(5, 6), (12, 3), (14, 14), (3, 15)],
+        "o": [(5, 5), (6, 6), (8, 8), (9, 9)],
+        "solutions": [(7, 7)],
+    },
+    {
+        "name": "block an open three",
+        "kind": "must-block",
+        "size": 15,
+        "x": [(6, 10), (4, 4), (12, 12)],
+        "o": [(9, 5), (9, 6), (9, 7)],
+        "solutions": [(9, 4), (9, 8)],
+    },
+    {
+        "name": "prevent a four-three",
+        "kind": "must-block",
+        "size": 15,
+        "x": [(7, 4), (10, 2), (2, 2), (12, 12), (1, 13)],
+        "o": [(7, 5), (7, 6), (7, 7), (5, 8), (6, 8)],
+        "solutions": [(7, 8), (7, 9), (4, 8), (8, 8)],
+    },
+    {
+        "name": "open three to open four",
+        "kind": "win-in-2",
+        "size": 15,
+        "x": [(7, 6), (7, 7), (7, 8)],
+        "o": [(6, 7), (8, 6), (5, 10)],
+        "solutions": [(7, 5), (7, 9)],
+    },
+    {
+        "name": "four-three",
+        "kind": "double-threat",
+        "size": 15,
+        "x": [(7, 5), (7, 6), (7, 7), (5, 8), (6, 8)],
+        "o": [(7, 4), (8, 6), (4, 5), (10, 9), (2, 12)],
+        "solutions": [(7, 8)],
+    },
+    {
+        "name": "diagonal four and broken three",
+        "kind": "double-threat",
+        "size": 19,
+        "x": [(9, 9), (10, 10), (11, 11), (12, 9), (12, 10)],
+        "o": [(8, 8), (2, 9), (15, 3), (3, 15), (16, 14)],
+        "solutions": [(12, 12)],
+    },
+    {
+        "name": "three-three",
+        "kind": "double-threat",
+        "size": 15,
+        "x": [(7, 5), (7, 6), (5, 7), (6, 7)],
+        "o": [(9, 9), (4, 10), (10, 3), (2, 2)],
+        "solutions": [(7, 7)],
+    },
+    {
+        "name": "three-three on 19x19",
+        "kind": "double-threat",
+        "size": 19,
+        "x": [(9, 10), (9, 11), (10, 9), (11, 9)],
+        "o": [(5, 5), (14, 14), (4, 15), (15, 3)],
+        "solutions": [(9, 9)],
+    },
+    {
+        "name": "block with the winning attack",
+        "kind": "win-in-5",
+        "size": 15,
+        "x": [(5, 5), (6, 5), (6, 7), (8, 7)],
+        "o": [(5, 8), (7, 6), (8, 6), (9, 6)],
+        "solutions": [(6, 6)],
+    },
+    {
+        "name": "attack through a crowded centre",
+        "kind": "win-in-5",
+        "size": 15,
+        "x": [(8, 5), (8, 6), (8, 8), (8, 9), (8, 10), (8, 11), (9, 7), (10, 8), (11, 9)],
+        "o": [(5, 5), (6, 5), (6, 8), (7, 5), (7, 9), (8, 7), (8, 12), (9, 5), (12, 10)],
+        "solutions": [(7, 11), (9, 9), (11, 7)],
+    },
+    {
+        "name": "winning block in the middlegame",
+        "kind": "win-in-6",
+        "size": 15,
+        "x": [
+            (3, 5),
+            (4, 5),
+            (5, 5),
+            (5, 6),
+            (6, 5),
+            (6, 7),
+            (6, 9),
+            (6, 10),
+            (7, 3),
+            (7, 8),
+            (8, 6),
+            (8, 11),
+            (9, 6),
+            (10, 7),
+            (11, 5),
+        ],
+        "o": [
+            (2, 5),
+            (3, 4),
+            (6, 8),
+            (7, 4),
+            (7, 5),
+            (7, 6),
+            (7, 7),
+            (7, 9),
+            (8, 5),
+            (8, 7),
+            (8, 8),
+            (8, 9),
+            (8, 10),
+            (9, 7),
+            (10, 6),
+        ],
+        "solutions": [(5, 7)],
+    },
+]
+
+# Nodbudgetarna som varje position söks med, i stigande ordning
+DEFAULT_BUDGETS = [64 * 2**power for power in range(10)]
+
+# Drag som inte bygger på ett fullständigt sökt djup, ett bevis eller ett givet drag räknas inte som lösningar,
+# även om de råkar vara rätt, se AI_Player.move_source
+UNSEARCHED_SOURCES = ("interrupted", "fallback")
+
+
+def puzzle_board(puzzle: dict) -> tuple[Board, str]:
+    """Ställ upp en position och returnera brädet och symbolen för spelaren som står på tur.
+
+    Args:
+        puzzle (dict): Positionen, se PUZZLES
+
+    Raises:
+        ValueError: Om antalet stenar inte stämmer med att X gör första draget.
+
+    Returns:
+        tuple[Board, str]: Brädet och symbolen för spelaren som står på tur.
+    """
+    if len(puzzle["x"]) - len(puzzle["o"]) not in (0, 1):
+        raise ValueError(f"Puzzle {puzzle['name']!r} has an impossible number of stones")
+
+    board = Board(puzzle["size"], puzzle["size"], 5)
+    for symbol in ("X", "O"):
+        for position in puzzle[symbol.lower()]:
+            board.mark_cell(symbol, position)
+    return board, "X" if len(puzzle["x"]) == len(puzzle["o"]) else "O"
+
+
+def solve_puzzle(puzzle: dict, budgets: list[int], max_depth: int, **options) -> dict:
+    """Sök en position med varje nodbudget och mät när det rätta draget först hittas och när det sedan behålls.
+
+    Varje försök anger hur draget valdes (source), det djupaste fullständigt sökta djupet och om sökningen
+    såg en vinst (proven). Ett rätt drag från ett avbrutet varv eller reservdraget räknas inte som löst, och
+    i vinstpositionerna (win-in-N) måste vinsten också vara sedd, eftersom evalueringen ofta väljer rätt första
+    drag långt innan sökningen har hittat vinsten.
+
+    Args:
+        puzzle (dict): Positionen, se PUZZLES
+        budgets (list[int]): Nodbudgetarna i stigande ordning
+        max_depth (int): AI:ns maximala sökdjup
+        **options: Övriga inställningar för AI_Player
+
+    Returns:
+        dict: Ett försök per budget samt first_found och kept, som är None om positionen inte löstes.
+    """
+    solutions = {tuple(move) for move in puzzle["solutions"]}
+    attempts = []
+    for budget in budgets:
+        board, symbol = puzzle_board(puzzle)
+        player = AI_Player(symbol, max_depth=max_depth, **options)
+
+        start = time.perf_counter()
+        move = player.make_move(board, max_nodes=budget)
+        attempts.append(
+            {
+                "budget": budget,
+                "move": list(move),
+                "correct": move in solutions,
+                "source": player.move_source,
+                "depth": player.last_depth,
+                "proven": player.last_score is not None and player.last_score > WIN_BOUND,
+                "nodes": player.nodes,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+        )
+
+    def solved(attempt: dict) -> bool:
+        if puzzle["kind"].startswith("win-in") and not attempt["proven"]:
+            return False
+        return attempt["correct"] and attempt["source"] not in UNSEARCHED_SOURCES
+
+    first_found = next((attempt for attempt in attempts if solved(attempt)), None)
+    summary = ("budget", "source", "depth", "proven", "nodes", "ms")
+    kept = None
+    for attempt in reversed(attempts):
+        if not solved(attempt):
+            break
+        kept = attempt
+
+    return {
+        "name": puzzle["name"],
+        "kind": puzzle["kind"],
+        "size": puzzle["size"],
+        "solutions": [list(move) for move in puzzle["solutions"]],
+        "first_found": first_found and {key: first_found[key] for key in summary},
+        "kept": kept and {key: kept[key] for key in summary},
+        "attempts": attempts,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Kör de taktiska positionerna och skriv en JSON-rapport, för att följa motorns träffsäkerhet mellan versioner."""
+    parser = argparse.ArgumentParser(description="Tactical puzzle suite measuring time-to-solve.")
+    parser.add_argument("--depth", type=int, default=8, help="maximum search depth")
+    parser.add_argument("--budgets", type=int, nargs="+", default=DEFAULT_BUDGETS, help="node budgets")
+    parser.add_argument("--kind", default=None, help="only run puzzles of this kind")
+    parser.add_argument("--no-quiescence", action="store_true", help="disable quiescence search at the leaves")
+    parser.add_argument("--report", default="puzzle_report.json")
+    args = parser.parse_args(argv)
+
+    budgets = sorted(args.budgets)
+    puzzles = [puzzle for puzzle in PUZZLES if args.kind in (None, puzzle["kind"])]
+
+    results = []
+    for puzzle in puzzles:
+        result = solve_puzzle(puzzle, budgets, args.depth, quiescence=not args.no_quiescence)
+        results.append(result)
+
+        found, kept = result["first_found"], result["kept"]
+        print(
+            f"{puzzle['name']:<32} found: {found['nodes'] if found else '-':>6} nodes "
+            f"{found['ms'] if found else '-':>8} ms by {found['source'] if found else '-':<6} "
+            f"depth {found['depth'] if found else '-':>2}, kept from budget {kept['budget'] if kept else '-'}"
+        )
+
+    report = {
+        "depth": args.depth,
+        "quiescence": not args.no_quiescence,
+        "budgets": budgets,
+        "solved": sum(result["first_found"] is not None for result in results),
+        "kept": sum(result["kept"] is not None for result in results),
+        "total": len(results),
+        "puzzles": results,
+    }
+    with open(args.report, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+        file.write("\n")
+
+    print(f"solved {report['solved']}/{report['total']}, kept {report['kept']}/{report['total']}, wrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
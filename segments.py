@@ -0,0 +1,70 @@
+from patterns import DIRECTIONS
+
+# Poäng för ett segment med ett givet antal symboler, när segmentet bara innehåller en spelares symboler
+SEGMENT_SCORES = [0, 1, 10, 100, 1000]
+
+_indexes = {}
+
+
+class SegmentIndex:
+    """Alla segment av längd to_win på brädet (rader, kolumner och båda diagonalerna), samt vilka segment varje cell ingår i."""
+
+    def __init__(self, rows: int, cols: int, to_win: int) -> None:
+        self.segments: list[list[tuple[int, int]]] = []
+        self.cell_segments = [[[] for _ in range(cols)] for _ in range(rows)]
+
+        for dr, dc in DIRECTIONS:
+            for row in range(rows):
+                for col in range(cols):
+                    end = (row + (to_win - 1) * dr, col + (to_win - 1) * dc)
+                    if not (0 <= end[0] < rows and 0 <= end[1] < cols):
+                        continue
+
+                    cells = [(row + i * dr, col + i * dc) for i in range(to_win)]
+                    for r, c in cells:
+                        self.cell_segments[r][c].append(len(self.segments))
+                    self.segments.append(cells)
+
+        # Segmentpoäng per (antal X, antal O), så att uppdateringarna slipper anropa segment_score
+        self.scores = [
+            [segment_score(x_count, o_count, to_win) for o_count in range(to_win + 1)]
+            for x_count in range(to_win + 1)
+        ]
+
+
+def segment_index(rows: int, cols: int, to_win: int) -> SegmentIndex:
+    """Returnera segmentindexet för en brädstorlek, som bara beräknas en gång per storlek.
+
+    Args:
+        rows (int): Antal rader på brädet
+        cols (int): Antal kolumner på brädet
+        to_win (int): Antal symboler i rad som krävs för vinst
+
+    Returns:
+        SegmentIndex: Segmenten och cellernas segment.
+    """
+    key = (rows, cols, to_win)
+    if key not in _indexes:
+        _indexes[key] = SegmentIndex(rows, cols, to_win)
+    return _indexes[key]
+
+
+def segment_score(x_count: int, o_count: int, to_win: int) -> int:
+    """Returnera ett segments bidrag till brädets värde ur X:s perspektiv.
+
+    Ett segment med båda spelarnas symboler kan aldrig bli fem i rad och är värdelöst. Ett segment med bara
+    en spelares symboler är värt mer ju fler symboler det innehåller.
+
+    Args:
+        x_count (int): Antal X i segmentet
+        o_count (int): Antal O i segmentet
+        to_win (int): Antal symboler i rad som krävs för vinst
+
+    Returns:
+        int: Segmentets poäng, positiv för X och negativ för O.
+    """
+    if o_count == 0 and x_count < to_win:
+        return SEGMENT_SCORES[min(x_count, len(SEGMENT_SCORES) - 1)]
+    if x_count == 0 and o_count < to_win:
+        return -SEGMENT_SCORES[min(o_count, len(SEGMENT_SCORES) - 1)]
+    return 0
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from game import *
+from position import *
+
+
+# Tillåtna brädstorlekar och antal i rad för nya sessioner, så att en förfrågan inte kan allokera
+# godtyckligt stora bräden och mönstertabeller
+MIN_SIZE, MAX_SIZE = 5, 25
+MIN_TO_WIN, MAX_TO_WIN = 3, 5
+# Längsta tidsbudget i sekunder som en session får ge AI:ns drag, så att en klient inte kan låsa en arbetare
+MAX_TIME = 10.0
+
+
+class Overloaded(Exception):
+    """Signalerar att servern inte tar emot fler sessioner eller AI-drag just nu, klienten bör försöka igen senare."""
+
+
+def think(moves: str, rows: int, cols: int, to_win: int, symbol: str, max_depth: int, time_limit: float | None):
+    """Beräkna AI:ns drag i en arbetarprocess. Positionen skickas som draglista, vilket är billigare än hela brädet.
+
+    AI:n skapas på nytt för varje drag, med tom transpositionstabell, eftersom en sessions drag kan hamna i
+    olika processer i poolen. Inget sparas alltså mellan dragen i en session, vilket håller arbetarna
+    tillståndslösa och minnet oberoende av antalet sessioner.
+
+    Args:
+        moves (str): Partiets drag, se encode_moves
+        rows (int): Antal rader på brädet
+        cols (int): Antal kolumner på brädet
+        to_win (int): Antal symboler i rad som krävs för vinst
+        symbol (str): AI:ns symbol
+        max_depth (int): AI:ns maximala sökdjup
+        time_limit (float | None): Tidsbudget i sekunder
+
+    Returns:
+        tuple[int, int]: AI:ns drag (row, col)
+    """
+    board = parse_position(moves, rows, cols, to_win)
+    player = AI_Player(symbol, max_depth=max_depth, time_limit=time_limit)
+    return player.make_move(board)
+
+
+class Session:
+    """En spelomgång mellan en fjärrspelare och AI:n, byggd på Game utan grafik."""
+
+    def __init__(self, session_id: int, game: Game, ai_player: AI_Player) -> None:
+        self.session_id = session_id
+        self.game = game
+        self.ai_player = ai_player
+        self.game_over = False
+
+    def result(self) -> str | None:
+        """Returnera vinnarens symbol, "draw" vid oavgjort eller None om omgången pågår."""
+        if not self.game_over:
+            return None
+        return self.game.winner.symbol if self.game.winner is not None else "draw"
+
+
+class Scheduler:
+    """Fördelar AI-dragen från alla sessioner på en gemensam processpool.
+
+    Dragen köas i en gemensam FIFO-kö och en session har högst ett drag i kön åt gången, så sessionerna
+    turas om rättvist oavsett hur snabbt klienterna skickar drag. Högst en arbetare per process i poolen
+    hämtar från kön, och när kön är full avvisas nya drag i stället för att kön växer obegränsat.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, workers: int, max_queue: int) -> None:
+        self.pool = pool
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.tasks: list[asyncio.Task] = []
+        self.moves = 0
+
+    def start(self) -> None:
+        """Starta en hämtare per process i poolen."""
+        self.tasks = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Avbryt hämtarna."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def check_capacity(self) -> None:
+        """Avvisa ett nytt AI-drag redan innan det skapas om kön är full.
+
+        Raises:
+            Overloaded: Om kön är full.
+        """
+        if self.queue.full():
+            raise Overloaded("move queue is full")
+
+    async def submit(self, session: Session) -> tuple[int, int]:
+        """Köa AI:ns drag för en session och vänta på resultatet.
+
+        Args:
+            session (Session): Sessionen där AI:n står på tur
+
+        Raises:
+            Overloaded: Om kön är full.
+
+        Returns:
+            tuple[int, int]: AI:ns drag (row, col)
+        """
+        board = session.game.board
+        job = (
+            encode_moves(board),
+            board.rows,
+            board.cols,
+            board.to_win,
+            session.ai_player.symbol,
+            session.ai_player.max_depth,
+            session.ai_player.time_limit,
+        )
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            raise Overloaded("move queue is full") from None
+        return await future
+
+    async def dispatch(self) -> None:
+        """Hämta drag ur kön och beräkna dem i poolen, ett i taget per hämtare."""
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future = await self.queue.get()
+            try:
+                move = await loop.run_in_executor(self.pool, think, *job)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                self.moves += 1
+                if not future.done():
+                    future.set_result(move)
+            finally:
+                self.queue.task_done()
+
+
+class GameServer:
+    """Asynkron server som kör många samtidiga spelomgångar över ett radbaserat JSON-protokoll på TCP.
+
+    Varje rad från klienten är ett JSON-objekt med fältet "cmd", och servern svarar med en rad per förfrågan:
+        * {"cmd": "new", "size": 15, "to_win": 5, "symbol": "X", "depth": 2, "time": null}
+          -> {"ok": true, "session": 1, "ai_move": null}
+        * {"cmd": "move", "session": 1, "move": [7, 7]} -> {"ok": true, "ai_move": [7, 8], "winner": null}
+        * {"cmd": "close", "session": 1} -> {"ok": true}
+        * {"cmd": "stats"} -> {"ok": true, "sessions": 12, "queued": 3, "moves": 250}
+    Fel besvaras med {"ok": false, "error": "..."}. Förfrågningarna på en anslutning behandlas i tur och ordning,
+    så en klient kan inte köa mer än den hinner få svar på.
+    """
+
+    def __init__(self, scheduler: Scheduler, max_sessions: int = 5000, max_depth: int = 2) -> None:
+        self.scheduler = scheduler
+        self.max_sessions = max_sessions
+        self.max_depth = max_depth
+        self.sessions: dict[int, Session] = {}
+        self.session_ids = itertools.count(1)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Läs förfrågningar från en anslutning tills den stängs, och stäng anslutningens sessioner efteråt."""
+        owned: set[int] = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.handle_request(json.loads(line), owned)
+                except Overloaded as error:
+                    response = {"ok": False, "error": str(error), "retry": True}
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    response = {"ok": False, "error": str(error)}
+
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def handle_request(self, request: dict, owned: set[int]) -> dict:
+        """Behandla en förfrågan från en klient.
+
+        Args:
+            request (dict): Förfrågan
+            owned (set[int]): Sessionerna som anslutningen har skapat
+
+        Raises:
+            Overloaded: Om servern har för många sessioner eller för många köade drag.
+            ValueError: Om förfrågan är ogiltig.
+
+        Returns:
+            dict: Svaret till klienten.
+        """
+        command = request.get("cmd")
+
+        if command == "stats":
+            return {
+                "ok": True,
+                "sessions": len(self.sessions),
+                "queued": self.scheduler.queue.qsize(),
+                "moves": self.scheduler.moves,
+            }
+
+        if command == "new":
+            if len(self.sessions) >= self.max_sessions:
+                raise Overloaded("too many sessions")
+            self.scheduler.check_capacity()
+
+            size = int(request.get("size", 15))
+            to_win = int(request.get("to_win", 5))
+            if not MIN_SIZE <= size <= MAX_SIZE:
+                raise ValueError(f"Board size must be between {MIN_SIZE} and {MAX_SIZE}")
+            if not MIN_TO_WIN <= to_win <= min(MAX_TO_WIN, size):
+                raise ValueError(f"to_win must be between {MIN_TO_WIN} and {min(MAX_TO_WIN, size)}")
+            user_symbol = request.get("symbol", "X")
+            if user_symbol not in ("X", "O"):
+                raise ValueError(f"Unknown symbol {user_symbol!r}")
+
+            depth = int(request.get("depth", self.max_depth))
+            if not 1 <= depth:
+                raise ValueError("depth must be at least 1")
+            time_limit = request.get("time")
+            if time_limit is not None:
+                time_limit = float(time_limit)
+                if not 0 < time_limit <= MAX_TIME:
+                    raise ValueError(f"time must be a number of seconds above 0 and at most {MAX_TIME}")
+
+            ai_symbol = "O" if user_symbol == "X" else "X"
+            ai_player = AI_Player(ai_symbol, max_depth=min(depth, self.max_depth), time_limit=time_limit)
+            board = Board(size, size, to_win)
+            session = Session(next(self.session_ids), Game(board, None, User_Player(user_symbol), ai_player), ai_player)
+
+            ai_move = None
+            if ai_symbol == "X":
+                ai_move = await self.scheduler.submit(session)
+                session.game_over = session.game.play_move(ai_move)
+            # Sessionen registreras först när AI:ns första drag har lyckats, annars blir den kvar utan ägare
+            self.sessions[session.session_id] = session
+            owned.add(session.session_id)
+            return {"ok": True, "session": session.session_id, "ai_move": ai_move}
+
+        session_id = request.get("session")
+        if session_id not in owned or session_id not in self.sessions:
+            raise ValueError(f"Unknown session {session_id!r}")
+        session = self.sessions[session_id]
+
+        if command == "close":
+            del self.sessions[session_id]
+            owned.discard(session_id)
+            return {"ok": True}
+
+        if command == "move":
+            if session.game_over:
+                raise ValueError("Game is over")
+            # Kontrolleras innan spelarens drag görs, så att ett avvisat drag kan skickas igen oförändrat
+            self.scheduler.check_capacity()
+
+            session.game_over = session.game.play_move(tuple(request["move"]))
+            ai_move = None
+            if not session.game_over:
+                try:
+                    ai_move = await self.scheduler.submit(session)
+                except BaseException:
+                    # Spelarens drag tas tillbaka, så att spelaren står kvar på tur och kan skicka draget igen
+                    session.game.undo_move()
+                    raise
+                session.game_over = session.game.play_move(ai_move)
+            return {"ok": True, "ai_move": ai_move, "winner": session.result()}
+
+        raise ValueError(f"Unknown command {command!r}")
+
+
+async def serve(host: str, port: int, workers: int, max_sessions: int, max_queue: int, max_depth: int) -> None:
+    """Starta servern och kör den tills processen avbryts."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Värm upp arbetarna så att första draget inte får betala för processtart och mönstertabeller
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(pool, think, "", 15, 15, 5, "X", 1, None) for _ in range(workers))
+        )
+
+        scheduler = Scheduler(pool, workers, max_queue)
+        scheduler.start()
+        game_server = GameServer(scheduler, max_sessions, max_depth)
+        server = await asyncio.start_server(game_server.handle_connection, host, port, limit=2**16)
+
+        address = server.sockets[0].getsockname()
+        print(f"Serving on {address[0]}:{address[1]} with {workers} workers", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await scheduler.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Kör spelservern från kommandoraden."""
+    parser = argparse.ArgumentParser(description="Serve concurrent games over line-delimited JSON on TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes computing AI moves")
+    parser.add_argument("--max-sessions", type=int, default=5000, help="sessions admitted at the same time")
+    parser.add_argument("--max-queue", type=int, default=1000, help="AI moves waiting for a worker before rejecting")
+    parser.add_argument("--max-depth", type=int, default=2, help="highest search depth a session may ask for")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_sessions, args.max_queue, args.max_depth))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
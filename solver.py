@@ -0,0 +1,272 @@
+import argparse
+import time
+
+from position import *
+
+# Bevis- och motbevistal för en nod som är bevisad eller motbevisad
+INFINITY = 10**9
+
+# Barnets tröskel sätts en andel över det näst bästa barnets tal (1 + epsilon-tricket), så att
+# sökningen inte växlar mellan två nästan lika bra barn
+EPSILON = 0.25
+
+# Uppskattat bevistal efter att anfallaren skapat en öppen trea, som försvararen har flera svar på
+THREE_PROOF = 3
+
+
+class ProofLimitReached(Exception):
+    """Signalerar att lösarens budget (tid eller noder) har förbrukats mitt i en sökning."""
+
+
+class ProofSolver:
+    """Bevisar vinster med djup-först-bevistalssökning (df-pn) över hotsekvenser.
+
+    Anfallaren spelar bara hotfulla drag (fyror och öppna treor), och försvararen bara drag som
+    blockerar hotet eller skapar en egen fyra. En bevisad vinst är alltså en vinst genom
+    kontinuerliga hot (VCT), och en motbevisad position betyder bara att någon sådan vinst inte finns.
+
+    Bevis- och motbevistalen sparas i en transpositionstabell per anfallare, nycklad på brädets
+    Zobrist-nyckel, så att positioner som nås i olika dragordning bara söks en gång. Tabellen behålls
+    mellan anrop, så en sökning som avbröts av budgeten fortsätter där den slutade när solve anropas igen.
+    """
+
+    def __init__(self, max_entries: int = 1 << 20) -> None:
+        self.max_entries = max_entries
+        # Anfallarens symbol -> Zobrist-nyckel -> [bevistal, motbevistal, antal sökta noder under posten]
+        self.tables: dict[str, dict[int, tuple[int, int, int]]] = {"X": {}, "O": {}}
+        self.nodes = 0
+        self.node_limit = None
+        self.deadline = None
+
+    def solve(
+        self,
+        board: Board,
+        symbol: str,
+        max_nodes: int | None = None,
+        time_limit: float | None = None,
+    ) -> tuple[str, tuple[int, int] | None]:
+        """Försök bevisa att spelaren på tur vinner, eller att motståndaren vinner oavsett försvar.
+
+        Args:
+            board (Board): Positionen, med hotindexet påslaget. Brädet återställs innan metoden returnerar
+            symbol (str): Symbolen för spelaren som står på tur
+            max_nodes (int | None): Högsta antal noder för det här anropet
+            time_limit (float | None): Tidsbudget i sekunder för det här anropet
+
+        Raises:
+            ValueError: Om brädet inte håller hotindexet uppdaterat.
+
+        Returns:
+            tuple[str, tuple[int, int] | None]: "win", "loss" eller "unknown", samt det vinnande draget vid "win".
+        """
+        if not board.track_threats:
+            raise ValueError("The proof solver needs the board's threat index")
+
+        opponent = "O" if symbol == "X" else "X"
+        self.node_limit = None if max_nodes is None else self.nodes + max_nodes
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        marked_before = len(board.ordered_moves)
+
+        try:
+            if self.search(board, symbol, True) == 0:
+                return "win", self.proof_move(board, symbol)
+            # Motståndaren står inte på tur, men kan ha hot som inget försvar räcker mot
+            if board.threats[opponent][FIVE] or board.threats[opponent][OPEN_FOUR]:
+                if self.search(board, opponent, False) == 0:
+                    return "loss", None
+        except ProofLimitReached:
+            while len(board.ordered_moves) > marked_before:
+                board.undo_cell()
+        return "unknown", None
+
+    def search(self, board: Board, attacker: str, attacking: bool) -> int:
+        """Sök roten med obegränsade trösklar och returnera dess bevistal, 0 om anfallaren vinner."""
+        self.mid(board, attacker, attacking, INFINITY, INFINITY)
+        return self.lookup(board.hash, attacker)[0]
+
+    def proof_move(self, board: Board, symbol: str) -> tuple[int, int] | None:
+        """Returnera ett drag från en bevisad rot som leder till en bevisad position."""
+        if board.threats[symbol][FIVE]:
+            return min(board.threats[symbol][FIVE])
+        moves, _ = self.generate(board, symbol, True)
+        for move in moves:
+            if self.lookup(self.child_key(board, symbol, move), symbol)[0] == 0:
+                return move
+        return None
+
+    def mid(self, board: Board, attacker: str, attacking: bool, proof_limit: int, disproof_limit: int) -> None:
+        """Expandera en nod tills dess bevis- eller motbevistal når trösklarna (Nagais df-pn).
+
+        Args:
+            board (Board): Positionen
+            attacker (str): Anfallarens symbol
+            attacking (bool): True om anfallaren står på tur (OR-nod) annars False (AND-nod)
+            proof_limit (int): Tröskel för nodens bevistal
+            disproof_limit (int): Tröskel för nodens motbevistal
+        """
+        self.nodes += 1
+        self.check_limits()
+        nodes_before = self.nodes
+
+        defender = "O" if attacker == "X" else "X"
+        symbol = attacker if attacking else defender
+        moves, value = self.generate(board, symbol, attacking)
+        if value is not None:
+            self.save(board, attacker, value, 1)
+            return
+
+        # Barnens nycklar räknas ut direkt ur Zobrist-tabellen, utan att dragen behöver göras
+        keys = [(self.child_key(board, symbol, move), self.initial_numbers(board, symbol, move, attacking), move) for move in moves]
+        while True:
+            children = [(self.tables[attacker].get(key, initial), move) for key, initial, move in keys]
+
+            # I OR-noder räcker ett bevisat barn, i AND-noder måste alla barn bevisas
+            if attacking:
+                proof = min(entry[0] for entry, _ in children)
+                disproof = min(sum(entry[1] for entry, _ in children), INFINITY)
+            else:
+                proof = min(sum(entry[0] for entry, _ in children), INFINITY)
+                disproof = min(entry[1] for entry, _ in children)
+
+            if proof >= proof_limit or disproof >= disproof_limit:
+                break
+
+            # Barnet med lägst bevistal (OR) eller motbevistal (AND) söks, med trösklar från det näst bästa
+            index = 0 if attacking else 1
+            children.sort(key=lambda child: child[0][index])
+            (child_proof, child_disproof, _), move = children[0]
+            second = children[1][0][index] if len(children) > 1 else INFINITY
+            second = min(int(second * (1 + EPSILON)) + 1, INFINITY)
+            if attacking:
+                child_limits = (min(proof_limit, second), disproof_limit - disproof + child_disproof)
+            else:
+                child_limits = (proof_limit - proof + child_proof, min(disproof_limit, second))
+
+            board.mark_cell(symbol, move)
+            try:
+                self.mid(board, attacker, not attacking, *child_limits)
+            finally:
+                board.undo_cell()
+
+        self.save(board, attacker, (proof, disproof), self.nodes - nodes_before + 1)
+
+    def generate(
+        self, board: Board, symbol: str, attacking: bool
+    ) -> tuple[list[tuple[int, int]], tuple[int, int] | None]:
+        """Returnera dragen som söks i en nod, eller nodens bevis- och motbevistal om den redan är avgjord.
+
+        Args:
+            board (Board): Positionen
+            symbol (str): Symbolen för spelaren som står på tur
+            attacking (bool): True om spelaren på tur är anfallaren
+
+        Returns:
+            tuple[list[tuple[int, int]], tuple[int, int] | None]: Dragen, samt (bevistal, motbevistal) för
+            en avgjord nod och annars None.
+        """
+        opponent = "O" if symbol == "X" else "X"
+        win, loss = ((0, INFINITY), (INFINITY, 0)) if attacking else ((INFINITY, 0), (0, INFINITY))
+        threats = board.threats[symbol]
+        opponent_threats = board.threats[opponent]
+
+        if threats[FIVE]:
+            return [], win
+        blocks = [move for move in opponent_threats[FIVE] if not board.is_forbidden(symbol, move)]
+        if len(opponent_threats[FIVE]) >= 2 or (opponent_threats[FIVE] and not blocks):
+            return [], loss
+        if blocks:
+            return blocks, None
+        if board.board_full():
+            return [], (INFINITY, 0)  # Oavgjort räknas som motbevisat
+
+        if attacking:
+            moves = threats[OPEN_FOUR] | threats[FOUR] | threats[OPEN_THREE]
+        elif opponent_threats[OPEN_FOUR]:
+            # Motståndarens öppna trea: blockera den eller svara med en egen fyra
+            moves = opponent_threats[OPEN_FOUR] | opponent_threats[FOUR] | threats[OPEN_FOUR] | threats[FOUR]
+        else:
+            moves = set()  # Anfallaren har tappat initiativet
+
+        moves = [move for move in moves if not board.is_forbidden(symbol, move)]
+        if not moves:
+            return [], (INFINITY, 0)
+
+        # Starkare hot först, så att det bästa barnet vid lika tal är det mest lovande
+        moves.sort(key=lambda move: (board.threat_class(symbol, move), move), reverse=True)
+        return moves, None
+
+    @staticmethod
+    def initial_numbers(board: Board, symbol: str, move: tuple[int, int], attacking: bool) -> tuple[int, int, int]:
+        """Uppskatta bevis- och motbevistalet för ett drag som inte har sökts.
+
+        En fyra lämnar försvararen ett enda svar, medan en öppen trea kan försvaras på flera sätt och
+        därför får ett högre bevistal, så att sökningen provar fyrorna först.
+        """
+        if attacking and board.threat_class(symbol, move) < FOUR:
+            return (THREE_PROOF, 1, 0)
+        return (1, 1, 0)
+
+    @staticmethod
+    def child_key(board: Board, symbol: str, move: tuple[int, int]) -> int:
+        """Returnera Zobrist-nyckeln för positionen efter ett drag."""
+        return board.hash ^ board.zobrist[move[0]][move[1]][index_of(symbol)]
+
+    def lookup(self, key: int, attacker: str) -> tuple[int, int, int]:
+        """Returnera bevis- och motbevistalet för en position, eller (1, 1) om den inte har sökts."""
+        return self.tables[attacker].get(key, (1, 1, 0))
+
+    def save(self, board: Board, attacker: str, value: tuple[int, int], work: int) -> None:
+        """Spara en nods bevis- och motbevistal, och rensa tabellen om den är full."""
+        table = self.tables[attacker]
+        if len(table) >= self.max_entries and board.hash not in table:
+            self.collect(table)
+        previous = table.get(board.hash)
+        table[board.hash] = (value[0], value[1], work + (previous[2] if previous else 0))
+
+    def collect(self, table: dict[int, tuple[int, int, int]]) -> None:
+        """Ta bort den billigaste hälften av de oavgjorda posterna, avgjorda poster behålls så länge det går."""
+        unsolved = sorted(
+            (entry[2], key) for key, entry in table.items() if entry[0] != 0 and entry[1] != 0
+        )
+        for _, key in unsolved[: max(len(unsolved) // 2, 1)]:
+            del table[key]
+        if len(table) >= self.max_entries:
+            table.clear()
+
+    def check_limits(self) -> None:
+        """Avbryt sökningen om tids- eller nodbudgeten är förbrukad.
+
+        Raises:
+            ProofLimitReached: Om någon av budgetarna är förbrukad.
+        """
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise ProofLimitReached("nodes")
+        if self.deadline is not None and self.nodes % 64 == 0 and time.perf_counter() > self.deadline:
+            raise ProofLimitReached("time")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Försök bevisa en position från kommandoraden och skriv ut resultatet och det vinnande draget."""
+    parser = argparse.ArgumentParser(description="Prove wins by continuous threats with df-pn search.")
+    parser.add_argument("position", help='move list or board string, e.g. "7,7 8,8 7,8"')
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--rule", choices=RULES, default="freestyle")
+    parser.add_argument("--nodes", type=int, default=100000, help="node budget")
+    parser.add_argument("--time", type=float, default=None, help="time budget in seconds")
+    parser.add_argument("--entries", type=int, default=1 << 20, help="transposition table entries")
+    args = parser.parse_args(argv)
+
+    board = parse_position(args.position, args.size, args.size, 5, rule=args.rule)
+    symbol = side_to_move(board)
+    solver = ProofSolver(args.entries)
+
+    start = time.perf_counter()
+    result, move = solver.solve(board, symbol, args.nodes, args.time)
+    print(
+        f"{symbol} to move: {result}" + (f", proof move {move}" if move is not None else "")
+        + f" ({solver.nodes} nodes, {time.perf_counter() - start:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Partiets faser efter antal stenar på brädet: (namn, första antal stenar som inte hör till fasen)
+PHASES = (("opening", 10), ("midgame", 40), ("endgame", None))
+
+# Percentilerna som rapporteras per fas
+PERCENTILES = (0.50, 0.95, 0.99)
+
+# Övre gränser i millisekunder för histogrammets staplar, den sista stapeln tar resten
+HISTOGRAM_BOUNDS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Returnera percentilen för en lista med värden, med närmaste rang.
+
+    Args:
+        values (list[float]): Värdena
+        fraction (float): Percentilen som andel, t.ex. 0.99
+
+    Returns:
+        float: Värdet på percentilen, 0 för en tom lista.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Närmaste rang är det minsta värdet som minst andelen av värdena är mindre än eller lika med
+    rank = math.ceil(round(fraction * len(ordered), 9))  # Avrundningen tar bort flyttalsfel som 0.07 * 100
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def histogram(values: list[float]) -> dict[str, int]:
+    """Räkna värdena per stapel i HISTOGRAM_BOUNDS, med stapelns övre gräns som nyckel ("le_50", "inf")."""
+    counts = {f"le_{bound}": 0 for bound in HISTOGRAM_BOUNDS}
+    counts["inf"] = 0
+    for value in values:
+        bound = next((bound for bound in HISTOGRAM_BOUNDS if value <= bound), None)
+        counts[f"le_{bound}" if bound is not None else "inf"] += 1
+    return counts
+
+
+def game_phase(stones: int) -> str:
+    """Returnera partiets fas givet antal stenar på brädet."""
+    for name, end in PHASES:
+        if end is None or stones < end:
+            return name
+
+
+class Telemetry:
+    """Mätvärden per AI-drag (tid, djup, noder och brädets fyllnadsgrad) över ett rullande fönster av drag.
+
+    Rapporten innehåller p50/p95/p99 för tiden per drag och fas, och kan skrivas till en JSON-fil efter
+    varje drag och/eller hämtas som JSON från en lokal HTTP-adress.
+    """
+
+    def __init__(self, path: str | None = None, window: int = 1000) -> None:
+        self.path = path
+        self.records: deque[dict] = deque(maxlen=window)
+        self.moves = 0
+        self.lock = threading.Lock()
+        self.server: ThreadingHTTPServer | None = None
+
+    def record(
+        self,
+        symbol: str,
+        seconds: float,
+        depth: int | None,
+        nodes: int | None,
+        stones: int,
+        cells: int,
+    ) -> None:
+        """Spara ett drag och skriv rapporten till metrikfilen om en sådan används.
+
+        Args:
+            symbol (str): AI:ns symbol
+            seconds (float): Väggklocktid för draget
+            depth (int | None): Sökdjupet som nåddes, om spelaren rapporterar det
+            nodes (int | None): Antal sökta noder, om spelaren rapporterar det
+            stones (int): Antal stenar på brädet innan draget
+            cells (int): Antal celler på brädet
+        """
+        with self.lock:
+            self.moves += 1
+            self.records.append(
+                {
+                    "symbol": symbol,
+                    "ms": seconds * 1000,
+                    "depth": depth,
+                    "nodes": nodes,
+                    "stones": stones,
+                    "occupancy": stones / cells,
+                    "phase": game_phase(stones),
+                }
+            )
+        if self.path is not None:
+            self.write(self.path)
+
+    def report(self) -> dict:
+        """Sammanfatta fönstret per fas.
+
+        Returns:
+            dict: {moves, window, phases} där phases har count, p50/p95/p99, max och ett histogram i
+            millisekunder, samt medelvärden för djup, noder och fyllnadsgrad per fas.
+        """
+        with self.lock:
+            records = list(self.records)
+            moves = self.moves
+
+        phases = {}
+        for name, _ in PHASES:
+            selected = [record for record in records if record["phase"] == name]
+            if not selected:
+                continue
+            latencies = [record["ms"] for record in selected]
+            summary = {"count": len(selected)}
+            summary.update(
+                {f"p{round(fraction * 100)}_ms": round(percentile(latencies, fraction), 1) for fraction in PERCENTILES}
+            )
+            summary["max_ms"] = round(max(latencies), 1)
+            summary["histogram_ms"] = histogram(latencies)
+            for key in ("depth", "nodes", "occupancy"):
+                values = [record[key] for record in selected if record[key] is not None]
+                summary[f"mean_{key}"] = round(sum(values) / len(values), 3) if values else None
+            phases[name] = summary
+
+        return {"moves": moves, "window": len(records), "phases": phases}
+
+    def write(self, path: str) -> None:
+        """Skriv rapporten till en JSON-fil, via en temporär fil så att läsare aldrig ser en halvskriven fil."""
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"updated": time.time(), **self.report()}, file, indent=2)
+            file.write("\n")
+        os.replace(path + ".tmp", path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> int:
+        """Servera rapporten som JSON på http://host:port/metrics i en bakgrundstråd.
+
+        Args:
+            port (int): Porten, 0 för en ledig port
+            host (str): Adressen, som standard bara lokalt
+
+        Returns:
+            int: Porten som servern lyssnar på.
+        """
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = json.dumps(telemetry.report()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass  # Förfrågningarna loggas inte, spelet skriver till samma terminal
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def close(self) -> None:
+        """Stäng HTTP-servern om den har startats."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
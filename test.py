@@ -0,0 +1,338 @@
+import io
+import math
+import random
+import unittest
+
+from clock import TimeManager
+from hashing import compute_hash
+from pbrain import ProtocolEngine
+from player import *
+from position import parse_position
+from telemetry import percentile
+from tournament import Match
+
+
+def renju_board(x_cells: list[tuple[int, int]], o_cells: list[tuple[int, int]] = []) -> Board:
+    """Ställ upp en renjuposition på ett 15x15-bräde."""
+    board = Board(15, 15, 5, rule="renju")
+    for cell in x_cells:
+        board.mark_cell("X", cell)
+    for cell in o_cells:
+        board.mark_cell("O", cell)
+    return board
+
+
+class RenjuForbiddenMoves(unittest.TestCase):
+    """Förbjudna drag för X under renju, både med hotindexet och med den direkta kontrollen utan det."""
+
+    def assertForbidden(self, board: Board, move: tuple[int, int], expected: bool) -> None:
+        self.assertEqual(board.is_forbidden("X", move), expected)
+        board.track_threats = False
+        self.assertEqual(board.is_forbidden("X", move), expected)
+        board.track_threats = True
+
+    def test_double_three(self):
+        board = renju_board([(7, 5), (7, 6), (5, 7), (6, 7)])
+        self.assertForbidden(board, (7, 7), True)
+
+    def test_single_open_three_is_allowed(self):
+        board = renju_board([(7, 5), (7, 6)])
+        self.assertForbidden(board, (7, 7), False)
+
+    def test_double_four_across_lines(self):
+        board = renju_board([(7, 4), (7, 5), (7, 6), (4, 7), (5, 7), (6, 7)], [(7, 3), (3, 7)])
+        self.assertForbidden(board, (7, 7), True)
+
+    def test_double_four_on_one_line(self):
+        board = renju_board([(7, 1), (7, 3), (7, 5), (7, 7)])
+        self.assertForbidden(board, (7, 4), True)
+
+    def test_open_four_is_a_single_four(self):
+        board = renju_board([(7, 4), (7, 5), (7, 6)])
+        self.assertForbidden(board, (7, 7), False)
+
+    def test_overline(self):
+        board = renju_board([(7, 2), (7, 3), (7, 4), (7, 6), (7, 7)])
+        self.assertForbidden(board, (7, 5), True)
+
+    def test_five_beats_forbidden(self):
+        # (7, 7) ger exakt fem i raden och samtidigt en fyra i kolumnen, vilket annars vore en dubbelfyra
+        board = renju_board([(7, 3), (7, 4), (7, 5), (7, 6), (4, 7), (5, 7), (6, 7)], [(7, 2), (3, 7)])
+        self.assertForbidden(board, (7, 7), False)
+        board.mark_cell("X", (7, 7))
+        self.assertTrue(board.is_winner("X"))
+
+    def test_o_has_no_forbidden_moves(self):
+        board = renju_board([], [(7, 2), (7, 3), (7, 4), (7, 6), (7, 7)])
+        self.assertFalse(board.is_forbidden("O", (7, 5)))
+
+    def test_undo_restores_forbidden_cells(self):
+        board = renju_board([(7, 1), (7, 3), (7, 5)])
+        board.mark_cell("X", (7, 7))
+        self.assertIn((7, 4), board.forbidden)
+        board.undo_cell()
+        self.assertNotIn((7, 4), board.forbidden)
+
+
+def freestyle_board(x_cells: list[tuple[int, int]], o_cells: list[tuple[int, int]] = []) -> Board:
+    """Ställ upp en position med fria regler på ett 15x15-bräde."""
+    board = Board(15, 15, 5)
+    for cell in x_cells:
+        board.mark_cell("X", cell)
+    for cell in o_cells:
+        board.mark_cell("O", cell)
+    return board
+
+
+class IncrementalBoardState(unittest.TestCase):
+    """Hotindex, förbjudna drag, segment och Zobrist-nyckel som uppdateras stegvis ska stämma med en omräkning."""
+
+    ATTRIBUTES = (
+        "threats",
+        "cell_threats",
+        "forbidden",
+        "cell_overlines",
+        "cell_double_fours",
+        "segment_counts",
+        "segment_score",
+        "completed_segments",
+        "hash",
+        "lines",
+    )
+
+    def test_random_mark_and_undo(self):
+        for rule in RULES:
+            rng = random.Random(rule)
+            board = Board(15, 15, 5, rule=rule)
+            for _ in range(200):
+                if board.ordered_moves and rng.random() < 0.35:
+                    board.undo_cell()
+                else:
+                    board.mark_cell(rng.choice("XO"), rng.choice(board.get_empty_cells()))
+
+            rebuilt = Board(15, 15, 5, rule=rule)
+            for row, col in board.ordered_moves:
+                rebuilt.mark_cell(board.board[row][col], (row, col))
+            for attribute in self.ATTRIBUTES:
+                with self.subTest(rule=rule, attribute=attribute):
+                    self.assertEqual(getattr(board, attribute), getattr(rebuilt, attribute))
+
+    def test_hash_is_independent_of_move_order(self):
+        board = freestyle_board([(7, 7), (7, 8)], [(8, 8)])
+        other = freestyle_board([(7, 8), (7, 7)], [(8, 8)])
+        self.assertEqual(board.hash, other.hash)
+        self.assertEqual(board.hash, compute_hash(board.board, board.zobrist))
+        for _ in range(3):
+            board.undo_cell()
+        self.assertEqual(board.hash, 0)
+
+    def test_segment_scores(self):
+        self.assertEqual(segment_score(2, 0, 5), SEGMENT_SCORES[2])
+        self.assertEqual(segment_score(0, 3, 5), -SEGMENT_SCORES[3])
+        self.assertEqual(segment_score(1, 1, 5), 0)
+        self.assertEqual(segment_score(5, 0, 5), 0)
+        # Ett hörn ingår i ett segment per riktning utom den ena diagonalen
+        self.assertEqual(freestyle_board([(0, 0)]).segment_score, 3 * SEGMENT_SCORES[1])
+
+
+class TranspositionTable(unittest.TestCase):
+    """Typ av värde och vinstpoäng i transpositionstabellen."""
+
+    def test_bounds(self):
+        player = AI_Player("X")
+        board = freestyle_board([(7, 7)])
+        for score, bound in ((0, UPPER), (50, EXACT), (100, LOWER)):
+            player.store(board, 1, 3, score, 0, 100, (7, 8))
+            self.assertEqual(player.transpositions[board.hash], (2, score, bound, (7, 8), 0))
+
+    def test_root_is_not_stored(self):
+        player = AI_Player("X")
+        player.store(freestyle_board([(7, 7)]), 0, 3, 50, 0, 100, (7, 8))
+        self.assertEqual(player.transpositions, {})
+
+    def test_win_scores_are_relative_to_the_node(self):
+        # En vinst fem drag från roten, sparad på djup 3, är två drag bort och därmed fyra drag från djup 1
+        stored = AI_Player.score_to_table(WIN_SCORE - 5, 3)
+        self.assertEqual(AI_Player.score_from_table(stored, 1), WIN_SCORE - 3)
+        self.assertEqual(AI_Player.score_from_table(AI_Player.score_to_table(-WIN_SCORE + 5, 3), 1), -WIN_SCORE + 3)
+        self.assertEqual(AI_Player.score_to_table(500, 3), 500)
+
+
+class MultiPV(unittest.TestCase):
+    """Analysen med flera principalvariationer utesluter redan hittade drag."""
+
+    def test_distinct_moves_best_first(self):
+        board = freestyle_board([(7, 7), (7, 8)], [(8, 8), (6, 6)])
+        player = AI_Player("X", max_depth=2)
+        lines = player.analyze(board, k=3)
+        moves = [move for move, _, _ in lines]
+        self.assertEqual(len(set(moves)), 3)
+        self.assertEqual([score for _, score, _ in lines], sorted((score for _, score, _ in lines), reverse=True))
+        self.assertEqual([pv[0] for _, _, pv in lines], moves)
+        self.assertEqual(player.excluded_moves, set())
+        self.assertEqual(len(board.ordered_moves), 4)
+
+    def test_only_the_block_when_the_opponent_has_a_four(self):
+        board = freestyle_board([(7, 7), (3, 2), (8, 8), (9, 9)], [(3, 3), (3, 4), (3, 5), (3, 6)])
+        lines = AI_Player("X", max_depth=2).analyze(board, k=3)
+        self.assertEqual([move for move, _, _ in lines], [(3, 7)])
+
+
+class ProofSearch(unittest.TestCase):
+    """Bevistalssökningen (df-pn) över hotsekvenser."""
+
+    def test_open_three_wins(self):
+        board = freestyle_board([(7, 5), (7, 6), (7, 7)], [(3, 3), (10, 10)])
+        self.assertEqual(ProofSolver().solve(board, "X"), ("win", (7, 8)))
+        self.assertEqual(len(board.ordered_moves), 5)
+
+    def test_opponent_open_four_is_a_loss(self):
+        board = freestyle_board([(7, 4), (7, 5), (7, 6), (7, 7)], [(3, 3), (10, 10), (11, 11)])
+        self.assertEqual(ProofSolver().solve(board, "O"), ("loss", None))
+
+    def test_quiet_position_is_unknown(self):
+        board = freestyle_board([(7, 7), (8, 8)], [(3, 3)])
+        self.assertEqual(ProofSolver().solve(board, "O", max_nodes=2000), ("unknown", None))
+        self.assertEqual(len(board.ordered_moves), 3)
+
+
+class TimeAllocation(unittest.TestCase):
+    """Tidsbudgeten per drag från TimeManager."""
+
+    def test_remaining_time_is_split_over_the_expected_moves(self):
+        self.assertAlmostEqual(TimeManager().allocate(60.0, 0.0, 0), 59.9 / 30)
+        self.assertAlmostEqual(TimeManager().allocate(60.0, 0.0, 25), 59.9 / 10)
+        self.assertAlmostEqual(TimeManager().allocate(60.0, 1.0, 0), 59.9 / 30 + 0.8)
+
+    def test_volatility_at_most_doubles_the_budget(self):
+        manager = TimeManager()
+        self.assertAlmostEqual(manager.allocate(60.0, 0.0, 0, volatility=1000.0), 1.5 * 59.9 / 30)
+        self.assertAlmostEqual(manager.allocate(60.0, 0.0, 0, volatility=10**6), 2 * 59.9 / 30)
+
+    def test_budget_is_capped(self):
+        self.assertAlmostEqual(TimeManager().allocate(10.0, 10.0, 0), 9.9 / 4)
+        self.assertEqual(TimeManager().allocate(0.05, 0.0, 0), 0.0)
+
+
+class Percentiles(unittest.TestCase):
+    """Percentiler med närmaste rang."""
+
+    def test_known_values(self):
+        values = [15, 20, 35, 40, 50]
+        for fraction, expected in ((0.05, 15), (0.3, 20), (0.4, 20), (0.5, 35), (1.0, 50), (0.0, 15)):
+            self.assertEqual(percentile(values, fraction), expected)
+
+    def test_rounding_error(self):
+        # 0.07 * 100 blir 7.000000000000001 med flyttal, men rangen är 7
+        self.assertEqual(percentile(list(range(1, 101)), 0.07), 7)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+
+    def test_empty(self):
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class EloAndSPRT(unittest.TestCase):
+    """Elo-skattning och SPRT för en match."""
+
+    def match(self, wins: int, draws: int, losses: int) -> Match:
+        match = Match("first", "second")
+        for points, games in ((1, wins), (0.5, draws), (0, losses)):
+            for _ in range(games):
+                match.add(points)
+        return match
+
+    def test_even_match(self):
+        match = self.match(10, 5, 10)
+        elo, margin = match.elo()
+        self.assertAlmostEqual(elo, 0.0)
+        self.assertGreater(margin, 0)
+        self.assertAlmostEqual(match.llr(-10, 10), 0.0)
+
+    def test_bounds_decide_the_match(self):
+        match = self.match(300, 100, 100)
+        match.update_sprt(0, 10, 0.05, 0.05)
+        self.assertGreaterEqual(match.llr(0, 10), math.log(0.95 / 0.05))
+        self.assertEqual(match.decision, "H1")
+
+        match = self.match(100, 100, 300)
+        match.update_sprt(0, 10, 0.05, 0.05)
+        self.assertLessEqual(match.llr(0, 10), math.log(0.05 / 0.95))
+        self.assertEqual(match.decision, "H0")
+
+    def test_undecided(self):
+        match = self.match(3, 2, 2)
+        match.update_sprt(0, 10, 0.05, 0.05)
+        self.assertIsNone(match.decision)
+        self.assertEqual(self.match(0, 0, 0).llr(0, 10), 0.0)
+
+
+class PositionParsing(unittest.TestCase):
+    """Positioner i textform, som draglista och som brädsträng."""
+
+    def test_move_list(self):
+        board = parse_position("2,2 0,0; 2,3", 5, 5, 4)
+        self.assertEqual(board.ordered_moves, [(2, 2), (0, 0), (2, 3)])
+        self.assertEqual(board.board[0][0], "O")
+        self.assertEqual(board.board[2][3], "X")
+
+    def test_board_string(self):
+        board = parse_position("x..../...../..O../...../....X", 5, 5, 4)
+        self.assertEqual(board.board[0][0], "X")
+        self.assertEqual(board.board[2][2], "O")
+        self.assertEqual(board.board[4][4], "X")
+
+    def test_invalid_positions(self):
+        for text in ("2,2 2,2", "5,0", "a,b", "...../....."):
+            with self.assertRaises(ValueError):
+                parse_position(text, 5, 5, 4)
+
+    def test_forbidden_move(self):
+        with self.assertRaises(ValueError):
+            parse_position("7,5 0,0 7,6 0,2 5,7 0,4 6,7 0,6 7,7", 15, 15, 5, rule="renju")
+
+
+class ProtocolCommands(unittest.TestCase):
+    """Kommandotolkningen i Gomocup-protokollet."""
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.engine = ProtocolEngine(self.output)
+
+    def replies(self, *lines: str) -> list[str]:
+        for line in lines:
+            self.engine.handle(line)
+        replies = self.output.getvalue().splitlines()
+        self.output.seek(0)
+        self.output.truncate()
+        return replies
+
+    def test_board_commands_need_start(self):
+        for line in ("BEGIN", "TURN 7,7", "BOARD", "RESTART", "TAKEBACK 7,7"):
+            self.assertTrue(self.replies(line)[0].startswith("ERROR"), line)
+
+    def test_start_turn_and_takeback(self):
+        self.assertEqual(self.replies("START 15", "INFO timeout_turn 300"), ["OK"])
+        x, y = (int(value) for value in self.replies("TURN 7,7")[0].split(","))
+        self.assertEqual(self.engine.board.board[y][x], "X")
+        self.assertEqual(self.engine.board.board[7][7], "O")
+        self.assertEqual(self.replies(f"TAKEBACK {x},{y}"), ["OK"])
+        self.assertEqual(self.engine.board.ordered_moves, [(7, 7)])
+
+    def test_board_position(self):
+        self.replies("START 15", "INFO timeout_turn 300")
+        reply = self.replies("BOARD", "7,7,1", "7,8,2", "8,7,1", "8,8,2", "DONE")
+        self.assertEqual(len(reply), 1)
+        self.assertEqual(self.engine.player.symbol, "X")
+        self.assertEqual(self.engine.board.marked_cells, 5)
+
+    def test_errors_and_unknown_commands(self):
+        self.replies("START 15")
+        self.assertTrue(self.replies("TURN 20,20")[0].startswith("ERROR"))
+        self.assertTrue(self.replies("START 3")[0].startswith("ERROR"))
+        self.assertEqual(self.replies("FOO"), ["UNKNOWN FOO"])
+        self.replies("END")
+        self.assertFalse(self.engine.running)
+
+
+if __name__ == "__main__":
+    unittest.main()
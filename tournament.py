@@ -0,0 +1,346 @@
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from game import *
+from position import *
+
+# Inställningar i en konfiguration som gäller brädet och inte AI_Player
+BOARD_OPTIONS = ("evaluation",)
+
+
+def canonical_openings(size: int) -> list[str]:
+    """Returnera de 26 klassiska öppningarna med tre stenar kring mitten, som draglistor.
+
+    Första stenen står i mitten och den andra direkt (bredvid) eller indirekt (diagonalt) intill. Den tredje
+    står inom två steg från mitten, och öppningar som är spegelbilder av varandra räknas bara en gång.
+
+    Args:
+        size (int): Brädets storlek
+
+    Returns:
+        list[str]: Öppningarna, där O står på tur efter tre drag.
+    """
+    centre = size // 2
+    openings = []
+    for second, mirror in (((0, 1), lambda dr, dc: (-dr, dc)), ((1, 1), lambda dr, dc: (dc, dr))):
+        seen = set()
+        for dr in range(-2, 3):
+            for dc in range(-2, 3):
+                if (dr, dc) in ((0, 0), second) or mirror(dr, dc) in seen:
+                    continue
+                seen.add((dr, dc))
+                openings.append(
+                    f"{centre},{centre} {centre + second[0]},{centre + second[1]} {centre + dr},{centre + dc}"
+                )
+    return openings
+
+
+def parse_engine(text: str) -> tuple[str, dict]:
+    """Tolka en konfiguration på formen "namn:nyckel=värde,nyckel=värde".
+
+    Värdena tolkas som JSON om det går (heltal, flyttal, true/false, null), annars som strängar.
+
+    Args:
+        text (str): Konfigurationen, t.ex. "lmr:max_depth=3,late_move_reductions=true"
+
+    Returns:
+        tuple[str, dict]: Konfigurationens namn och inställningar.
+    """
+    name, _, options_text = text.partition(":")
+    options = {}
+    for item in filter(None, options_text.split(",")):
+        key, separator, value = item.partition("=")
+        if not separator:
+            raise ValueError(f"Option {item!r} is not on the form key=value")
+        try:
+            options[key] = json.loads(value)
+        except json.JSONDecodeError:
+            options[key] = value
+    return name, options
+
+
+def play_game(
+    opening: str,
+    size: int,
+    x_config: dict,
+    o_config: dict,
+    time_limit: float | None,
+    max_moves: int,
+    rule: str = "freestyle",
+) -> dict:
+    """Spela ett parti mellan två konfigurationer från en öppning, körs i en arbetarprocess.
+
+    Args:
+        opening (str): Öppningens draglista
+        size (int): Brädets storlek
+        x_config (dict): Inställningarna för X
+        o_config (dict): Inställningarna för O
+        time_limit (float | None): Tidsbudget i sekunder per drag
+        max_moves (int): Högsta antal drag innan partiet räknas som oavgjort
+        rule (str): Regelvarianten, se RULES
+
+    Returns:
+        dict: Partiet på formen {size, opening, moves, result} där result är "X", "O" eller "draw".
+    """
+    board = parse_position(opening, size, size, 5, rule=rule)
+    configs = {"X": x_config, "O": o_config}
+    players = {
+        symbol: AI_Player(
+            symbol,
+            **{key: value for key, value in config.items() if key not in BOARD_OPTIONS},
+        )
+        for symbol, config in configs.items()
+    }
+
+    game = Game(board, None, players["X"], players["O"])
+    if game.current_player.symbol != side_to_move(board):
+        game.switch_turns()
+
+    game_over = False
+    while not game_over and len(board.ordered_moves) < max_moves:
+        symbol = game.current_player.symbol
+        # Konfigurationerna kan använda olika evalueringsfunktioner på samma bräde
+        board.evaluation = configs[symbol].get("evaluation", "runs")
+        game_over = game.play_move(game.current_player.make_move(board, time_limit=time_limit))
+
+    result = game.winner.symbol if game.winner is not None else "draw"
+    return {"size": size, "rule": rule, "opening": opening, "moves": encode_moves(board), "result": result}
+
+
+def elo_from_score(score: float) -> float:
+    """Omvandla en förväntad poäng (0 till 1) till en Elo-skillnad."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_from_elo(elo: float) -> float:
+    """Omvandla en Elo-skillnad till förväntad poäng (0 till 1)."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class Match:
+    """Resultatet mellan två konfigurationer, räknat ur den förstas perspektiv, med Elo-skattning och SPRT."""
+
+    def __init__(self, first: str, second: str) -> None:
+        self.first = first
+        self.second = second
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.failed = 0  # partier som kraschade i arbetaren, räknas inte in i resultatet
+        self.decision = None  # "H0" eller "H1" när SPRT har avgjort matchen
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def add(self, points: float) -> None:
+        """Lägg till ett parti med den första konfigurationens poäng (1, 0.5 eller 0)."""
+        if points == 1:
+            self.wins += 1
+        elif points == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def mean_and_variance(self) -> tuple[float, float]:
+        """Returnera medelpoängen per parti och poängens varians per parti."""
+        mean = (self.wins + 0.5 * self.draws) / self.games
+        variance = (
+            self.wins * (1 - mean) ** 2 + self.draws * (0.5 - mean) ** 2 + self.losses * mean**2
+        ) / self.games
+        return mean, variance
+
+    def elo(self) -> tuple[float, float]:
+        """Skatta Elo-skillnaden med ett 95 % konfidensintervall.
+
+        Returns:
+            tuple[float, float]: Elo-skillnaden och intervallets halva bredd.
+        """
+        if self.games == 0:
+            return 0.0, math.inf
+
+        mean, variance = self.mean_and_variance()
+        margin = 1.96 * math.sqrt(variance / self.games)
+        lower, upper = elo_from_score(mean - margin), elo_from_score(mean + margin)
+        if math.isinf(lower) or math.isinf(upper):
+            return elo_from_score(mean), math.inf
+        return elo_from_score(mean), (upper - lower) / 2
+
+    def llr(self, elo0: float, elo1: float) -> float:
+        """Log-likelihood-kvoten för hypotesen elo1 mot elo0, med normalapproximation av poängen per parti."""
+        if self.games == 0:
+            return 0.0
+
+        mean, variance = self.mean_and_variance()
+        if variance == 0:
+            # Alla partier har samma resultat, lägg till ett halvt remiparti för att få en varians
+            variance = 0.25 / (self.games + 1)
+
+        score0, score1 = score_from_elo(elo0), score_from_elo(elo1)
+        return self.games * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+    def update_sprt(self, elo0: float, elo1: float, alpha: float, beta: float) -> None:
+        """Avgör matchen om log-likelihood-kvoten har passerat någon av SPRT-gränserna."""
+        llr = self.llr(elo0, elo1)
+        if llr >= math.log((1 - beta) / alpha):
+            self.decision = "H1"
+        elif llr <= math.log(beta / (1 - alpha)):
+            self.decision = "H0"
+
+    def summary(self, elo0: float, elo1: float) -> str:
+        """Sammanfatta matchen på en rad."""
+        elo, margin = self.elo()
+        return (
+            f"{self.first} vs {self.second}: +{self.wins} ={self.draws} -{self.losses}, "
+            f"Elo {elo:+.1f} ± {margin:.1f}, LLR {self.llr(elo0, elo1):.2f}"
+            + (f", {self.failed} failed" if self.failed else "")
+            + (f", {self.decision} accepted" if self.decision else "")
+        )
+
+
+def game_jobs(engines: list[tuple[str, dict]], openings: list[str], rounds: int):
+    """Generera partierna i turneringen, varvade mellan matcherna så att alla matcher går framåt samtidigt.
+
+    Varje öppning spelas som ett par där konfigurationerna byter färg, så att öppningens fördel tar ut sig.
+
+    Returns:
+        Iterator[tuple]: (första namnet, andra namnet, öppning, X:s namn, O:s namn).
+    """
+    pairs = list(itertools.combinations([name for name, _ in engines], 2))
+    for _ in range(rounds):
+        for opening in openings:
+            for first, second in pairs:
+                yield first, second, opening, first, second
+                yield first, second, opening, second, first
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Spela en turnering mellan AI-konfigurationer på alla kärnor och skriv ut Elo-skillnader."""
+    parser = argparse.ArgumentParser(description="Play AI configurations against each other.")
+    parser.add_argument(
+        "--engine",
+        action="append",
+        required=True,
+        help='configuration as name:key=value,..., e.g. "lmr:max_depth=3,late_move_reductions=true"',
+    )
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--rule", choices=RULES, default="freestyle", help="rule variant")
+    parser.add_argument("--time", type=float, default=None, help="time budget in seconds per move")
+    parser.add_argument("--max-moves", type=int, default=120, help="moves before a game is adjudicated a draw")
+    parser.add_argument("--rounds", type=int, default=1, help="passes over the opening set")
+    parser.add_argument("--openings", default=None, help="file with one opening move list per line")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--sprt", action="store_true", help="stop a match once SPRT accepts a hypothesis")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--record", default=None, help="append finished games as JSON lines to this file")
+    args = parser.parse_args(argv)
+
+    engines = [parse_engine(text) for text in args.engine]
+    if len(engines) < 2 or len({name for name, _ in engines}) != len(engines):
+        parser.error("give at least two configurations with distinct names")
+    configs = dict(engines)
+
+    if args.openings:
+        with open(args.openings, encoding="utf-8") as file:
+            openings = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    else:
+        openings = canonical_openings(args.size)
+
+    matches = {(first, second): Match(first, second) for first, second in itertools.combinations(configs, 2)}
+    workers = args.workers or os.cpu_count() or 1
+    record = open(args.record, "a", encoding="utf-8") if args.record else None
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        jobs = game_jobs(engines, openings, args.rounds)
+        pending = {}
+
+        while True:
+            # Håll alla arbetare sysselsatta med partier från matcher som inte är avgjorda
+            for first, second, opening, x_name, o_name in jobs:
+                if matches[first, second].decision is not None:
+                    continue
+                task = (
+                    play_game,
+                    opening,
+                    args.size,
+                    configs[x_name],
+                    configs[o_name],
+                    args.time,
+                    args.max_moves,
+                    args.rule,
+                )
+                try:
+                    future = pool.submit(*task)
+                except BrokenProcessPool:
+                    # En dödad arbetare gör poolen obrukbar, ersätt den så att turneringen kan fortsätta
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                    future = pool.submit(*task)
+                pending[future] = (first, second, opening, x_name, o_name)
+                if len(pending) >= 2 * workers:
+                    break
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                first, second, opening, x_name, o_name = pending.pop(future)
+                match = matches[first, second]
+                try:
+                    game = future.result()
+                except Exception as error:
+                    # Ett kraschat parti registreras som misslyckat och turneringen fortsätter med nästa
+                    match.failed += 1
+                    if record is not None:
+                        failure = {"x": x_name, "o": o_name, "opening": opening, "error": f"{type(error).__name__}: {error}"}
+                        record.write(json.dumps(failure) + "\n")
+                        record.flush()
+                    print(match.summary(args.elo0, args.elo1), flush=True)
+                    continue
+
+                if game["result"] == "draw":
+                    match.add(0.5)
+                else:
+                    winner = x_name if game["result"] == "X" else o_name
+                    match.add(1 if winner == first else 0)
+
+                if record is not None:
+                    record.write(json.dumps({"x": x_name, "o": o_name, **game}) + "\n")
+                    record.flush()
+
+                if args.sprt and match.decision is None:
+                    match.update_sprt(args.elo0, args.elo1, args.alpha, args.beta)
+                print(match.summary(args.elo0, args.elo1), flush=True)
+
+            if args.sprt:
+                # Partier i kön från avgjorda matcher behöver inte spelas
+                for future, (first, second, *_) in list(pending.items()):
+                    if matches[first, second].decision is not None and future.cancel():
+                        del pending[future]
+    finally:
+        pool.shutdown()
+
+    if record is not None:
+        record.close()
+
+    print()
+    for match in matches.values():
+        print(match.summary(args.elo0, args.elo1))
+
+
+if __name__ == "__main__":
+    main()
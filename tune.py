@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from position import *
+
+# Ökas när särdragen ändras, så att gamla cachade särdrag inte används
+FEATURE_VERSION = 1
+
+_feature_tables = {}
+
+
+def feature_layout() -> list[tuple[int, int]]:
+    """Returnera särdragen i vektorns ordning: (antal i rad, 0 för öppen och 1 för halvöppen)."""
+    return [(run, kind) for run in sorted(RUN_SCORES, reverse=True) for kind in (0, 1)]
+
+
+def layout_to_parameters(weights: np.ndarray, win_score: int) -> dict:
+    """Omvandla en viktvektor i särdragens ordning till parametrar på samma form som load_parameters returnerar."""
+    run_scores = {}
+    for (run, kind), weight in zip(feature_layout(), weights):
+        run_scores.setdefault(run, [0, 0])[kind] = int(round(float(weight)))
+    return {"run_scores": {run: tuple(scores) for run, scores in run_scores.items()}, "win_score": win_score}
+
+
+def get_feature_tables(to_win: int):
+    """Returnera tabeller som avbildar ett fönster på särdragets nummer (1 och uppåt) i stället för dess poäng.
+
+    Tabellerna byggs med samma regler som poängtabellerna, med särdragets nummer som "poäng", så att
+    särdragen gånger vikterna blir exakt evaluate_board.
+    """
+    if to_win not in _feature_tables:
+        numbers = {}
+        for number, (run, kind) in enumerate(feature_layout(), start=1):
+            numbers.setdefault(run, [0, 0])[kind] = number
+        _feature_tables[to_win] = build_score_tables(to_win, {run: tuple(pair) for run, pair in numbers.items()})
+    return _feature_tables[to_win]
+
+
+def position_features(board: Board) -> list[int]:
+    """Räkna särdragen i en position, X:s förekomster minus O:s, med samma genomgång som evaluate_board.
+
+    Args:
+        board (Board): Positionen
+
+    Returns:
+        list[int]: Ett värde per särdrag i feature_layout.
+    """
+    feature_x, feature_o = get_feature_tables(board.to_win)
+    features = [0] * (len(feature_layout()) + 1)  # Plats 0 samlar fönster utan särdrag
+    side_mask = (1 << (2 * board.to_win)) - 1
+    center_shift = 2 * board.to_win
+    head_shift = 2 * board.to_win + 2
+    line_lengths = line_geometry(board.rows, board.cols)[1]
+
+    for lines, lengths in zip(board.lines, line_lengths):
+        for line, length in zip(lines, lengths):
+            if not (line >> center_shift) & ((1 << (2 * length)) - 1):
+                continue
+
+            for index in range(length):
+                window = line >> (2 * index)
+                if (window >> center_shift) & 3:
+                    continue
+
+                code = (window & side_mask) | (((window >> head_shift) & side_mask) << center_shift)
+                features[feature_x[code]] += 1
+                features[feature_o[code]] -= 1
+
+    return features[1:]
+
+
+def is_finished(game: dict, rule: str) -> bool:
+    """Kontrollera om en post i partiarkivet är ett färdigspelat parti med en given regelvariant.
+
+    Partier som kraschade i turneringen sparas med error i stället för moves och result, och partier med
+    andra regler har andra förbjudna drag och vinstvillkor, så ingen av dem säger något om vikterna.
+
+    Args:
+        game (dict): Posten från arkivet
+        rule (str): Regelvarianten som ska användas
+
+    Returns:
+        bool: True om partiet ska användas annars False.
+    """
+    return "moves" in game and "result" in game and game.get("rule", "freestyle") == rule
+
+
+def game_features(games: list[dict], size: int, skip: int) -> tuple[list[list[int]], list[float]]:
+    """Spela om en sats partier och extrahera särdragen i varje position, körs i en arbetarprocess.
+
+    Öppningens första drag och avgjorda positioner hoppas över, eftersom de inte säger något om vikterna.
+
+    Args:
+        games (list[dict]): Partier på formen {moves, result}, och eventuellt size
+        size (int): Brädets storlek för partier utan size
+        skip (int): Antal inledande drag att hoppa över
+
+    Returns:
+        tuple[list[list[int]], list[float]]: Särdragen per position och partiets resultat för X (1, 0.5 eller 0).
+    """
+    features = []
+    results = []
+    for game in games:
+        outcome = {"X": 1.0, "O": 0.0}.get(game["result"], 0.5)
+        game_size = game.get("size", size)
+        board = Board(game_size, game_size, 5, rule=game.get("rule", "freestyle"))
+        board.track_threats = False
+
+        symbol = "X"
+        for token in game["moves"].split():
+            row, col = (int(value) for value in token.split(","))
+            board.mark_cell(symbol, (row, col))
+            symbol = "O" if symbol == "X" else "X"
+
+            if board.marked_cells <= skip or board.is_winner("X") or board.is_winner("O"):
+                continue
+            features.append(position_features(board))
+            results.append(outcome)
+
+    return features, results
+
+
+def load_features(
+    archive: str, size: int, skip: int, workers: int, batch: int, rule: str = "freestyle"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returnera särdragen och resultaten för alla positioner i ett partiarkiv, från cachen om arkivet inte har ändrats.
+
+    Args:
+        archive (str): JSON-rader med partier, t.ex. från tournament.py --record
+        size (int): Brädets storlek för partier utan size
+        skip (int): Antal inledande drag att hoppa över
+        workers (int): Antal arbetarprocesser för extraktionen
+        batch (int): Antal partier per uppgift till arbetarna
+        rule (str): Regelvarianten, partier med andra regler hoppas över
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Särdragsmatrisen (positioner x särdrag) och resultaten.
+    """
+    digest = hashlib.sha1()
+    with open(archive, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(repr((FEATURE_VERSION, feature_layout(), size, skip, rule)).encode())
+    path = os.path.join(CACHE_DIR, f"features_{digest.hexdigest()[:12]}.npz")
+
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return data["features"], data["results"]
+
+    with open(archive, encoding="utf-8") as file:
+        games = [json.loads(line) for line in file if line.strip()]
+    games = [game for game in games if is_finished(game, rule)]
+    batches = [games[start : start + batch] for start in range(0, len(games), batch)]
+
+    features = np.zeros((0, len(feature_layout())), dtype=np.int32)
+    results = np.zeros(0)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(game_features, batches, [size] * len(batches), [skip] * len(batches)))
+    if parts:
+        features = np.concatenate([np.array(rows, dtype=np.int32).reshape(-1, features.shape[1]) for rows, _ in parts])
+        results = np.concatenate([np.array(outcomes, dtype=np.float64) for _, outcomes in parts])
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez_compressed(path, features=features, results=results)
+    return features, results
+
+
+def loss(features: np.ndarray, results: np.ndarray, weights: np.ndarray, scale: float) -> float:
+    """Medelkvadratfelet mellan partiernas resultat och den förväntade poängen enligt evalueringen."""
+    expected = 1 / (1 + np.exp(-scale * (features @ weights)))
+    return float(np.mean((expected - results) ** 2))
+
+
+def fit_scale(features: np.ndarray, results: np.ndarray, weights: np.ndarray) -> float:
+    """Hitta skalan som omvandlar evalueringens poäng till förväntad poäng bäst, med gyllene snittet-sökning i log-skala."""
+    low, high = np.log(1e-7), np.log(1e-1)
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(60):
+        left, right = high - ratio * (high - low), low + ratio * (high - low)
+        if loss(features, results, weights, np.exp(left)) < loss(features, results, weights, np.exp(right)):
+            high = right
+        else:
+            low = left
+    return float(np.exp((low + high) / 2))
+
+
+def tune_weights(
+    features: np.ndarray,
+    results: np.ndarray,
+    weights: np.ndarray,
+    scale: float,
+    epochs: int,
+    learning_rate: float,
+) -> np.ndarray:
+    """Anpassa vikterna med vektoriserad gradientnedstigning (Adam) på hela datamängden, Texel-metoden.
+
+    Stegen är additiva, så även en vikt som börjar på noll kan ändras. Steglängden anges i enheter av
+    startvikternas medelstorlek, så att samma inlärningstakt passar oavsett evalueringens skala.
+
+    Returns:
+        np.ndarray: De anpassade vikterna.
+    """
+    features = features.astype(np.float64)
+    tuned = weights.astype(np.float64)
+    unit = float(np.mean(np.abs(tuned))) or 1.0
+    first_moment = np.zeros_like(tuned)
+    second_moment = np.zeros_like(tuned)
+
+    for epoch in range(1, epochs + 1):
+        expected = 1 / (1 + np.exp(-scale * (features @ tuned)))
+        error = 2 * (expected - results) * expected * (1 - expected) * scale
+        gradient = (features.T @ error) / len(results)
+
+        first_moment = 0.9 * first_moment + 0.1 * gradient
+        second_moment = 0.999 * second_moment + 0.001 * gradient**2
+        step = (first_moment / (1 - 0.9**epoch)) / (np.sqrt(second_moment / (1 - 0.999**epoch)) + 1e-12)
+        tuned = np.maximum(tuned - learning_rate * unit * step, 0.0)
+
+    return tuned
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Anpassa evalueringens vikter efter partiresultaten i ett partiarkiv och skriv en ny parameterfil."""
+    parser = argparse.ArgumentParser(description="Tune evaluation weights from recorded games.")
+    parser.add_argument("archive", help="JSON lines with games, e.g. from tournament.py --record")
+    parser.add_argument("--output", default="parameters.tuned.json")
+    parser.add_argument("--size", type=int, default=15, help="board size for records without one")
+    parser.add_argument("--skip", type=int, default=6, help="opening moves to skip in each game")
+    parser.add_argument("--rule", choices=RULES, default="freestyle", help="use only games with this rule variant")
+    parser.add_argument("--epochs", type=int, default=2000)
+    parser.add_argument(
+        "--learning-rate", type=float, default=0.002, help="step size relative to the mean starting weight"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="processes for feature extraction")
+    parser.add_argument("--batch", type=int, default=256, help="games per extraction task")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    features, results = load_features(
+        args.archive, args.size, args.skip, args.workers or os.cpu_count() or 1, args.batch, args.rule
+    )
+    print(f"{len(results)} positions in {time.perf_counter() - start:.1f}s")
+    if len(results) == 0:
+        return
+
+    weights = np.array(
+        [RUN_SCORES[run][kind] for run, kind in feature_layout()], dtype=np.float64
+    )
+    scale = fit_scale(features, results, weights)
+    print(f"scale {scale:.3g}, loss {loss(features, results, weights, scale):.5f}")
+
+    start = time.perf_counter()
+    tuned = tune_weights(features, results, weights, scale, args.epochs, args.learning_rate)
+    print(f"tuned loss {loss(features, results, tuned, scale):.5f} in {time.perf_counter() - start:.1f}s")
+
+    parameters = layout_to_parameters(tuned, PARAMETERS["win_score"])
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "run_scores": {str(run): list(scores) for run, scores in parameters["run_scores"].items()},
+                "win_score": parameters["win_score"],
+            },
+            file,
+            indent=4,
+        )
+        file.write("\n")
+    print(f"wrote {args.output}: {parameters['run_scores']}")
+
+
+if __name__ == "__main__":
+    main()